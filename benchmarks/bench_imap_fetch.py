@@ -0,0 +1,75 @@
+"""
+Round-trip benchmark: per-message FETCH vs batched message-set FETCH.
+
+Runs against the local fake IMAP server with a simulated per-command latency.
+
+    python -m benchmarks.bench_imap_fetch --messages 200 --latency 0.02
+"""
+import argparse
+import sys
+import time
+from email.message import EmailMessage
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from pipeline.imap_fetch import iter_messages  # noqa: E402
+from tests.fake_imap import FakeIMAPServer  # noqa: E402
+
+
+def _populate(server: FakeIMAPServer, count: int) -> None:
+    for i in range(count):
+        msg = EmailMessage()
+        msg["From"] = f"sender{i}@example.com"
+        msg["Subject"] = f"Benchmark message {i}"
+        msg.set_content("lorem ipsum " * 200)
+        server.add_message("INBOX", msg.as_bytes())
+
+
+def _per_message(client, ids) -> int:
+    count = 0
+    for uid in ids:
+        typ, _ = client.fetch(uid, "(RFC822)")
+        if typ == "OK":
+            count += 1
+    return count
+
+
+def _batched(client, ids, chunk_size: int) -> int:
+    return sum(1 for _ in iter_messages(client, ids, chunk_size=chunk_size))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds added per IMAP command")
+    parser.add_argument("--chunk-size", type=int, default=50)
+    args = parser.parse_args()
+
+    server = FakeIMAPServer(latency=args.latency).start()
+    try:
+        _populate(server, args.messages)
+        client = server.connect()
+        client.select("INBOX")
+        ids = client.search(None, "ALL")[1][0].split()
+
+        for label, fn in (
+            ("per-message", lambda: _per_message(client, ids)),
+            (f"batched({args.chunk_size})", lambda: _batched(client, ids, args.chunk_size)),
+        ):
+            before = len(server.command_log)
+            start = time.perf_counter()
+            fetched = fn()
+            elapsed = time.perf_counter() - start
+            round_trips = len(server.command_log) - before
+            print(f"{label:<16} {fetched:>5} msgs  {round_trips:>5} round trips  {elapsed * 1000:>9.1f} ms")
+
+        client.logout()
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Throughput of importance-model batch scoring (featurize + score) on one core.
+
+    python -m benchmarks.bench_importance --batch 100 1000 10000 --train 2000
+"""
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from pipeline.email_utils import Email  # noqa: E402
+from pipeline.importance_model import ImportanceModel, featurize  # noqa: E402
+
+# Single-core target from the request that introduced the model
+TARGET_EMAILS_PER_SECOND = 2000
+
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9)))
+
+
+def synthetic_emails(rng: random.Random, count: int, vocabulary: list[str], domains: list[str]) -> list[Email]:
+    emails = []
+    for _ in range(count):
+        sender = f"{_word(rng)}@{rng.choice(domains)}"
+        subject = " ".join(rng.choices(vocabulary, k=rng.randint(3, 10)))
+        body = " ".join(rng.choices(vocabulary, k=rng.randint(50, 300)))
+        emails.append(Email(sender, subject, body, "INBOX"))
+    return emails
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--train", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    vocabulary = [_word(rng) for _ in range(5000)]
+    domains = [f"{_word(rng)}.com" for _ in range(200)]
+
+    examples = synthetic_emails(rng, args.train, vocabulary, domains)
+    labels = [rng.random() < 0.2 for _ in examples]
+    started = time.perf_counter()
+    model = ImportanceModel().fit(examples, labels)
+    print(f"fit: {args.train} examples in {time.perf_counter() - started:.2f}s\n")
+
+    print(f"{'batch':>7} {'featurize ms':>13} {'score ms':>9} {'emails/s':>10}")
+    slowest = None
+    for size in args.batch:
+        emails = synthetic_emails(rng, size, vocabulary, domains)
+        best_features = best_score = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            batch = featurize(emails)
+            featurized = time.perf_counter()
+            model.score(batch)
+            done = time.perf_counter()
+            best_features = min(best_features, featurized - started)
+            best_score = min(best_score, done - featurized)
+        rate = size / (best_features + best_score)
+        slowest = rate if slowest is None else min(slowest, rate)
+        print(f"{size:>7} {best_features * 1000:>13.2f} {best_score * 1000:>9.2f} {rate:>10.0f}")
+
+    verdict = "OK" if slowest >= TARGET_EMAILS_PER_SECOND else "BELOW TARGET"
+    print(f"\nslowest: {slowest:.0f} emails/s (target {TARGET_EMAILS_PER_SECOND}) {verdict}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Micro-benchmark: compiled keyword matcher vs. the per-keyword `in` loop.
+
+    python -m benchmarks.bench_keyword_matcher --keywords 10 100 500 --text-kb 2 50
+"""
+import argparse
+import random
+import string
+import sys
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from pipeline.keyword_matcher import KeywordMatcher  # noqa: E402
+
+
+def _loop_all(keywords: list[str], text: str) -> list[str]:
+    text = text.lower()
+    return [k for k in keywords if k in text]
+
+
+def _random_words(rng: random.Random, count: int) -> list[str]:
+    return ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10))) for _ in range(count)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--keywords", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--text-kb", type=int, nargs="+", default=[2, 50])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'keywords':>8} {'text':>6} {'loop ms':>9} {'compiled ms':>12} {'speedup':>8}")
+    for n_keywords in args.keywords:
+        keywords = _random_words(rng, n_keywords)
+        matcher = KeywordMatcher(keywords)
+        for kb in args.text_kb:
+            words = _random_words(rng, kb * 150) + keywords[:3]
+            rng.shuffle(words)
+            text = " ".join(words)[: kb * 1024]
+
+            assert sorted(_loop_all(keywords, text)) == sorted(matcher.find_all(text))
+            loop = min(timeit.repeat(lambda: _loop_all(keywords, text), number=1, repeat=args.repeat))
+            compiled = min(timeit.repeat(lambda: matcher.find_all(text), number=1, repeat=args.repeat))
+            print(f"{n_keywords:>8} {kb:>4}KB {loop * 1000:>9.3f} {compiled * 1000:>12.3f} {loop / compiled:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Cold-start import benchmark for the pipeline CLI.
+
+Imports `pipeline.run` in a fresh interpreter under `python -X importtime`,
+reports the slowest modules and fails if the import exceeds the budget or
+pulls in a dependency that only a later stage needs.
+
+    python -m benchmarks.bench_startup --runs 5 --budget-ms 250
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Target for `import pipeline.run` on a headless, email-only run
+STARTUP_BUDGET_MS = 250
+
+# Loaded only by the stage that uses them (GUI prompts, calendar, AI summary,
+# Downloads extraction)
+HEAVY_MODULES = (
+    "tkinter",
+    "googleapiclient",
+    "google_auth_oauthlib",
+    "google.oauth2",
+    "requests",
+    "PIL",
+    "pytesseract",
+    "pdfplumber",
+    "docx",
+    "numpy",
+)
+
+
+def parse_importtime(stderr: str) -> dict[str, tuple[int, int]]:
+    """{module: (self_us, cumulative_us)} from `-X importtime` output."""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # column header
+        timings[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+    return timings
+
+
+def measure(module: str = "pipeline.run") -> tuple[float, dict[str, tuple[int, int]]]:
+    """Import `module` in a new interpreter; returns (cumulative ms, timings)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = parse_importtime(result.stderr)
+    return timings[module][1] / 1000, timings
+
+
+def heavy_loaded(timings: dict[str, tuple[int, int]]) -> list[str]:
+    return sorted(
+        name for name in timings
+        if any(name == heavy or name.startswith(heavy + ".") for heavy in HEAVY_MODULES)
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10, help="slowest modules to list")
+    parser.add_argument("--module", default="pipeline.run")
+    args = parser.parse_args()
+
+    samples = []
+    timings = {}
+    for _ in range(args.runs):
+        elapsed, timings = measure(args.module)
+        samples.append(elapsed)
+
+    median = statistics.median(samples)
+    print(f"import {args.module}: median {median:.1f} ms  min {min(samples):.1f} ms  "
+          f"({args.runs} runs, budget {args.budget_ms:.0f} ms)")
+
+    print("\nslowest modules (cumulative, last run):")
+    ranked = sorted(
+        ((name, t) for name, t in timings.items() if name not in (args.module, "site")),
+        key=lambda item: item[1][1],
+        reverse=True,
+    )
+    for name, (self_us, cumulative_us) in ranked[:args.top]:
+        print(f"  {cumulative_us / 1000:>8.1f} ms  {self_us / 1000:>7.1f} ms self  {name}")
+
+    heavy = heavy_loaded(timings)
+    if heavy:
+        print(f"\n❌ Heavy modules imported at startup: {', '.join(heavy)}")
+    if median > args.budget_ms:
+        print(f"\n❌ Over budget by {median - args.budget_ms:.1f} ms")
+    if heavy or median > args.budget_ms:
+        sys.exit(1)
+    print("\n✅ Within startup budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,213 @@
+"""
+Local LLM summaries through the Ollama HTTP API.
+
+Requests go over one pooled requests.Session (keep-alive to localhost:11434)
+with "stream": true, so tokens can be written out as they arrive and
+time-to-first-token / tokens-per-second are measured for every call.
+`agenerate()` is the asyncio variant for callers already on an event loop.
+"""
+import asyncio
+import json
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Callable, Iterator
+
 import requests
+from requests.adapters import HTTPAdapter
+
+OLLAMA_URL = "http://localhost:11434"
+DEFAULT_MODEL = "phi3"
+DEFAULT_OPTIONS = {
+    "temperature": 0,
+    "num_predict": 350,
+    "top_p": 0.9,
+}
+# (connect, read) seconds; with streaming the read timeout is the longest
+# allowed gap between two tokens, not the whole generation
+DEFAULT_TIMEOUT = (5, 60)
+POOL_SIZE = 8
+
+
+class OllamaError(Exception):
+    """Ollama unreachable, refused the request, or broke off mid-stream."""
+
+
+@dataclass
+class GenerationStats:
+    model: str = DEFAULT_MODEL
+    ttft_seconds: float | None = None
+    total_seconds: float = 0.0
+    tokens: int = 0
+    prompt_tokens: int = 0
+    tokens_per_second: float | None = None
+
+    def as_dict(self) -> dict:
+        return asdict(self)
 
 
-def generate_daily_summary(input_text: str) -> str:
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """The shared keep-alive session (created on first use)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def _finish_stats(stats: GenerationStats, final: dict, started: float) -> None:
+    stats.total_seconds = time.perf_counter() - started
+    stats.prompt_tokens = final.get("prompt_eval_count", stats.prompt_tokens)
+    stats.tokens = final.get("eval_count", stats.tokens)
+    eval_ns = final.get("eval_duration")
+    if eval_ns:
+        stats.tokens_per_second = stats.tokens / (eval_ns / 1e9)
+    elif stats.ttft_seconds is not None and stats.total_seconds > stats.ttft_seconds:
+        stats.tokens_per_second = stats.tokens / (stats.total_seconds - stats.ttft_seconds)
+
+
+def stream_generate(
+    prompt: str,
+    model: str = DEFAULT_MODEL,
+    options: dict | None = None,
+    base_url: str | None = None,
+    timeout: tuple[float, float] = DEFAULT_TIMEOUT,
+    stats: GenerationStats | None = None,
+) -> Iterator[str]:
     """
-    Generates daily productivity summary using local Ollama model.
-    Make sure Ollama is running.
+    Yield response fragments as Ollama produces them. `stats` (if given)
+    is filled in as the stream progresses and is complete once it ends.
     """
+    stats = stats if stats is not None else GenerationStats()
+    stats.model = model
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": True,
+        "options": {**DEFAULT_OPTIONS, **(options or {})},
+    }
+    started = time.perf_counter()
+    final = None
+    try:
+        with get_session().post(f"{base_url or OLLAMA_URL}/api/generate", json=payload,
+                                stream=True, timeout=timeout) as response:
+            if response.status_code != 200:
+                raise OllamaError(f"HTTP {response.status_code}: {response.text[:200]}")
+            # Read to the end even after "done" so the connection goes back to the pool
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise OllamaError(chunk["error"])
+                fragment = chunk.get("response", "")
+                if fragment:
+                    if stats.ttft_seconds is None:
+                        stats.ttft_seconds = time.perf_counter() - started
+                    stats.tokens += 1
+                    yield fragment
+                if chunk.get("done"):
+                    final = chunk
+    except requests.RequestException as e:
+        raise OllamaError(str(e)) from e
+    except ValueError as e:
+        raise OllamaError(f"Malformed stream: {e}") from e
+    if final is None:
+        raise OllamaError("Stream ended before Ollama reported done")
+    _finish_stats(stats, final, started)
 
+
+def generate(
+    prompt: str,
+    model: str = DEFAULT_MODEL,
+    options: dict | None = None,
+    on_token: Callable[[str], None] | None = None,
+    stats: GenerationStats | None = None,
+    **kwargs,
+) -> tuple[str, GenerationStats]:
+    """Whole response plus its stats; `on_token` sees each fragment as it arrives."""
+    stats = stats if stats is not None else GenerationStats()
+    parts = []
+    for fragment in stream_generate(prompt, model, options, stats=stats, **kwargs):
+        parts.append(fragment)
+        if on_token:
+            on_token(fragment)
+    return "".join(parts).strip(), stats
+
+
+async def astream_generate(prompt: str, **kwargs) -> AsyncIterator[str]:
+    """
+    Async iterator over response fragments. The blocking stream runs on a
+    worker thread and hands fragments to the event loop as they arrive.
+    Closing the iterator early (break, aclose(), task cancellation) stops
+    the worker at the next fragment and closes the HTTP response, which
+    makes Ollama stop generating.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+    stop = threading.Event()
+
+    def put(item) -> None:
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+    def pump() -> None:
+        fragments = stream_generate(prompt, **kwargs)
+        try:
+            for fragment in fragments:
+                if stop.is_set():
+                    break
+                put(fragment)
+        except Exception as e:
+            put(e)
+        finally:
+            # Closes the response (in stream_generate's with block) on early exit
+            fragments.close()
+            put(done)
+
+    worker = loop.run_in_executor(None, pump)
     try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": "phi3",
-                "prompt": input_text,
-                "stream": False,
-                "options": {
-                    "temperature": 0,
-                    "num_predict": 350,
-                    "top_p": 0.9
-                }
-            },
-            timeout=120
-        )
-
-        response.raise_for_status()
-        return response.json()["response"].strip()
-
-    except Exception as e:
-        return f"Ollama error: {str(e)}"
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # Returns within one token gap of a stop, not at the end of the generation
+        await worker
+
+
+async def agenerate(prompt: str, on_token: Callable[[str], None] | None = None,
+                    stats: GenerationStats | None = None, **kwargs) -> tuple[str, GenerationStats]:
+    """asyncio counterpart of generate()."""
+    stats = stats if stats is not None else GenerationStats()
+    parts = []
+    async for fragment in astream_generate(prompt, stats=stats, **kwargs):
+        parts.append(fragment)
+        if on_token:
+            on_token(fragment)
+    return "".join(parts).strip(), stats
+
+
+def generate_daily_summary(
+    input_text: str,
+    on_token: Callable[[str], None] | None = None,
+    stats: GenerationStats | None = None,
+) -> str:
+    """
+    Generates daily productivity summary using local Ollama model.
+    Make sure Ollama is running; raises OllamaError if it isn't.
+    """
+    text, _ = generate(input_text, on_token=on_token, stats=stats)
+    return text
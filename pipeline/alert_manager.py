@@ -3,7 +3,7 @@ User alert and interaction system for email decisions.
 Supports both GUI (tkinter) and console-based prompts.
 """
 import sys
-from typing import Tuple
+from typing import Optional, Sequence, Tuple
 
 
 class AlertManager:
@@ -108,6 +108,107 @@ Actions:
             else:
                 print("Please enter 'yes' or 'no'.")
 
+    def review_batch(self, items: Sequence) -> Optional[list[bool]]:
+        """
+        Show every queued spam message at once (items need sender, subject
+        and preview). Returns one move-to-INBOX decision per item, or None if
+        the user chose to decide later.
+        """
+        if not items:
+            return []
+        if self.gui_available:
+            return self._show_gui_batch(items)
+        else:
+            return self._show_console_batch(items)
+
+    def _show_gui_batch(self, items: Sequence) -> Optional[list[bool]]:
+        """One window with a multi-select list; everything starts selected."""
+        try:
+            root = self.tk.Tk()
+            root.title("Review emails found in SPAM")
+            result = {"decisions": None}
+
+            self.tk.Label(
+                root,
+                text=f"{len(items)} possibly important email(s) in SPAM.\n"
+                     "Selected ones move to INBOX, the rest are deleted.",
+                justify="left",
+            ).pack(padx=10, pady=(10, 5), anchor="w")
+
+            frame = self.tk.Frame(root)
+            frame.pack(fill="both", expand=True, padx=10)
+            scrollbar = self.tk.Scrollbar(frame)
+            scrollbar.pack(side="right", fill="y")
+            listbox = self.tk.Listbox(
+                frame, selectmode=self.tk.MULTIPLE, width=100,
+                height=min(len(items), 20), yscrollcommand=scrollbar.set,
+            )
+            for item in items:
+                listbox.insert(self.tk.END, f"{item.sender} — {item.subject}")
+            listbox.select_set(0, self.tk.END)
+            listbox.pack(side="left", fill="both", expand=True)
+            scrollbar.config(command=listbox.yview)
+
+            def apply():
+                selected = set(listbox.curselection())
+                result["decisions"] = [i in selected for i in range(len(items))]
+                root.destroy()
+
+            buttons = self.tk.Frame(root)
+            buttons.pack(pady=10)
+            self.tk.Button(buttons, text="Apply", command=apply).pack(side="left", padx=5)
+            self.tk.Button(buttons, text="Decide later", command=root.destroy).pack(side="left", padx=5)
+
+            root.mainloop()
+            return result["decisions"]
+        except Exception as e:
+            print(f"Error showing review window: {e}. Falling back to console.")
+            return self._show_console_batch(items)
+
+    def _show_console_batch(self, items: Sequence) -> Optional[list[bool]]:
+        """Numbered list, one prompt for the whole batch."""
+        print("\n" + "=" * 70)
+        print(f"⚠️  {len(items)} POSSIBLY IMPORTANT EMAIL(S) IN SPAM FOLDER")
+        print("=" * 70)
+        for n, item in enumerate(items, 1):
+            print(f"{n:>3}. {item.sender} — {item.subject}")
+            if item.preview:
+                print(f"     {item.preview[:120].replace(chr(10), ' ')}")
+        print("=" * 70)
+
+        while True:
+            answer = input(
+                "Move which to INBOX? (e.g. 1,3-5 / all / none; Enter = decide later): "
+            )
+            try:
+                decisions = self._parse_selection(answer, len(items))
+            except ValueError:
+                print("Please enter numbers from the list, 'all' or 'none'.")
+                continue
+            print("=" * 70 + "\n")
+            return decisions
+
+    @staticmethod
+    def _parse_selection(answer: str, count: int) -> Optional[list[bool]]:
+        """"1,3-5" / "all" / "none" → per-item booleans; "" → None (later)."""
+        answer = answer.strip().lower()
+        if not answer:
+            return None
+        if answer in ("all", "a"):
+            return [True] * count
+        if answer in ("none", "n"):
+            return [False] * count
+        chosen = set()
+        for token in answer.replace(" ", "").split(","):
+            if not token:
+                continue
+            low, _, high = token.partition("-")
+            start, end = int(low), int(high or low)
+            if not 1 <= start <= end <= count:
+                raise ValueError(token)
+            chosen.update(range(start, end + 1))
+        return [n in chosen for n in range(1, count + 1)]
+
     def show_info(self, title: str, message: str) -> None:
         """Show informational message."""
         if self.gui_available:
@@ -0,0 +1,136 @@
+"""
+Lazy attachment descriptors.
+
+A descriptor carries only metadata (filename, content type, decoded size).
+The payload is decoded on demand through `open()`, which returns a
+file-like object that decodes the transfer encoding chunk by chunk, either
+from a parsed message or straight from the IMAP server with partial
+BODY.PEEK[section]<offset.length> fetches. Memory use is bounded by the
+chunk size, not by the attachment size.
+"""
+import io
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, Iterator
+
+from pipeline.email_utils import decode_chunks, decode_header_value, iter_payload_lines
+from pipeline.imap_fetch import fetch_batched
+
+ATTACHMENT_CHUNK_BYTES = 256 * 1024
+
+
+class _ChunkReader(io.RawIOBase):
+    """Read-only stream over an iterator of byte chunks."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._current = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._current:
+            try:
+                self._current = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(buffer), len(self._current))
+        buffer[:n] = self._current[:n]
+        self._current = self._current[n:]
+        return n
+
+
+@dataclass
+class AttachmentDescriptor:
+    filename: str
+    content_type: str
+    size: int
+    transfer_encoding: str = ""
+    section: str = ""
+    # Yields the raw (still transfer-encoded) payload; None for metadata only
+    _source: Callable[[], Iterable[bytes]] | None = field(default=None, repr=False, compare=False)
+
+    def to_dict(self) -> dict:
+        """The JSON-safe metadata stored on Email.attachments."""
+        return {"filename": self.filename, "content_type": self.content_type, "size": self.size}
+
+    def open(self) -> BinaryIO:
+        """Decoded payload as a buffered, forward-only binary stream."""
+        if self._source is None:
+            raise ValueError(f"No payload source for attachment {self.filename!r}")
+        chunks = decode_chunks(self._source(), self.transfer_encoding)
+        return io.BufferedReader(_ChunkReader(chunks), buffer_size=64 * 1024)
+
+    def save_to(self, target: Path) -> Path:
+        """
+        Stream the payload to `target`; a directory gets the attachment's own
+        filename, with _1, _2, ... appended if that name is taken.
+        """
+        target = Path(target)
+        if target.is_dir():
+            from pipeline.downloads_cleanup import unique_target
+            target = unique_target(target, Path(self.filename).name or "attachment")
+        with self.open() as src, target.open("wb") as dst:
+            shutil.copyfileobj(src, dst)
+        return target
+
+
+# =========================================================
+# FROM A PARSED MESSAGE
+# =========================================================
+
+def iter_message_attachments(msg) -> Iterator[AttachmentDescriptor]:
+    """Descriptors for every named part of an email.message.Message."""
+    for part in msg.walk():
+        if part.get_content_maintype() == "multipart":
+            continue
+        filename = part.get_filename()
+        if not filename:
+            continue
+        payload = part.get_payload(decode=False)
+        if not isinstance(payload, (str, bytes)):
+            payload = ""
+        encoding = str(part.get("Content-Transfer-Encoding", "")).lower()
+        size = len(payload)
+        if encoding == "base64":
+            size = size * 3 // 4
+        yield AttachmentDescriptor(
+            filename=decode_header_value(filename),
+            content_type=part.get_content_type(),
+            size=size,
+            transfer_encoding=encoding,
+            _source=lambda payload=payload: iter_payload_lines(payload),
+        )
+
+
+def describe_attachments(msg) -> list[dict]:
+    """Attachment metadata (filename, content type, size) without decoding payloads."""
+    return [a.to_dict() for a in iter_message_attachments(msg)]
+
+
+# =========================================================
+# STRAIGHT FROM IMAP
+# =========================================================
+
+def imap_section_chunks(
+    server,
+    msg_id: bytes,
+    section: str,
+    use_uid: bool = False,
+    chunk_bytes: int = ATTACHMENT_CHUNK_BYTES,
+) -> Iterator[bytes]:
+    """Raw section body in `chunk_bytes` pieces, one partial FETCH each."""
+    offset = 0
+    while True:
+        data = None
+        items = f"(BODY.PEEK[{section}]<{offset}.{chunk_bytes}>)"
+        for _, values in fetch_batched(server, [msg_id], items, use_uid=use_uid):
+            data = values.get(f"BODY[{section}]<{offset}>")
+        if not isinstance(data, bytes) or not data:
+            return
+        yield data
+        if len(data) < chunk_bytes:
+            return
+        offset += len(data)
@@ -1,52 +1,201 @@
-import os
-from datetime import datetime, timedelta, date
+import hashlib
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone, date
 from pathlib import Path
-from typing import Tuple
-
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from typing import Any, Callable, Iterable, Tuple
 
 ROOT = Path(__file__).resolve().parents[1]
 TOKEN_FILE = ROOT / "config/token.json"
 CREDENTIALS_FILE = ROOT / "config/credentials_google_calendar.json"  # corrected
+EVENT_INDEX_DB = ROOT / "config" / "calendar_events.sqlite3"
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
 
-class GoogleCalendarIntegration:
-    def __init__(self):
-        self.service = None
+# Google recommends at most 50 calls per batch request
+BATCH_SIZE = 50
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 1.0
 
-    def authenticate(self) -> Tuple[bool, str]:
-        creds = None
-        if TOKEN_FILE.exists():
+# Refresh the access token this long before it expires, not after a 401
+REFRESH_MARGIN = timedelta(minutes=5)
+
+# 403s that mean "slow down" rather than "not allowed"
+_QUOTA_REASONS = ("ratelimitexceeded", "userratelimitexceeded", "quotaexceeded", "rate limit exceeded")
+
+
+def event_key(email_obj) -> str:
+    """Stable identity of an email for dedup: its Message-ID, else sender + subject."""
+    if email_obj.message_id:
+        return email_obj.message_id
+    return f"{email_obj.sender}|{email_obj.subject}"
+
+
+def event_id_for(key: str) -> str:
+    """
+    Client-chosen event id (base32hex alphabet: hex digits qualify), so a
+    replayed insert is rejected by Calendar as a 409 instead of duplicated.
+    """
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def _error_status(exc: Exception) -> int | None:
+    return getattr(getattr(exc, "resp", None), "status", None)
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Rate limits, quota errors and server errors are worth another try."""
+    status = _error_status(exc)
+    if status == 429 or (status is not None and status >= 500):
+        return True
+    if status == 403:
+        text = (getattr(exc, "content", b"") or b"").decode("utf-8", "replace").lower()
+        return any(reason in text for reason in _QUOTA_REASONS)
+    return False
+
+
+# =========================================================
+# SHARED CREDENTIALS + SERVICE
+# =========================================================
+
+# One authenticated Calendar service per process (the daemon reuses it)
+_shared: dict[str, Any] = {"creds": None, "service": None}
+_auth_lock = threading.Lock()
+
+
+def reset_service_cache() -> None:
+    with _auth_lock:
+        _shared["creds"] = None
+        _shared["service"] = None
+
+
+def needs_refresh(creds, margin: timedelta = REFRESH_MARGIN) -> bool:
+    """True if the access token is invalid or expires within `margin`."""
+    if not creds.valid:
+        return True
+    expiry = getattr(creds, "expiry", None)  # naive UTC, like google-auth
+    if expiry is None:
+        return False
+    return expiry - margin <= datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _save_token(creds) -> None:
+    TOKEN_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = TOKEN_FILE.with_suffix(".tmp")
+    tmp.write_text(creds.to_json(), encoding="utf-8")
+    tmp.replace(TOKEN_FILE)
+
+
+def get_credentials():
+    """
+    OAuth credentials, read from token.json once per process and refreshed
+    ahead of expiry. token.json is only rewritten when the token changes.
+    """
+    # The Google client libraries take ~200 ms to import; only pay for
+    # them when the calendar is actually used
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
+    with _auth_lock:
+        creds = _shared["creds"]
+        if creds is None and TOKEN_FILE.exists():
             creds = Credentials.from_authorized_user_file(str(TOKEN_FILE), SCOPES)
 
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                if not CREDENTIALS_FILE.exists():
-                    return False, "credentials_google_calendar.json missing"
-                flow = InstalledAppFlow.from_client_secrets_file(str(CREDENTIALS_FILE), SCOPES)
-                creds = flow.run_local_server(port=0)
-            with open(TOKEN_FILE, "w") as token:
-                token.write(creds.to_json())
+        if creds and creds.refresh_token and needs_refresh(creds):
+            creds.refresh(Request())
+            _save_token(creds)
+        elif not creds or not creds.valid:
+            if not CREDENTIALS_FILE.exists():
+                raise FileNotFoundError(CREDENTIALS_FILE)
+            flow = InstalledAppFlow.from_client_secrets_file(str(CREDENTIALS_FILE), SCOPES)
+            creds = flow.run_local_server(port=0)
+            _save_token(creds)
+
+        _shared["creds"] = creds
+        return creds
+
+
+def get_calendar_service():
+    """
+    The process-wide Calendar v3 client. The discovery document comes from
+    the copy bundled with google-api-python-client, so building needs no
+    network round trip; credentials are refreshed in place.
+    """
+    creds = get_credentials()
+    with _auth_lock:
+        if _shared["service"] is None:
+            from googleapiclient.discovery import build
+
+            _shared["service"] = build(
+                "calendar", "v3", credentials=creds, static_discovery=True, cache_discovery=False
+            )
+        return _shared["service"]
+
+
+class CalendarEventIndex:
+    """
+    message key → event id for every event this assistant created, so
+    re-runs over the same mail don't create the event again.
+    """
+
+    def __init__(self, path: Path = EVENT_INDEX_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS calendar_events (
+                message_key TEXT PRIMARY KEY,
+                event_id TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def get(self, key: str) -> str | None:
+        row = self.conn.execute(
+            "SELECT event_id FROM calendar_events WHERE message_key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put_many(self, entries: Iterable[tuple[str, str]]) -> None:
+        now = datetime.now().isoformat(timespec="seconds")
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO calendar_events (message_key, event_id, created_at) VALUES (?, ?, ?)",
+            [(key, event_id, now) for key, event_id in entries],
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
 
+@dataclass
+class EventOutcome:
+    status: str  # "created" | "existing" | "error"
+    event_id: str = ""
+    detail: str = ""  # htmlLink when created, message on error
+
+
+class GoogleCalendarIntegration:
+    def __init__(self, service=None, sleep: Callable[[float], None] = time.sleep):
+        self.service = service
+        self.sleep = sleep
+
+    def authenticate(self) -> Tuple[bool, str]:
         try:
-            self.service = build("calendar", "v3", credentials=creds)
+            self.service = get_calendar_service()
             return True, "Authenticated successfully"
+        except FileNotFoundError:
+            return False, "credentials_google_calendar.json missing"
         except Exception as e:
             return False, f"Error building service: {str(e)}"
 
-    def create_event(self, title: str, description: str) -> Tuple[bool, str, str]:
-        """
-        Creates an all-day calendar event for tomorrow.
-        Returns (success, event_id, html_link or error message)
-        """
-        if not self.service:
-            return False, "", "Service not authenticated"
-
+    @staticmethod
+    def _event_body(title: str, description: str, event_id: str | None = None) -> dict:
         tomorrow = (date.today() + timedelta(days=1)).isoformat()
         event = {
             "summary": title,
@@ -55,6 +204,19 @@ class GoogleCalendarIntegration:
             "end": {"date": tomorrow},
             "reminders": {"useDefault": True},
         }
+        if event_id:
+            event["id"] = event_id
+        return event
+
+    def create_event(self, title: str, description: str) -> Tuple[bool, str, str]:
+        """
+        Creates an all-day calendar event for tomorrow.
+        Returns (success, event_id, html_link or error message)
+        """
+        if not self.service:
+            return False, "", "Service not authenticated"
+
+        event = self._event_body(title, description)
 
         try:
             created_event = self.service.events().insert(calendarId="primary", body=event).execute()
@@ -63,3 +225,91 @@ class GoogleCalendarIntegration:
             return True, event_id, event_link
         except Exception as e:
             return False, "", f"Failed to create event: {str(e)}"
+
+    def create_events(
+        self,
+        events: Iterable[tuple[str, str, str]],
+        index: CalendarEventIndex | None = None,
+        batch_size: int = BATCH_SIZE,
+        max_retries: int = MAX_RETRIES,
+    ) -> dict[str, EventOutcome]:
+        """
+        Create (key, title, description) events through batch requests of up
+        to `batch_size` inserts. Keys already in `index` are skipped; inserts
+        that hit rate/quota limits are retried with exponential backoff.
+        """
+        outcomes: dict[str, EventOutcome] = {}
+        pending: dict[str, dict] = {}
+        for key, title, description in events:
+            if key in outcomes or key in pending:
+                continue
+            known = index.get(key) if index else None
+            if known:
+                outcomes[key] = EventOutcome("existing", known)
+            else:
+                pending[key] = self._event_body(title, description, event_id_for(key))
+
+        if pending and not self.service:
+            # Only sign in when something actually has to be created
+            success, msg = self.authenticate()
+            print(f"Google Calendar: {msg}")
+        if pending and not self.service:
+            for key in pending:
+                outcomes[key] = EventOutcome("error", detail="Service not authenticated")
+            return outcomes
+
+        for attempt in range(max_retries + 1):
+            if not pending:
+                break
+            if attempt:
+                delay = RETRY_BASE_DELAY * (2 ** (attempt - 1))
+                print(f"⏳ Calendar quota hit, retrying {len(pending)} event(s) in {delay:.0f}s")
+                self.sleep(delay)
+            retry: dict[str, dict] = {}
+            keys = list(pending)
+            for start in range(0, len(keys), batch_size):
+                chunk = {key: pending[key] for key in keys[start:start + batch_size]}
+                retry.update(self._execute_batch(chunk, outcomes, last_attempt=attempt == max_retries))
+            pending = retry
+
+        if index:
+            index.put_many(
+                (key, outcome.event_id) for key, outcome in outcomes.items()
+                if outcome.status in ("created", "existing") and outcome.event_id
+            )
+        return outcomes
+
+    def _execute_batch(self, chunk: dict[str, dict], outcomes: dict[str, EventOutcome],
+                       last_attempt: bool) -> dict[str, dict]:
+        """One batch round trip; returns the inserts that should be retried."""
+        retry: dict[str, dict] = {}
+        request_keys = {str(i): key for i, key in enumerate(chunk)}
+
+        def record(request_id, response, exception) -> None:
+            key = request_keys[request_id]
+            if exception is None:
+                outcomes[key] = EventOutcome("created", response.get("id", ""), response.get("htmlLink", ""))
+            elif _error_status(exception) == 409:
+                # Created by an earlier run whose index write was lost
+                outcomes[key] = EventOutcome("existing", chunk[key]["id"])
+            elif is_retryable(exception) and not last_attempt:
+                retry[key] = chunk[key]
+            else:
+                outcomes[key] = EventOutcome("error", detail=f"Failed to create event: {exception}")
+
+        batch = self.service.new_batch_http_request(callback=record)
+        for request_id, key in request_keys.items():
+            batch.add(self.service.events().insert(calendarId="primary", body=chunk[key]),
+                      request_id=request_id)
+        try:
+            batch.execute()
+        except Exception as e:
+            # The batch itself was refused (e.g. 429 on the batch endpoint)
+            for key in chunk:
+                if key in outcomes or key in retry:
+                    continue
+                if is_retryable(e) and not last_attempt:
+                    retry[key] = chunk[key]
+                else:
+                    outcomes[key] = EventOutcome("error", detail=f"Failed to create event: {e}")
+        return retry
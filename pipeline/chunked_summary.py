@@ -0,0 +1,249 @@
+"""
+Map-reduce summaries for large sets of important emails.
+
+One prompt holding every email overflows phi3's context and gets cut off
+by num_predict. Instead the emails are split into chunks that fit a token
+budget, each chunk is summarized on its own (a few at a time), and a final
+reduce pass merges the partial summaries into one numbered list.
+
+Every email keeps its number from start to finish: the map prompts ask for
+one bullet per email starting with that number, and the reduce prompt
+keeps the numbers (joined as "3,7." when two emails are merged). That is
+what ties each final bullet back to its chunk.
+
+With a SummaryCache, emails summarized on an earlier run reuse their
+stored bullet and only the rest go through map/reduce.
+"""
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
+
+from pipeline.ai_summary import DEFAULT_OPTIONS, GenerationStats, generate
+from pipeline.summary_cache import SummaryCache
+
+# phi3-mini has a 4k context; leave room for the instructions and the answer
+CONTEXT_TOKENS = 4096
+CHUNK_TOKEN_BUDGET = 1500
+MAX_PARALLEL = 2
+TOKENS_PER_BULLET = 60
+MAX_PREDICT = 2048
+
+# Rough English average; good enough to size chunks without a tokenizer
+CHARS_PER_TOKEN = 4
+
+# Sent with every map/reduce call; num_predict is sized per call (_options).
+# Cached bullets are keyed on these (see summary_key)
+MAP_OPTIONS = {k: v for k, v in DEFAULT_OPTIONS.items() if k != "num_predict"}
+
+RULES = """STRICT OUTPUT RULES (MUST FOLLOW):
+- Maximum 2 short sentences per bullet
+- Insert EXACTLY one blank line after each numbered point
+- Do NOT add headings like CONTEXT, ACTION ITEMS, or ID
+- Do NOT add raw URLs
+- Do NOT repeat sender or subject labels
+- Do NOT invent information
+- Ignore marketing language and promotional fluff
+- Focus on meaningful updates, requests, or "deadlines\""""
+
+MAP_PROMPT = """
+You are an executive productivity assistant.
+Summarize each of the {count} emails below.
+- Write exactly one bullet per email
+- Start each bullet with the email's number from the list, e.g. "{first}."
+{rules}
+
+Emails:
+{emails}
+"""
+
+REDUCE_PROMPT = """
+You are an executive productivity assistant.
+Below are partial summaries of {count} important emails. Combine them into one DAILY EMAIL SUMMARY.
+- Keep the number at the start of every bullet
+- If two bullets describe the same thing, merge them and join their numbers, e.g. "3,7."
+- Keep every email; do not drop any number
+{rules}
+
+Partial summaries:
+{bullets}
+"""
+
+_BULLET = re.compile(r"^\s*\[?(\d+(?:\s*,\s*\d+)*)\]?[.)]\s+(.*\S)")
+
+# (prompt, options, on_token) -> (text, stats)
+GenerateFn = Callable[..., tuple[str, GenerationStats]]
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+@dataclass
+class Bullet:
+    text: str
+    emails: list[int]
+    chunks: list[int]
+
+
+@dataclass
+class ChunkedSummary:
+    bullets: list[Bullet]
+    chunk_count: int
+    calls: list[GenerationStats] = field(default_factory=list)
+    reduced: bool = False
+    raw: str = ""
+    cached: int = 0
+
+    @property
+    def text(self) -> str:
+        """Numbered list with the source chunk(s) of each bullet."""
+        if not self.bullets:
+            return self.raw
+        lines = []
+        for i, bullet in enumerate(self.bullets, start=1):
+            if not bullet.chunks:
+                lines.append(f"{i}. {bullet.text} [cached]\n")
+                continue
+            source = ", ".join(str(c) for c in bullet.chunks)
+            label = "chunk" if len(bullet.chunks) == 1 else "chunks"
+            lines.append(f"{i}. {bullet.text} [{label} {source}]\n")
+        return "\n".join(lines)
+
+    def stats(self) -> dict:
+        """Combined LLM metrics over every map/reduce call."""
+        tokens = sum(s.tokens for s in self.calls)
+        seconds = sum(s.total_seconds for s in self.calls)
+        ttfts = [s.ttft_seconds for s in self.calls if s.ttft_seconds is not None]
+        rates = [s.tokens_per_second for s in self.calls if s.tokens_per_second]
+        return {
+            "calls": len(self.calls),
+            "chunks": self.chunk_count,
+            "cached": self.cached,
+            "reduced": self.reduced,
+            "tokens": tokens,
+            "prompt_tokens": sum(s.prompt_tokens for s in self.calls),
+            "ttft_seconds": min(ttfts) if ttfts else None,
+            "tokens_per_second": sum(rates) / len(rates) if rates else None,
+            "llm_seconds": seconds,
+        }
+
+
+def split_by_token_budget(emails: list[str], budget: int = CHUNK_TOKEN_BUDGET,
+                          numbers: list[int] | None = None) -> list[list[tuple[int, str]]]:
+    """
+    Consecutive (number, text) groups whose estimated size stays within
+    `budget`. Numbers start at 1 unless given; an email larger than the
+    budget gets a chunk of its own.
+    """
+    chunks: list[list[tuple[int, str]]] = []
+    current: list[tuple[int, str]] = []
+    used = 0
+    for number, text in zip(numbers or range(1, len(emails) + 1), emails):
+        cost = estimate_tokens(text) + 2
+        if current and used + cost > budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append((number, text))
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def parse_bullets(text: str) -> list[tuple[list[int], str]]:
+    """Numbered lines as ([email numbers], text); anything else is ignored."""
+    bullets = []
+    for line in text.splitlines():
+        match = _BULLET.match(line)
+        if match:
+            numbers = [int(n) for n in re.split(r"\s*,\s*", match.group(1))]
+            bullets.append((numbers, match.group(2).strip()))
+    return bullets
+
+
+def _options(bullets: int) -> dict:
+    return {**MAP_OPTIONS, "num_predict": min(MAX_PREDICT, TOKENS_PER_BULLET * bullets + 50)}
+
+
+def summarize_emails(
+    emails: list[str],
+    generate_fn: GenerateFn = generate,
+    chunk_budget: int = CHUNK_TOKEN_BUDGET,
+    max_parallel: int = MAX_PARALLEL,
+    on_token: Callable[[str], None] | None = None,
+    cache: SummaryCache | None = None,
+    keys: list[str] | None = None,
+) -> ChunkedSummary:
+    """
+    Map each chunk to per-email bullets (at most `max_parallel` LLM calls in
+    flight), then reduce them into one list. `on_token` streams the final
+    pass: the only pass for a single chunk, the reduce pass otherwise.
+
+    With `cache` and one key per email (see summary_key), cached emails
+    skip the LLM and newly mapped bullets are stored.
+    """
+    cached: dict[int, str] = {}
+    if cache is not None and keys:
+        for number, key in enumerate(keys, start=1):
+            hit = cache.get(key)
+            if hit is not None:
+                cached[number] = hit
+    fresh = [n for n in range(1, len(emails) + 1) if n not in cached]
+
+    chunks = split_by_token_budget([emails[n - 1] for n in fresh], chunk_budget, numbers=fresh)
+    chunk_of = {number: c for c, chunk in enumerate(chunks, start=1) for number, _ in chunk}
+
+    def map_chunk(chunk: list[tuple[int, str]], stream: bool) -> tuple[str, GenerationStats]:
+        prompt = MAP_PROMPT.format(
+            count=len(chunk),
+            first=chunk[0][0],
+            rules=RULES,
+            emails="\n".join(f"[{number}] {text}" for number, text in chunk),
+        )
+        return generate_fn(prompt, options=_options(len(chunk)), on_token=on_token if stream else None)
+
+    if len(chunks) <= 1:
+        results = [map_chunk(chunk, stream=True) for chunk in chunks]
+    else:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+            results = list(pool.map(lambda chunk: map_chunk(chunk, stream=False), chunks))
+        print(f"🧩 Summarized {len(fresh)} emails in {len(chunks)} chunks "
+              f"({time.perf_counter() - started:.1f}s, {max_parallel} at a time)")
+
+    summary = ChunkedSummary(bullets=[], chunk_count=len(chunks), calls=[stats for _, stats in results],
+                             cached=len(cached))
+    mapped = []
+    for text, _ in results:
+        mapped.extend(b for b in parse_bullets(text) if b[0][0] in chunk_of)
+    mapped.sort(key=lambda b: b[0][0])
+    if cache is not None and keys:
+        for numbers, text in mapped:
+            if len(numbers) == 1:
+                cache.put(keys[numbers[0] - 1], text)
+    final = mapped
+    summary.raw = "\n\n".join(text for text, _ in results)
+
+    if len(chunks) > 1 and mapped:
+        listing = "\n\n".join(f"{','.join(map(str, numbers))}. {text}" for numbers, text in mapped)
+        prompt = REDUCE_PROMPT.format(count=len(fresh), rules=RULES, bullets=listing)
+        if estimate_tokens(prompt) + _options(len(mapped))["num_predict"] <= CONTEXT_TOKENS:
+            text, stats = generate_fn(prompt, options=_options(len(mapped)), on_token=on_token)
+            summary.calls.append(stats)
+            reduced = [b for b in parse_bullets(text) if all(n in chunk_of for n in b[0])]
+            if reduced:
+                final, summary.reduced, summary.raw = reduced, True, text
+        else:
+            # Too many bullets for one more call: keep the map output as is
+            print("🧩 Partial summaries exceed the context window; skipping the reduce pass")
+
+    summary.bullets = [
+        Bullet(text=text, emails=numbers, chunks=sorted({chunk_of[n] for n in numbers if n in chunk_of}))
+        for numbers, text in final
+    ]
+    if cached:
+        summary.bullets += [Bullet(text=text, emails=[n], chunks=[]) for n, text in cached.items()]
+        summary.bullets.sort(key=lambda b: b.emails[0])
+    return summary
@@ -0,0 +1,170 @@
+"""
+Single source for config/email_rules.json.
+
+Every module that needs the rules goes through one ConfigService per file,
+so the JSON is parsed once and re-parsed only when its mtime/size change.
+Writes go through the service too, which keeps the cache current without a
+re-read. Each change bumps `version` and notifies subscribers, letting
+derived structures (trusted-sender index, keyword matchers) rebuild only
+when the rules actually changed. The dicts it hands out are stamped with a
+`generation`, so per-email lookups can find those structures by one int
+instead of re-hashing the rule lists.
+"""
+import copy
+import itertools
+import json
+import threading
+import weakref
+from pathlib import Path
+from typing import Any, Callable
+
+ROOT = Path(__file__).resolve().parents[1]
+RULES_PATH = ROOT / "config" / "email_rules.json"
+
+DEFAULT_CONFIG: dict[str, Any] = {
+    "trusted_senders": [],
+    "priority_keywords": [],
+    "ignored_keywords": [],
+    "mode": "balanced",
+}
+
+
+def apply_defaults(data: dict[str, Any]) -> dict[str, Any]:
+    for key, value in DEFAULT_CONFIG.items():
+        data.setdefault(key, copy.deepcopy(value))
+    return data
+
+
+_generations = itertools.count(1)
+
+
+class Rules(dict):
+    """
+    A config dict with a process-wide unique `generation`. Every load and
+    every copy gets a new one; the rule lists of a given generation are
+    treated as fixed once mail has been classified with it (take a new
+    snapshot after editing them).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.generation = next(_generations)
+
+    def __deepcopy__(self, memo) -> "Rules":
+        return Rules(copy.deepcopy(dict(self), memo))
+
+
+class ConfigService:
+    """
+    Cached, change-aware view of one rules file.
+
+    get() returns the shared dict and must be treated as read-only;
+    snapshot() returns a private copy for callers that edit and save().
+    """
+
+    def __init__(self, path: Path = RULES_PATH):
+        self.path = Path(path)
+        self.version = 0
+        self.loads = 0
+        self._data: dict[str, Any] | None = None
+        self._stamp: tuple[int, int] | None = None
+        self._subscribers: list[Callable[[], Callable | None]] = []
+        self._lock = threading.RLock()
+
+    def _file_stamp(self) -> tuple[int, int] | None:
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _read(self) -> dict[str, Any]:
+        if not self.path.exists():
+            return {}
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError) as e:
+            print(f"⚠ Config load failed: {e}. Using defaults.")
+            return {}
+
+    def reload(self, force: bool = False) -> bool:
+        """Re-parse the file if it changed since the last load. Returns True on change."""
+        with self._lock:
+            stamp = self._file_stamp()
+            if not force and self._data is not None and stamp == self._stamp:
+                return False
+            data = Rules(apply_defaults(self._read()))
+            self.loads += 1
+            changed = data != self._data
+            self._data = data
+            self._stamp = stamp
+            if changed:
+                self.version += 1
+        if changed and self.version > 1:
+            self._notify()
+        return changed
+
+    def get(self) -> dict[str, Any]:
+        """Current config (one stat() per call; parsed only when the file changed)."""
+        self.reload()
+        return self._data
+
+    def snapshot(self) -> dict[str, Any]:
+        """Editable deep copy of the current config."""
+        return copy.deepcopy(self.get())
+
+    def save(self, data: dict[str, Any]) -> None:
+        """Atomically write `data` and make it the cached version."""
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            tmp.replace(self.path)
+            changed = data != self._data
+            self._data = Rules(apply_defaults(copy.deepcopy(data)))
+            self._stamp = self._file_stamp()
+            if changed:
+                self.version += 1
+        if changed:
+            self._notify()
+
+    # -----------------------------
+    # change notification
+    # -----------------------------
+    def subscribe(self, callback: Callable[[dict[str, Any]], Any]) -> None:
+        """
+        Call `callback(config)` after every change. Bound methods are held
+        weakly, so a subscribed object can still be garbage-collected.
+        """
+        if hasattr(callback, "__self__"):
+            ref = weakref.WeakMethod(callback)
+        else:
+            ref = lambda: callback  # noqa: E731
+        with self._lock:
+            self._subscribers.append(ref)
+
+    def _notify(self) -> None:
+        with self._lock:
+            live = [(ref, ref()) for ref in self._subscribers]
+            self._subscribers = [ref for ref, callback in live if callback is not None]
+            data = self._data
+        for _, callback in live:
+            if callback is not None:
+                callback(data)
+
+
+_services: dict[Path, ConfigService] = {}
+_services_lock = threading.Lock()
+
+
+def get_config_service(path: Path = RULES_PATH) -> ConfigService:
+    """The shared service for `path` (one per resolved file)."""
+    key = Path(path).resolve()
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = _services[key] = ConfigService(key)
+        return service
@@ -0,0 +1,119 @@
+"""
+Size-bounded on-disk key/value cache.
+
+Values are stored as JSON in SQLite. Each lookup bumps an access counter,
+and once the cache grows past max_entries or max_bytes the least recently
+used rows are evicted. Hit/miss counters are kept for run metrics.
+"""
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any
+
+
+class DiskCache:
+    """
+    LRU cache persisted to a single SQLite table.
+    """
+
+    def __init__(self, path: Path, max_entries: int = 5000, max_bytes: int | None = None):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used INTEGER NOT NULL
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS cache_last_used ON cache(last_used)")
+        row = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(MAX(last_used), 0) FROM cache"
+        ).fetchone()
+        self._count, self._bytes, self._clock = row
+        self.conn.commit()
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def get(self, key: str) -> Any | None:
+        row = self.conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.conn.execute("UPDATE cache SET last_used = ? WHERE key = ?", (self._tick(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any) -> None:
+        encoded = json.dumps(value, ensure_ascii=False)
+        size = len(encoded.encode("utf-8"))
+
+        old = self.conn.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+        if old is not None:
+            self._count -= 1
+            self._bytes -= old[0]
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+            (key, encoded, size, self._tick()),
+        )
+        self._count += 1
+        self._bytes += size
+        self._evict()
+
+    def delete(self, key: str) -> None:
+        row = self.conn.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self.conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._count -= 1
+            self._bytes -= row[0]
+
+    def _over_budget(self) -> bool:
+        if self._count > self.max_entries:
+            return True
+        return self.max_bytes is not None and self._bytes > self.max_bytes
+
+    def _evict(self) -> None:
+        while self._over_budget() and self._count > 0:
+            # Drop the oldest rows in one statement rather than one at a time
+            excess = max(1, self._count - self.max_entries)
+            rows = self.conn.execute(
+                "SELECT key, size FROM cache ORDER BY last_used LIMIT ?", (excess,)
+            ).fetchall()
+            self.conn.executemany("DELETE FROM cache WHERE key = ?", [(k,) for k, _ in rows])
+            self._count -= len(rows)
+            self._bytes -= sum(size for _, size in rows)
+            self.evictions += len(rows)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": self._count,
+            "bytes": self._bytes,
+        }
+
+    def flush(self) -> None:
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
@@ -1,10 +1,22 @@
+import hashlib
+import json
+import multiprocessing
+import os
 import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
-from PIL import Image
-import pytesseract
-import pdfplumber
-import docx
+from typing import TYPE_CHECKING, BinaryIO, Iterable, Iterator, Optional
+
+from pipeline.extraction_cache import ExtractionCache
+
+# PIL, pytesseract, pdfplumber and python-docx are imported where a file of
+# that type is actually parsed (usually in a pool worker)
+if TYPE_CHECKING:
+    from PIL import Image
+
+    from pipeline.attachments import AttachmentDescriptor
 
 # -----------------------------
 # KEYWORDS FOR COLLEGE DOCS
@@ -14,28 +26,157 @@ COLLEGE_DOC_KEYWORDS = {
     "Important_College_Docs": ["marksheet", "grade", "documents", "card", "hall ticket" , "attendance", "affidavit", "domicile", "admission", "offer", "form", "fee", "receipt", "registration", "important doc", "bank", "account", "scholarship", "Loan", "result"]
 }
 
+# Cached verdicts are only trusted if the keyword table hasn't changed since
+RULES_SIGNATURE = hashlib.sha1(
+    json.dumps(COLLEGE_DOC_KEYWORDS, sort_keys=True).encode("utf-8")
+).hexdigest()[:12]
+
+# Extraction pool: bounded worker processes, per-file time limit in seconds
+DEFAULT_MAX_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_FILE_TIMEOUT = 60
+
+# OCR caps: only the first pages of a scanned PDF are rendered, and large
+# images are downscaled to at most this many pixels before tesseract runs
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".bmp", ".tiff")
+OCR_MAX_PAGES = 2
+OCR_MAX_PIXELS = 4_000_000
+OCR_PDF_RESOLUTION = 150
+
+# Attachments are spooled to a temp file past this size (parsers need seek)
+SPOOL_MAX_MEMORY = 1024 * 1024
+TEXT_MAX_BYTES = 1024 * 1024
+
 # -----------------------------
 # EXTRACT TEXT FROM FILE
 # -----------------------------
-def extract_text_from_file(file_path: Path) -> str:
+def _ocr_image(image: "Image.Image", timeout: Optional[float] = None) -> str:
+    import pytesseract
+
+    if image.width * image.height > OCR_MAX_PIXELS:
+        scale = (OCR_MAX_PIXELS / (image.width * image.height)) ** 0.5
+        image = image.copy()
+        image.thumbnail((int(image.width * scale), int(image.height * scale)))
+    # pytesseract kills the tesseract process once the timeout expires
+    return pytesseract.image_to_string(image, timeout=timeout or 0).strip()
+
+
+def try_extract_text(source: Path | BinaryIO, suffix: str, timeout: Optional[float] = None,
+                     ocr: bool = True) -> Optional[str]:
+    """
+    Embedded text for PDF/DOCX/TXT. Images, and PDFs without a text layer,
+    are OCR'd only when `ocr` is set. `source` is a path or a seekable
+    binary file; `suffix` picks the parser. None when parsing or OCR failed
+    (as opposed to "" for a file that has no text).
+    """
+    suffix = suffix.lower()
     try:
-        if file_path.suffix.lower() in [".png", ".jpg", ".jpeg", ".bmp", ".tiff"]:
-            return pytesseract.image_to_string(Image.open(file_path)).strip()
-        elif file_path.suffix.lower() == ".pdf":
+        if suffix in IMAGE_SUFFIXES:
+            if not ocr:
+                return ""
+            from PIL import Image
+
+            with Image.open(source) as image:
+                return _ocr_image(image, timeout)
+        elif suffix == ".pdf":
+            import pdfplumber
+
             text = ""
-            with pdfplumber.open(file_path) as pdf:
+            with pdfplumber.open(source) as pdf:
                 for page in pdf.pages[:2]:
                     text += page.extract_text() or ""
+                # Scanned PDF: no text layer, OCR the first few pages
+                if not text.strip() and ocr:
+                    for page in pdf.pages[:OCR_MAX_PAGES]:
+                        rendered = page.to_image(resolution=OCR_PDF_RESOLUTION).original
+                        text += _ocr_image(rendered, timeout) + "\n"
             return text.strip()
-        elif file_path.suffix.lower() == ".docx":
-            doc = docx.Document(file_path)
+        elif suffix == ".docx":
+            import docx
+
+            doc = docx.Document(source)
             return "\n".join([p.text for p in doc.paragraphs[:10]]).strip()
-        elif file_path.suffix.lower() == ".txt":
-            return file_path.read_text(encoding="utf-8", errors="ignore").strip()
+        elif suffix == ".txt":
+            if isinstance(source, Path):
+                return source.read_text(encoding="utf-8", errors="ignore").strip()
+            return source.read(TEXT_MAX_BYTES).decode("utf-8", errors="ignore").strip()
         else:
             return ""
-    except:
-        return ""
+    except Exception:
+        return None
+
+
+def extract_text(source: Path | BinaryIO, suffix: str, timeout: Optional[float] = None, ocr: bool = True) -> str:
+    """try_extract_text, with a failure read as no text."""
+    return try_extract_text(source, suffix, timeout, ocr) or ""
+
+
+def extract_text_from_file(file_path: Path, timeout: Optional[float] = None, ocr: bool = True) -> Optional[str]:
+    return try_extract_text(file_path, file_path.suffix, timeout, ocr)
+
+
+def needs_ocr(file_path: Path) -> bool:
+    return file_path.suffix.lower() in IMAGE_SUFFIXES or file_path.suffix.lower() == ".pdf"
+
+# -----------------------------
+# PARALLEL EXTRACTION
+# -----------------------------
+def iter_extracted_text(
+    files: Iterable[Path],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    timeout: Optional[float] = DEFAULT_FILE_TIMEOUT,
+    ocr: bool = True,
+) -> Iterator[tuple[Path, Optional[str]]]:
+    """
+    Extract text from files on a process pool and yield (path, text).
+
+    Results come back in input order as soon as each one (and every file
+    before it) is done, so callers can start acting on early files while
+    later ones are still being OCR'd, and the output order stays
+    deterministic. A file whose extraction failed or exceeded `timeout`
+    yields None, so callers can tell it from a file with no text.
+    With `ocr` off only embedded text is read.
+    """
+    files = list(files)
+    if max_workers <= 1 or len(files) <= 1:
+        for file_path in files:
+            yield file_path, extract_text_from_file(file_path, timeout, ocr=ocr)
+        return
+
+    try:
+        # spawn, not fork: the pool is started from a stage thread, and a
+        # forked child can inherit a lock another thread was holding
+        executor = ProcessPoolExecutor(
+            max_workers=min(max_workers, len(files)),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    except (OSError, NotImplementedError) as e:
+        print(f"Process pool unavailable ({e}), extracting serially.")
+        for file_path in files:
+            yield file_path, extract_text_from_file(file_path, timeout, ocr=ocr)
+        return
+
+    futures = []
+    try:
+        futures = [(p, executor.submit(extract_text_from_file, p, timeout, ocr=ocr)) for p in files]
+        for file_path, future in futures:
+            try:
+                # Grace period on top of the worker's own OCR timeout
+                yield file_path, future.result(timeout=timeout * 2 if timeout else None)
+            except FutureTimeout:
+                print(f"Extraction timed out: {file_path.name}")
+                yield file_path, None
+            except Exception as e:
+                print(f"Extraction failed for {file_path.name}: {e}")
+                yield file_path, None
+    finally:
+        if any(not future.done() for _, future in futures):
+            # Timed out (or the caller stopped early): shutdown() would leave
+            # a hung OCR worker running, so kill the workers outright
+            for process in list((executor._processes or {}).values()):
+                process.terminate()
+            executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            executor.shutdown(wait=True)
 
 # -----------------------------
 # CLASSIFY COLLEGE FILE
@@ -47,6 +188,59 @@ def classify_college_file(text: str, filename: str) -> str:
             return folder
     return ""  # leave file in Downloads if it doesn't match
 
+# -----------------------------
+# CLASSIFIER TIERS
+# -----------------------------
+TIERS = ("cache", "filename", "text", "ocr", "unmatched")
+
+
+@dataclass
+class TierStats:
+    """
+    How each file was decided. Tiers run cheapest first: cached verdict,
+    filename, embedded text (PDF/DOCX/TXT), then OCR.
+    """
+    counts: dict[str, int] = field(default_factory=lambda: dict.fromkeys(TIERS, 0))
+
+    def record(self, tier: str) -> None:
+        self.counts[tier] += 1
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def ocr_avoided(self) -> int:
+        """Files settled without running OCR (unmatched files never reached it either)."""
+        return self.counts["cache"] + self.counts["filename"] + self.counts["text"]
+
+    def hit_rates(self) -> dict[str, float]:
+        total = self.total
+        return {tier: round(n / total, 3) if total else 0.0 for tier, n in self.counts.items()}
+
+    def as_dict(self) -> dict:
+        return {**self.counts, "ocr_avoided": self.ocr_avoided, "hit_rates": self.hit_rates()}
+
+# -----------------------------
+# CLASSIFY AN EMAIL ATTACHMENT
+# -----------------------------
+def classify_attachment(attachment: "AttachmentDescriptor", timeout: Optional[float] = None) -> str:
+    """
+    Run the Downloads tiers on an attachment without saving it first: the
+    filename alone, then text streamed from attachment.open(). The payload
+    is spooled to a temporary file once it outgrows SPOOL_MAX_MEMORY.
+    """
+    folder_name = classify_college_file("", attachment.filename)
+    if folder_name:
+        return folder_name
+
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY) as spool:
+        with attachment.open() as stream:
+            shutil.copyfileobj(stream, spool)
+        spool.seek(0)
+        text = extract_text(spool, Path(attachment.filename).suffix, timeout)
+    return classify_college_file(text, attachment.filename)
+
 # -----------------------------
 # GENERATE FILE NAME
 # -----------------------------
@@ -56,12 +250,33 @@ def generate_filename(text: str, suffix: str) -> str:
         return ""  # will fallback to original name
     return f"{'_'.join(words[:7])}{suffix.lower()}"
 
+# -----------------------------
+# MOVE WITHOUT OVERWRITING
+# -----------------------------
+def unique_target(target_folder: Path, name: str) -> Path:
+    """name, then name_1, name_2, ... until nothing exists at that path."""
+    candidate = target_folder / name
+    stem, suffix = candidate.stem, candidate.suffix
+    counter = 1
+    while candidate.exists():
+        candidate = target_folder / f"{stem}_{counter}{suffix}"
+        counter += 1
+    return candidate
+
 # -----------------------------
 # MAIN CLEANUP FUNCTION
 # -----------------------------
-def cleanup_downloads(downloads_path: Optional[Path] = None) -> int:
+def cleanup_downloads(
+    downloads_path: Optional[Path] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    timeout: Optional[float] = DEFAULT_FILE_TIMEOUT,
+    cache: Optional[ExtractionCache] = None,
+    stats: Optional[TierStats] = None,
+) -> int:
     if downloads_path is None:
         downloads_path = Path.home() / "Downloads"
+    if stats is None:
+        stats = TierStats()
 
     # Ensure folders exist
     for folder in COLLEGE_DOC_KEYWORDS.keys():
@@ -69,30 +284,21 @@ def cleanup_downloads(downloads_path: Optional[Path] = None) -> int:
 
     organized_count = 0
 
-    for file_path in downloads_path.iterdir():
-        if not file_path.is_file():
-            continue
-
-        text = extract_text_from_file(file_path)
-        folder_name = classify_college_file(text, file_path.name)
+    def place(file_path: Path, text: str, folder_name: str) -> None:
+        """Move a file as soon as it has a verdict; later tiers don't hold it back."""
+        nonlocal organized_count
 
         # Skip files that don't match any folder
         if not folder_name:
-            continue
+            return
 
         target_folder = downloads_path / folder_name
 
         # Only rename if OCR/text extraction succeeded
         new_name = generate_filename(text, file_path.suffix) or file_path.name
-        new_file_path = target_folder / new_name
 
         # Avoid duplicates
-        counter = 1
-        while new_file_path.exists():
-            stem = new_file_path.stem
-            suff = new_file_path.suffix
-            new_file_path = target_folder / f"{stem}_{counter}{suff}"
-            counter += 1
+        new_file_path = unique_target(target_folder, new_name)
 
         try:
             shutil.move(str(file_path), str(new_file_path))
@@ -101,4 +307,63 @@ def cleanup_downloads(downloads_path: Optional[Path] = None) -> int:
         except Exception as e:
             print(f"Error moving {file_path.name}: {e}")
 
+    # Sorted so moves (and collision suffixes) are the same on every run
+    files = sorted(p for p in downloads_path.iterdir() if p.is_file())
+    file_stats = {file_path: file_path.stat() for file_path in files}
+    # Hashed once by the lookup and reused when the extraction is stored
+    file_hashes: dict[Path, str | None] = {}
+
+    # Tier 0/1: cached verdict, then the filename alone
+    to_extract = []
+    for file_path in files:
+        record, sha = cache.lookup(file_path, file_stats[file_path]) if cache else (None, None)
+        file_hashes[file_path] = sha
+        if record is not None:
+            if record.get("rules") == RULES_SIGNATURE and record.get("verdict") is not None:
+                verdict = record["verdict"]
+            else:
+                verdict = classify_college_file(record["text"], file_path.name)
+                cache.store(file_path, record["text"], verdict, RULES_SIGNATURE,
+                            st=file_stats[file_path], sha=sha)
+            stats.record("cache")
+            place(file_path, record["text"], verdict)
+            continue
+
+        folder_name = classify_college_file("", file_path.name)
+        if folder_name:
+            # The name already says what it is; keep it and skip extraction
+            stats.record("filename")
+            place(file_path, "", folder_name)
+        else:
+            to_extract.append(file_path)
+
+    # Tier 2: embedded text only (PDF text layer, DOCX, TXT)
+    to_ocr = []
+    for file_path, text in iter_extracted_text(to_extract, max_workers, timeout, ocr=False):
+        failed, text = text is None, text or ""
+        verdict = classify_college_file(text, file_path.name)
+        if not verdict and not text and needs_ocr(file_path):
+            to_ocr.append(file_path)
+            continue
+        stats.record("text" if verdict else "unmatched")
+        # A failed extraction is retried next run, not remembered as "no text"
+        if cache and not failed:
+            cache.store(file_path, text, verdict, RULES_SIGNATURE,
+                        st=file_stats[file_path], sha=file_hashes[file_path])
+        place(file_path, text, verdict)
+
+    # Tier 3: OCR, only for images / scanned PDFs nothing else could place
+    for file_path, text in iter_extracted_text(to_ocr, max_workers, timeout, ocr=True):
+        failed, text = text is None, text or ""
+        verdict = classify_college_file(text, file_path.name)
+        stats.record("ocr" if verdict else "unmatched")
+        if cache and not failed:
+            cache.store(file_path, text, verdict, RULES_SIGNATURE,
+                        st=file_stats[file_path], sha=file_hashes[file_path])
+        place(file_path, text, verdict)
+
+    if cache:
+        cache.cache.flush()
+
+    print(f"Downloads tiers: {stats.counts} (OCR avoided for {stats.ocr_avoided}/{stats.total})")
     return organized_count
@@ -1,6 +1,18 @@
-import re
-from dataclasses import dataclass
+import binascii
+import codecs
+import io
+from dataclasses import dataclass, field
+from email.header import decode_header
 from email.utils import parseaddr
+from functools import lru_cache
+from html.parser import HTMLParser
+from typing import Iterable, Iterator
+
+from pipeline.keyword_matcher import KeywordMatcher, compile_keywords
+
+# Bodies are only read up to this many decoded bytes; rules and the summary
+# only ever look at the start of a message.
+DEFAULT_BODY_MAX_BYTES = 64 * 1024
 
 
 @dataclass
@@ -9,46 +21,294 @@ class Email:
     subject: str
     body: str
     folder: str
+    message_id: str = ""
+    attachments: list = field(default_factory=list)
+
+
+def decode_header_value(value) -> str:
+    """Decode an RFC 2047 encoded header (Subject, From) into text."""
+    if not value:
+        return ""
+    decoded = ""
+    for part, enc in decode_header(str(value)):
+        if isinstance(part, bytes):
+            decoded += part.decode(enc or "utf-8", errors="ignore")
+        else:
+            decoded += part
+    return decoded
+
+
+# =========================================================
+# STREAMING BODY DECODING
+# =========================================================
+
+# Not "head" itself: sloppy HTML often never closes it, which would hide the body
+_SKIPPED_TAGS = {"script", "style", "title"}
+_BLOCK_TAGS = {"br", "p", "div", "li", "tr", "td", "h1", "h2", "h3", "h4", "h5", "h6"}
+
+
+class _HTMLTextExtractor(HTMLParser):
+    """Collects visible text; script/style/title content is dropped."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: list[str] = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "body":
+            self._skip = 0  # whatever was left open in <head> ends here
+        elif tag in _SKIPPED_TAGS:
+            self._skip += 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in _SKIPPED_TAGS and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def iter_payload_lines(payload: str | bytes) -> Iterator[bytes]:
+    if isinstance(payload, str):
+        # email.parser keeps undecodable bytes as surrogate escapes
+        for line in io.StringIO(payload):
+            yield line.encode("utf-8", errors="surrogateescape")
+    else:
+        yield from io.BytesIO(payload)
+
+
+def _split_lines(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Re-split arbitrary byte chunks on line ends."""
+    pending = b""
+    for chunk in chunks:
+        lines = (pending + chunk).splitlines(keepends=True)
+        pending = lines.pop() if lines and not lines[-1].endswith(b"\n") else b""
+        yield from lines
+    if pending:
+        yield pending
+
+
+def decode_chunks(chunks: Iterable[bytes], transfer_encoding: str = "") -> Iterator[bytes]:
+    """
+    Undo the Content-Transfer-Encoding of a body arriving in pieces of any
+    size (lines, or partial IMAP fetches).
+    """
+    encoding = (transfer_encoding or "").lower()
+    if encoding == "base64":
+        pending = b""
+        for chunk in chunks:
+            pending += chunk.translate(None, b" \t\r\n")
+            usable = len(pending) - len(pending) % 4
+            if usable:
+                try:
+                    yield binascii.a2b_base64(pending[:usable])
+                except binascii.Error:
+                    pass
+                pending = pending[usable:]
+    elif encoding == "quoted-printable":
+        # Soft line breaks and =XX escapes never span lines
+        for line in _split_lines(chunks):
+            yield binascii.a2b_qp(line)
+    else:
+        yield from chunks
+
+
+def iter_decoded(payload: str | bytes, transfer_encoding: str = "") -> Iterator[bytes]:
+    """Undo the Content-Transfer-Encoding one line at a time."""
+    return decode_chunks(iter_payload_lines(payload), transfer_encoding)
+
 
+def stream_text(
+    payload: str | bytes,
+    transfer_encoding: str = "",
+    charset: str = "",
+    subtype: str = "plain",
+    max_bytes: int | None = DEFAULT_BODY_MAX_BYTES,
+) -> str:
+    """
+    Decode a MIME part body into text, reading at most `max_bytes` decoded
+    bytes. HTML is reduced to its visible text by an incremental tokenizer,
+    so work and memory depend on the budget, not on the message size.
+    """
+    try:
+        decoder = codecs.getincrementaldecoder(charset or "utf-8")(errors="ignore")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
 
-def extract_body(msg):
+    extractor = _HTMLTextExtractor() if subtype.lower() == "html" else None
+    parts: list[str] = []
+    consumed = 0
+
+    for chunk in iter_decoded(payload, transfer_encoding):
+        if max_bytes is not None:
+            chunk = chunk[:max_bytes - consumed]
+        consumed += len(chunk)
+        text = decoder.decode(chunk)
+        if extractor:
+            extractor.feed(text)
+        else:
+            parts.append(text)
+        if max_bytes is not None and consumed >= max_bytes:
+            break
+
+    # A multi-byte character cut off by the budget is dropped here
+    tail = decoder.decode(b"", final=True)
+    if extractor:
+        extractor.feed(tail)
+        extractor.close()
+        return "".join(extractor.parts).strip()
+    parts.append(tail)
+    return "".join(parts).strip()
+
+
+def decode_part(
+    payload: bytes,
+    transfer_encoding: str = "",
+    charset: str = "",
+    subtype: str = "plain",
+    max_bytes: int | None = DEFAULT_BODY_MAX_BYTES,
+) -> str:
+    """Decode a raw MIME part body fetched straight from IMAP."""
+    return stream_text(payload, transfer_encoding, charset, subtype, max_bytes)
+
+
+def _part_text(part, max_bytes: int | None) -> str:
+    return stream_text(
+        part.get_payload(decode=False),
+        str(part.get("Content-Transfer-Encoding", "")),
+        part.get_content_charset() or "",
+        part.get_content_subtype(),
+        max_bytes,
+    )
+
+
+def extract_body(msg, max_bytes: int | None = DEFAULT_BODY_MAX_BYTES) -> str:
+    """
+    Text of the first inline text/plain or text/html part, decoded in the
+    declared charset and capped at `max_bytes` decoded bytes.
+    """
     if msg.is_multipart():
         for part in msg.walk():
             content_type = part.get_content_type()
             content_disposition = str(part.get("Content-Disposition"))
 
-            if content_type == "text/plain" and "attachment" not in content_disposition:
-                payload = part.get_payload(decode=True)
-                if payload:
-                    return payload.decode(errors="ignore").strip()
-
-            if content_type == "text/html" and "attachment" not in content_disposition:
-                payload = part.get_payload(decode=True)
-                if payload:
-                    html = payload.decode(errors="ignore")
-                    return re.sub("<.*?>", "", html).strip()
+            if content_type in ("text/plain", "text/html") and "attachment" not in content_disposition:
+                if part.get_payload(decode=False):
+                    return _part_text(part, max_bytes)
     else:
-        payload = msg.get_payload(decode=True)
-        if payload:
-            return payload.decode(errors="ignore").strip()
+        if msg.get_payload(decode=False):
+            return _part_text(msg, max_bytes)
 
     return ""
 
+class SenderIndex:
+    """
+    Set-backed trusted sender lookup.
+    Entries are full addresses ("boss@company.com") or whole domains ("@company.com").
+    """
+
+    def __init__(self, entries=()):
+        self.addresses: set[str] = set()
+        self.domains: set[str] = set()
+        for entry in entries:
+            self.add(entry)
+
+    @staticmethod
+    def normalize(entry: str) -> str:
+        entry = (entry or "").strip().lower()
+        if entry.startswith("@"):
+            return entry
+        _, address = parseaddr(entry)
+        return address.strip().lower()
+
+    def add(self, entry: str) -> bool:
+        """Add an address or @domain; returns False if it was already present."""
+        entry = self.normalize(entry)
+        if not entry:
+            return False
+        target = self.domains if entry.startswith("@") else self.addresses
+        if entry in target:
+            return False
+        target.add(entry)
+        return True
+
+    def __contains__(self, sender: str) -> bool:
+        address = self.normalize(sender)
+        if not address or address.startswith("@"):
+            return False
+        if address in self.addresses:
+            return True
+        return "@" in address and "@" + address.rsplit("@", 1)[1] in self.domains
+
+    def __len__(self) -> int:
+        return len(self.addresses) + len(self.domains)
+
+
+@lru_cache(maxsize=32)
+def _trusted_index(senders: tuple[str, ...]) -> SenderIndex:
+    return SenderIndex(senders)
+
+
+# Compiled rules per config generation (see config_service.Rules)
+MAX_COMPILED_RULES = 32
+_compiled_rules: dict[int, tuple[SenderIndex, KeywordMatcher]] = {}
+
+
+def compiled_rules(config) -> tuple[SenderIndex, KeywordMatcher]:
+    """
+    Trusted-sender index and keyword matcher for `config`. Configs from
+    ConfigService are looked up by their generation, so the rule lists are
+    only walked when a new generation is first seen; plain dicts are keyed
+    on their list contents.
+    """
+    generation = getattr(config, "generation", None)
+    rules = _compiled_rules.get(generation) if generation is not None else None
+    if rules is None:
+        rules = (
+            _trusted_index(tuple(config.get("trusted_senders", []))),
+            compile_keywords(
+                config.get("priority_keywords", []),
+                word_boundary=config.get("keyword_word_boundary", False),
+            ),
+        )
+        if generation is not None:
+            if len(_compiled_rules) >= MAX_COMPILED_RULES:
+                _compiled_rules.clear()
+            _compiled_rules[generation] = rules
+    return rules
+
+
 def is_important_by_rule(email_obj: Email, config):
     _, sender_email = parseaddr(email_obj.sender)
     sender_email = sender_email.lower().strip()
 
-    trusted = {s.lower().strip() for s in config.get("trusted_senders", [])}
-    keywords = [k.lower() for k in config.get("priority_keywords", [])]
+    # Built once per config generation, not on every call
+    trusted, matcher = compiled_rules(config)
 
     # Trusted sender → always important
     if sender_email in trusted:
         return True, "trusted_sender"
 
-    # Keyword detection
-    text = f"{email_obj.subject} {email_obj.body}".lower()
-    for keyword in keywords:
-        if keyword in text:
-            return True, f"keyword:{keyword}"
+    # Keyword detection (single pass over subject + body)
+    keyword = matcher.first(f"{email_obj.subject} {email_obj.body}")
+    if keyword:
+        return True, f"keyword:{keyword}"
 
     return False, "none"
+
+
+def needs_body_for_rule(email_obj: Email, config) -> bool:
+    """
+    True when sender and subject alone cannot decide is_important_by_rule,
+    i.e. the body could still contain a priority keyword.
+    """
+    is_important, _ = is_important_by_rule(email_obj, config)
+    return not is_important and bool(config.get("priority_keywords"))
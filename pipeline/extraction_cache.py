@@ -0,0 +1,90 @@
+"""
+Persistent cache of text extracted from Downloads files.
+
+Entries are keyed by (path, size, mtime) so an unchanged file costs one
+stat() on later runs. When the stat key misses (file touched, renamed or
+re-downloaded) the content hash is tried before falling back to OCR.
+The classification verdict is stored alongside the text together with the
+keyword-rules signature it was computed under.
+"""
+import hashlib
+import os
+from pathlib import Path
+
+from pipeline.disk_cache import DiskCache
+
+ROOT = Path(__file__).resolve().parents[1]
+DOWNLOADS_CACHE_DB = ROOT / "config" / "downloads_cache.sqlite3"
+DEFAULT_MAX_ENTRIES = 20000
+
+
+def file_sha256(file_path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Extracted text + verdict per file, with LRU eviction.
+    """
+
+    def __init__(self, path: Path = DOWNLOADS_CACHE_DB, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.cache = DiskCache(path, max_entries=max_entries)
+        self.stat_hits = 0
+        self.hash_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _stat_key(file_path: Path, st: os.stat_result) -> str:
+        return f"stat|{file_path.resolve()}|{st.st_size}|{st.st_mtime_ns}"
+
+    def lookup(self, file_path: Path, st: os.stat_result | None = None) -> tuple[dict | None, str | None]:
+        """
+        Return ({"text", "sha256", "verdict", "rules"} or None, content hash).
+        A content-hash hit is re-keyed under the file's current stat key. On
+        a miss the hash is still returned; pass it to store() so the file
+        isn't read a second time.
+        """
+        st = st or file_path.stat()
+        stat_key = self._stat_key(file_path, st)
+        record = self.cache.get(stat_key)
+        if record is not None:
+            self.stat_hits += 1
+            return record, record.get("sha256")
+
+        try:
+            sha = file_sha256(file_path)
+        except OSError:
+            self.misses += 1
+            return None, None
+
+        record = self.cache.get(f"hash|{sha}")
+        if record is None:
+            self.misses += 1
+            return None, sha
+
+        self.hash_hits += 1
+        record = {"text": record["text"], "sha256": sha, "verdict": None, "rules": None}
+        self.cache.put(stat_key, record)
+        return record, sha
+
+    def store(self, file_path: Path, text: str, verdict: str | None = None,
+              rules: str | None = None, st: os.stat_result | None = None,
+              sha: str | None = None) -> None:
+        try:
+            st = st or file_path.stat()
+            sha = sha or file_sha256(file_path)
+        except OSError:
+            return
+        self.cache.put(self._stat_key(file_path, st),
+                       {"text": text, "sha256": sha, "verdict": verdict, "rules": rules})
+        self.cache.put(f"hash|{sha}", {"text": text})
+
+    def stats(self) -> dict[str, int]:
+        return {"stat_hits": self.stat_hits, "hash_hits": self.hash_hits, "misses": self.misses}
+
+    def close(self) -> None:
+        self.cache.close()
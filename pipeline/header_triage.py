@@ -0,0 +1,322 @@
+"""
+Header-first email triage.
+
+Phase one fetches only the size, header block and BODYSTRUCTURE of each
+message. Sender and subject usually decide the rule on their own; the first
+text part is downloaded with BODY.PEEK[n] only for messages they cannot
+decide, and only as many bytes of it as the body budget can use.
+Attachments are never downloaded.
+"""
+import email as py_email
+from dataclasses import dataclass
+from email.parser import BytesHeaderParser
+from functools import partial
+from typing import Any, Callable, Iterable, Iterator
+
+from pipeline.attachments import (
+    ATTACHMENT_CHUNK_BYTES,
+    AttachmentDescriptor,
+    describe_attachments,
+    imap_section_chunks,
+)
+from pipeline.email_utils import (
+    DEFAULT_BODY_MAX_BYTES,
+    Email,
+    decode_header_value,
+    decode_part,
+    extract_body,
+)
+from pipeline.imap_fetch import DEFAULT_FETCH_CHUNK_SIZE, chunked, fetch_batched
+from pipeline.message_cache import MessageCache
+
+HEADER_ITEMS = "(RFC822.SIZE BODY.PEEK[HEADER] BODYSTRUCTURE)"
+
+FETCH_MODES = ("header_first", "full")
+DEFAULT_FETCH_MODE = "header_first"
+
+
+@dataclass
+class TextPart:
+    section: str
+    subtype: str
+    encoding: str
+    charset: str
+
+
+# =========================================================
+# BODYSTRUCTURE
+# =========================================================
+
+def _text(value: Any) -> str:
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="ignore")
+    return value or ""
+
+
+def _params(value: Any) -> dict[str, str]:
+    if not isinstance(value, list):
+        return {}
+    return {
+        _text(value[i]).lower(): _text(value[i + 1])
+        for i in range(0, len(value) - 1, 2)
+    }
+
+
+def _disposition(part: list) -> list | None:
+    # Extension data: text parts carry an extra "lines" field before MD5.
+    index = 9 if _text(part[0]).lower() == "text" else 8
+    if len(part) > index and isinstance(part[index], list) and part[index]:
+        return part[index]
+    return None
+
+
+def _is_attachment(part: list) -> bool:
+    disposition = _disposition(part)
+    if disposition and _text(disposition[0]).lower() == "attachment":
+        return True
+    return "name" in _params(part[2])
+
+
+def _filename(part: list) -> str:
+    disposition = _disposition(part)
+    name = ""
+    if disposition and len(disposition) > 1:
+        name = _params(disposition[1]).get("filename", "")
+    return decode_header_value(name or _params(part[2]).get("name", ""))
+
+
+def _walk_parts(structure: Any, prefix: str = "") -> Iterator[tuple[str, list]]:
+    """Yield (section, single-part structure) in depth-first order."""
+    if not isinstance(structure, list) or not structure:
+        return
+    if isinstance(structure[0], list):
+        index = 0
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            index += 1
+            yield from _walk_parts(child, f"{prefix}.{index}" if prefix else str(index))
+        return
+    yield prefix or "1", structure
+
+
+def find_text_part(structure: Any) -> TextPart | None:
+    """
+    Return the first inline text/plain or text/html part of a parsed
+    BODYSTRUCTURE, in the same order email.Message.walk() would visit it.
+    """
+    for section, part in _walk_parts(structure):
+        maintype = _text(part[0]).lower()
+        subtype = _text(part[1]).lower() if len(part) > 1 else ""
+        if maintype != "text" or subtype not in ("plain", "html") or len(part) < 7:
+            continue
+        if _is_attachment(part):
+            continue
+        return TextPart(
+            section=section,
+            subtype=subtype,
+            encoding=_text(part[5]).lower(),
+            charset=_params(part[2]).get("charset", ""),
+        )
+    return None
+
+
+def attachment_descriptors(
+    structure: Any,
+    server=None,
+    msg_id: bytes | None = None,
+    use_uid: bool = False,
+    chunk_bytes: int = ATTACHMENT_CHUNK_BYTES,
+) -> list[AttachmentDescriptor]:
+    """
+    Attachments described from BODYSTRUCTURE, nothing downloaded. With a
+    server and message id, each descriptor's open() streams its section
+    with partial fetches.
+    """
+    attachments = []
+    for section, part in _walk_parts(structure):
+        if len(part) < 7 or not _is_attachment(part):
+            continue
+        try:
+            size = int(part[6])
+        except (TypeError, ValueError):
+            size = 0
+        encoding = _text(part[5]).lower()
+        if encoding == "base64":
+            size = size * 3 // 4
+        source = None
+        if server is not None and msg_id is not None:
+            source = partial(imap_section_chunks, server, msg_id, section, use_uid, chunk_bytes)
+        attachments.append(AttachmentDescriptor(
+            filename=_filename(part),
+            content_type=f"{_text(part[0]).lower()}/{_text(part[1]).lower()}",
+            size=size,
+            transfer_encoding=encoding,
+            section=section,
+            _source=source,
+        ))
+    return attachments
+
+
+def structure_attachments(structure: Any) -> list[dict]:
+    """Attachment metadata straight from BODYSTRUCTURE, nothing downloaded."""
+    return [a.to_dict() for a in attachment_descriptors(structure)]
+
+
+# =========================================================
+# TWO-PHASE FETCH
+# =========================================================
+
+def _size(values: dict) -> int:
+    try:
+        return int(values.get("RFC822.SIZE") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _raw_fetch_length(max_bytes: int, encoding: str) -> int:
+    """Encoded bytes needed to yield `max_bytes` once the transfer encoding is undone."""
+    if encoding == "base64":
+        encoded = (max_bytes + 2) // 3 * 4
+        return encoded + encoded // 76 * 2 + 4  # CRLF every 76 chars
+    if encoding == "quoted-printable":
+        return max_bytes * 3
+    return max_bytes
+
+
+def _email_from_headers(headers, folder: str) -> Email:
+    return Email(
+        sender=decode_header_value(headers.get("From", "")),
+        subject=decode_header_value(headers.get("Subject", "")),
+        body="",
+        folder=folder,
+        message_id=str(headers.get("Message-ID", "")).strip(),
+    )
+
+
+def iter_emails_header_first(
+    server,
+    ids: Iterable[bytes],
+    folder: str,
+    needs_body: Callable[[Email], bool],
+    chunk_size: int = DEFAULT_FETCH_CHUNK_SIZE,
+    use_uid: bool = False,
+    cache: MessageCache | None = None,
+    body_max_bytes: int | None = DEFAULT_BODY_MAX_BYTES,
+) -> Iterator[tuple[bytes, Email]]:
+    """
+    Yield (id, Email) in mailbox order.
+    `needs_body(email)` is called with a header-only Email; returning True
+    fetches its first text part before the email is yielded.
+    """
+    for chunk in chunked(list(ids), chunk_size):
+        emails: dict[bytes, Email] = {}
+        sizes: dict[bytes, int] = {}
+        pending: dict[tuple[str, int | None], list[bytes]] = {}
+        parts: dict[bytes, TextPart] = {}
+
+        for msg_id, values in fetch_batched(server, chunk, HEADER_ITEMS, chunk_size, use_uid):
+            headers = BytesHeaderParser().parsebytes(values.get("BODY[HEADER]") or b"")
+            size = _size(values)
+            sizes[msg_id] = size
+
+            cached = cache.get(headers.get("Message-ID", ""), size, folder) if cache else None
+            if cached:
+                email_obj, loaded = cached
+            else:
+                email_obj = _email_from_headers(headers, folder)
+                email_obj.attachments = structure_attachments(values.get("BODYSTRUCTURE"))
+                loaded = False
+            emails[msg_id] = email_obj
+
+            if loaded or not needs_body(email_obj):
+                if cache and not cached:
+                    cache.put(email_obj, size, body_loaded=False)
+                continue
+            text_part = find_text_part(values.get("BODYSTRUCTURE"))
+            if text_part:
+                parts[msg_id] = text_part
+                length = (
+                    _raw_fetch_length(body_max_bytes, text_part.encoding)
+                    if body_max_bytes is not None else None
+                )
+                pending.setdefault((text_part.section, length), []).append(msg_id)
+            elif cache:
+                cache.put(email_obj, size, body_loaded=True)  # no text part to fetch
+
+        # One FETCH per distinct section ("1", "1.1", ...) for the undecided set,
+        # truncated server-side with <0.length> to what the body budget needs
+        for (section, length), section_ids in pending.items():
+            partial = f"<0.{length}>" if length is not None else ""
+            for msg_id, values in fetch_batched(
+                server, section_ids, f"(BODY.PEEK[{section}]{partial})", chunk_size, use_uid
+            ):
+                payload = values.get(f"BODY[{section}]<0>" if partial else f"BODY[{section}]")
+                if msg_id not in emails or not isinstance(payload, bytes):
+                    continue
+                text_part = parts[msg_id]
+                emails[msg_id].body = decode_part(
+                    payload, text_part.encoding, text_part.charset, text_part.subtype, body_max_bytes
+                )
+                if cache:
+                    cache.put(emails[msg_id], sizes[msg_id], body_loaded=True)
+
+        for msg_id in sorted(emails, key=int):
+            yield msg_id, emails[msg_id]
+
+
+def iter_emails_full(
+    server,
+    ids: Iterable[bytes],
+    folder: str,
+    chunk_size: int = DEFAULT_FETCH_CHUNK_SIZE,
+    use_uid: bool = False,
+    cache: MessageCache | None = None,
+    body_max_bytes: int | None = DEFAULT_BODY_MAX_BYTES,
+) -> Iterator[tuple[bytes, Email]]:
+    """Yield (id, Email) after downloading every message in full (RFC822)."""
+    for msg_id, values in fetch_batched(server, ids, "(RFC822.SIZE RFC822)", chunk_size, use_uid):
+        raw = values.get("RFC822")
+        if not isinstance(raw, bytes):
+            continue
+        size = _size(values) or len(raw)
+
+        if cache:
+            # Header-only parse is enough to find the cache key
+            message_id = BytesHeaderParser().parsebytes(raw).get("Message-ID", "")
+            cached = cache.get(message_id, size, folder)
+            if cached and cached[1]:
+                yield msg_id, cached[0]
+                continue
+
+        msg = py_email.message_from_bytes(raw)
+        email_obj = Email(
+            sender=decode_header_value(msg.get("From", "")),
+            subject=decode_header_value(msg.get("Subject", "")),
+            body=extract_body(msg, body_max_bytes),
+            folder=folder,
+            message_id=str(msg.get("Message-ID", "")).strip(),
+            attachments=describe_attachments(msg),
+        )
+        if cache:
+            cache.put(email_obj, size, body_loaded=True)
+        yield msg_id, email_obj
+
+
+def iter_emails(
+    server,
+    ids: Iterable[bytes],
+    folder: str,
+    needs_body: Callable[[Email], bool],
+    chunk_size: int = DEFAULT_FETCH_CHUNK_SIZE,
+    use_uid: bool = False,
+    mode: str = DEFAULT_FETCH_MODE,
+    cache: MessageCache | None = None,
+    body_max_bytes: int | None = DEFAULT_BODY_MAX_BYTES,
+) -> Iterator[tuple[bytes, Email]]:
+    """Dispatch to the configured fetch mode ("header_first" or "full")."""
+    if mode == "full":
+        return iter_emails_full(server, ids, folder, chunk_size, use_uid, cache, body_max_bytes)
+    return iter_emails_header_first(
+        server, ids, folder, needs_body, chunk_size, use_uid, cache, body_max_bytes
+    )
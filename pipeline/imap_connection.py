@@ -0,0 +1,284 @@
+"""
+Long-lived IMAP connection manager.
+
+IMAPConnection owns login, remembers the selected folder (re-selecting the
+same folder is free), sends NOOP when the connection has been quiet long
+enough for the server to drop it, and reconnects + re-selects transparently
+when a command fails on a dead socket. It exposes the imaplib methods the
+pipeline uses, so it can be passed anywhere a `server` is expected.
+
+`wait_for_mail()` blocks in IMAP IDLE until the server announces new mail;
+`serve_forever()` builds a daemon loop on top of it.
+"""
+import imaplib
+import time
+from typing import Any, Callable
+
+from pipeline.sync_state import enable_condstore, response_int
+
+DEFAULT_KEEPALIVE_SECONDS = 240
+# RFC 2177: clients should re-issue IDLE at least every 29 minutes
+DEFAULT_IDLE_SECONDS = 29 * 60
+DEFAULT_MAX_RETRIES = 3
+
+STATUS_CODES = ("UIDVALIDITY", "UIDNEXT", "HIGHESTMODSEQ")
+
+# Replaying these after a drop could act twice if the first attempt landed
+_UNSAFE_TO_RETRY = {"COPY", "APPEND"}
+
+_CONNECTION_ERRORS = (imaplib.IMAP4.abort, OSError)
+
+
+class IMAPConnection:
+    """
+    Reusable IMAP session with keepalive, reconnect and IDLE.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: str,
+        use_ssl: bool = True,
+        keepalive: float = DEFAULT_KEEPALIVE_SECONDS,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        retry_backoff: float = 1.0,
+        client_factory: Callable[[str, int], imaplib.IMAP4] | None = None,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.keepalive = keepalive
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.client_factory = client_factory or (imaplib.IMAP4_SSL if use_ssl else imaplib.IMAP4)
+
+        self.client: imaplib.IMAP4 | None = None
+        self.condstore = False
+        self.selected: tuple[str, bool] | None = None
+        self.status: dict[str, int | None] = {}
+        self._last_used = 0.0
+
+        self.stats = {"connects": 0, "reconnects": 0, "selects": 0, "selects_saved": 0, "keepalives": 0}
+
+    @classmethod
+    def from_creds(cls, creds: dict[str, Any], **kwargs) -> "IMAPConnection":
+        return cls(creds["imap_server"], creds["imap_port"], creds["email"], creds["password"], **kwargs)
+
+    # -----------------------------
+    # lifecycle
+    # -----------------------------
+    def connect(self) -> "IMAPConnection":
+        self.client = self.client_factory(self.host, self.port)
+        self.client.login(self.username, self.password)
+        # CONDSTORE has to be enabled before the first SELECT
+        self.condstore = enable_condstore(self.client)
+        self.stats["connects"] += 1
+        self._touch()
+        if self.selected:
+            mailbox, readonly = self.selected
+            self.selected = None
+            self._select(mailbox, readonly)
+        return self
+
+    def _drop(self) -> None:
+        if self.client is not None:
+            try:
+                self.client.shutdown()
+            except Exception:
+                pass
+        self.client = None
+
+    def logout(self) -> None:
+        if self.client is not None:
+            try:
+                self.client.logout()
+            except Exception:
+                pass
+        self.client = None
+        self.selected = None
+
+    close = logout
+
+    def __enter__(self) -> "IMAPConnection":
+        if self.client is None:
+            self.connect()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.logout()
+
+    # -----------------------------
+    # command plumbing
+    # -----------------------------
+    def _touch(self) -> None:
+        self._last_used = time.monotonic()
+
+    def _ensure(self) -> imaplib.IMAP4:
+        if self.client is None:
+            self.connect()
+        elif time.monotonic() - self._last_used >= self.keepalive:
+            # Quiet for a while: make sure the server still has us
+            self.stats["keepalives"] += 1
+            self.client.noop()
+            self._touch()
+        return self.client
+
+    def _retrying(self, func: Callable[[], Any], retry: bool = True):
+        """Run func; on a dead connection reconnect (with backoff) and run it again."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = func()
+                self._touch()
+                return result
+            except _CONNECTION_ERRORS as e:
+                if not retry or attempt == self.max_retries:
+                    raise
+                print(f"🔌 IMAP connection lost ({e}), reconnecting...")
+                self._drop()
+                self.stats["reconnects"] += 1
+                time.sleep(self.retry_backoff * (2 ** attempt))
+
+    def _call(self, name: str, *args, retry: bool = True):
+        return self._retrying(lambda: getattr(self._ensure(), name)(*args), retry)
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        attr = getattr(self._ensure(), name)
+        if not callable(attr):
+            return attr
+        return lambda *args: self._call(name, *args)
+
+    # -----------------------------
+    # imaplib surface
+    # -----------------------------
+    def _select(self, mailbox: str, readonly: bool):
+        typ, data = self.client.select(mailbox, readonly)
+        self.stats["selects"] += 1
+        if typ == "OK":
+            self.selected = (mailbox, readonly)
+            self.status = {code: response_int(self.client, code) for code in STATUS_CODES}
+        else:
+            self.selected = None
+            self.status = {}
+        return typ, data
+
+    def select(self, mailbox: str = "INBOX", readonly: bool = False):
+        if self.client is not None and self.selected == (mailbox, readonly):
+            self.stats["selects_saved"] += 1
+            # UIDVALIDITY holds for the whole selection; UIDNEXT/MODSEQ may have
+            # moved, so FolderSync falls back to a UID SEARCH
+            self.status = {"UIDVALIDITY": self.status.get("UIDVALIDITY"), "UIDNEXT": None, "HIGHESTMODSEQ": None}
+            return "OK", [None]
+
+        def attempt():
+            self._ensure()
+            return self._select(mailbox, readonly)
+
+        return self._retrying(attempt)
+
+    def response(self, code: str):
+        """SELECT response codes come from the remembered folder status."""
+        if code.upper() in STATUS_CODES:
+            value = self.status.get(code.upper())
+            return code, [str(value).encode() if value is not None else None]
+        return self._call("response", code)
+
+    def uid(self, command: str, *args):
+        return self._call("uid", command, *args, retry=command.upper() not in _UNSAFE_TO_RETRY)
+
+    def copy(self, *args):
+        return self._call("copy", *args, retry=False)
+
+    # -----------------------------
+    # IDLE
+    # -----------------------------
+    def _idle(self, timeout: float) -> list[bytes]:
+        """
+        One IDLE round: returns the untagged lines pushed before `timeout`
+        expired (empty if nothing happened). imaplib on 3.11 has no IDLE, so
+        the exchange is driven by hand on the client's socket.
+        """
+        client = self._ensure()
+        tag = client._new_tag()
+        client.send(tag + b" IDLE\r\n")
+        pushed = []
+        try:
+            while True:
+                line = client._get_line()
+                if line.startswith(b"+"):
+                    break
+                if line.startswith(tag):
+                    raise imaplib.IMAP4.error(f"IDLE refused: {line!r}")
+                pushed.append(line)
+
+            if not pushed:
+                previous = client.sock.gettimeout()
+                client.sock.settimeout(timeout)
+                try:
+                    pushed.append(client._get_line())
+                except TimeoutError:
+                    # A timed-out socket file can't be read again; nothing was consumed
+                    client.file = client.sock.makefile("rb")
+                finally:
+                    client.sock.settimeout(previous)
+
+            client.send(b"DONE\r\n")
+            while True:
+                line = client._get_line()
+                if line.startswith(tag):
+                    break
+                pushed.append(line)
+        finally:
+            client.tagged_commands.pop(tag, None)
+        self._touch()
+        return pushed
+
+    def wait_for_mail(self, mailbox: str = "INBOX", timeout: float = DEFAULT_IDLE_SECONDS) -> bool:
+        """
+        Block until the server reports new messages in `mailbox` or `timeout`
+        passes. Returns True when there may be new mail. Servers without IDLE
+        are polled with a single NOOP after `timeout`.
+        """
+        self.select(mailbox)
+        if "IDLE" not in self.client.capabilities:
+            time.sleep(timeout)
+            self._call("noop")
+            return bool(self.client.untagged_responses.pop("EXISTS", None))
+        try:
+            lines = self._idle(timeout)
+        except _CONNECTION_ERRORS as e:
+            print(f"🔌 IMAP connection lost during IDLE ({e}), reconnecting...")
+            self._drop()
+            self.stats["reconnects"] += 1
+            return True  # anything may have arrived while we were away
+        return any(line.upper().endswith(b"EXISTS") for line in lines)
+
+
+# =========================================================
+# DAEMON LOOP
+# =========================================================
+
+def serve_forever(
+    conn: IMAPConnection,
+    handler: Callable[[IMAPConnection], Any],
+    mailbox: str = "INBOX",
+    idle_timeout: float = DEFAULT_IDLE_SECONDS,
+    max_cycles: int | None = None,
+) -> int:
+    """
+    Run `handler(conn)` once, then again every time new mail arrives in
+    `mailbox`. Returns the number of handler runs (stops after `max_cycles`).
+    """
+    cycles = 0
+    while max_cycles is None or cycles < max_cycles:
+        handler(conn)
+        cycles += 1
+        if max_cycles is not None and cycles >= max_cycles:
+            break
+        while not conn.wait_for_mail(mailbox, idle_timeout):
+            pass  # IDLE renewed without news
+    return cycles
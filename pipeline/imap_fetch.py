@@ -0,0 +1,217 @@
+"""
+Batched IMAP fetch layer.
+
+Instead of one FETCH round trip per message, message ids are grouped into
+IMAP message sets ("1:20", "3,7,9:12") and fetched in chunks. Responses are
+parsed and handed back one message at a time so callers can stream over them.
+"""
+import email as py_email
+from email.message import Message
+from typing import Any, Iterable, Iterator
+
+DEFAULT_FETCH_CHUNK_SIZE = 50
+
+
+# =========================================================
+# MESSAGE SETS
+# =========================================================
+
+def message_set(ids: Iterable[bytes | str | int]) -> str:
+    """
+    Collapse message ids into an IMAP message set.
+    [1, 2, 3, 7, 9, 10] → "1:3,7,9:10"
+    """
+    numbers = sorted({int(i) for i in ids})
+    if not numbers:
+        return ""
+
+    ranges = []
+    start = prev = numbers[0]
+    for n in numbers[1:]:
+        if n == prev + 1:
+            prev = n
+            continue
+        ranges.append(f"{start}:{prev}" if start != prev else str(start))
+        start = prev = n
+    ranges.append(f"{start}:{prev}" if start != prev else str(start))
+    return ",".join(ranges)
+
+
+def chunked(ids: list, size: int) -> Iterator[list]:
+    size = max(1, int(size))
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+# =========================================================
+# RESPONSE PARSING
+# =========================================================
+
+_DELIMITERS = b" ()"
+
+
+def _skip_ws(buf: bytes, pos: int) -> int:
+    while pos < len(buf) and buf[pos] in b" \r\n":
+        pos += 1
+    return pos
+
+
+def _read_atom(buf: bytes, pos: int) -> tuple[str, int]:
+    start = pos
+    depth = 0
+    while pos < len(buf):
+        ch = buf[pos]
+        if ch == ord("["):
+            depth += 1
+        elif ch == ord("]"):
+            depth -= 1
+        elif depth == 0 and ch in _DELIMITERS:
+            break
+        pos += 1
+    return buf[start:pos].decode("ascii", errors="replace"), pos
+
+
+def _read_quoted(buf: bytes, pos: int) -> tuple[bytes, int]:
+    out = bytearray()
+    pos += 1  # opening quote
+    while pos < len(buf):
+        ch = buf[pos]
+        if ch == ord("\\") and pos + 1 < len(buf):
+            out.append(buf[pos + 1])
+            pos += 2
+            continue
+        if ch == ord('"'):
+            return bytes(out), pos + 1
+        out.append(ch)
+        pos += 1
+    return bytes(out), pos
+
+
+def _read_literal(buf: bytes, pos: int) -> tuple[bytes, int]:
+    end = buf.index(b"}", pos)
+    size = int(buf[pos + 1:end].rstrip(b"+"))
+    start = end + 1
+    return bytes(buf[start:start + size]), start + size
+
+
+def parse_value(buf: bytes, pos: int = 0) -> tuple[Any, int]:
+    """
+    Parse one IMAP value starting at pos.
+    Lists → list, strings/literals → bytes, NIL → None, anything else → str atom.
+    """
+    pos = _skip_ws(buf, pos)
+    ch = buf[pos:pos + 1]
+
+    if ch == b"(":
+        items = []
+        pos += 1
+        while True:
+            pos = _skip_ws(buf, pos)
+            if pos >= len(buf):
+                return items, pos
+            if buf[pos:pos + 1] == b")":
+                return items, pos + 1
+            value, pos = parse_value(buf, pos)
+            items.append(value)
+
+    if ch == b")":
+        return None, pos + 1  # stray close paren, skip it
+
+    if ch == b'"':
+        return _read_quoted(buf, pos)
+
+    if ch == b"{":
+        return _read_literal(buf, pos)
+
+    atom, pos = _read_atom(buf, pos)
+    if atom.upper() == "NIL":
+        return None, pos
+    return atom, pos
+
+
+def _flatten(data: list) -> bytes:
+    """
+    Re-join imaplib's split FETCH data.
+    Tuples are (prefix ending in "{n}", literal); the literal follows its
+    size marker directly so the parser can read it back in place.
+    """
+    buf = bytearray()
+    for item in data:
+        if isinstance(item, tuple):
+            buf += item[0]
+            buf += item[1]
+        elif item:
+            buf += item
+    return bytes(buf)
+
+
+def parse_fetch_response(data: list) -> Iterator[tuple[bytes, dict[str, Any]]]:
+    """
+    Yield (message number, {ITEM: value}) for every message in a FETCH response.
+    Item names are upper-cased, e.g. "UID", "RFC822", "BODY[HEADER]".
+    """
+    buf = _flatten(data)
+    pos = 0
+    while True:
+        pos = _skip_ws(buf, pos)
+        if pos >= len(buf):
+            return
+        seq, pos = _read_atom(buf, pos)
+        values, pos = parse_value(buf, pos)
+        if not isinstance(values, list):
+            continue
+
+        items = {}
+        for i in range(0, len(values) - 1, 2):
+            items[str(values[i]).upper()] = values[i + 1]
+        yield seq.encode("ascii"), items
+
+
+# =========================================================
+# BATCHED FETCH
+# =========================================================
+
+def fetch_batched(
+    server,
+    ids: Iterable[bytes | str | int],
+    items: str = "(RFC822)",
+    chunk_size: int = DEFAULT_FETCH_CHUNK_SIZE,
+    use_uid: bool = False,
+) -> Iterator[tuple[bytes, dict[str, Any]]]:
+    """
+    Fetch `items` for all ids, one FETCH command per chunk.
+    Yields (id, {ITEM: value}); id is the UID when use_uid is set.
+    """
+    ids = list(ids)
+    for chunk in chunked(ids, chunk_size):
+        msg_set = message_set(chunk)
+        if use_uid:
+            typ, data = server.uid("FETCH", msg_set, items)
+        else:
+            typ, data = server.fetch(msg_set, items)
+
+        if typ != "OK" or not data:
+            continue
+
+        for seq, values in parse_fetch_response(data):
+            if use_uid:
+                uid = values.get("UID")
+                if uid is None:
+                    continue  # unsolicited FETCH (flag update etc.)
+                yield str(uid).encode("ascii"), values
+            else:
+                yield seq, values
+
+
+def iter_messages(
+    server,
+    ids: Iterable[bytes | str | int],
+    chunk_size: int = DEFAULT_FETCH_CHUNK_SIZE,
+    use_uid: bool = False,
+) -> Iterator[tuple[bytes, Message]]:
+    """Stream (id, parsed email.message.Message) for the given ids."""
+    for msg_id, values in fetch_batched(server, ids, "(RFC822)", chunk_size, use_uid):
+        raw = values.get("RFC822")
+        if not isinstance(raw, bytes):
+            continue
+        yield msg_id, py_email.message_from_bytes(raw)
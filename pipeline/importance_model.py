@@ -0,0 +1,248 @@
+"""
+Learned importance scores for whole batches of email.
+
+is_important_by_rule only answers yes/no from trusted senders and keyword
+hits. This model scores the mail the rules don't decide. Each email becomes
+a hashed sparse feature vector: its sender address and domain, subject
+tokens, and body tokens, each hashed into one of N_FEATURES slots. A batch
+is scored in one NumPy pass as a logistic model over those slots. The
+weights are learned from the user's spam-review answers (recover/delete)
+that LearningManager records, and the rules "mode" picks the score an
+email needs to count as important.
+
+    model = load_model()            # None until there are enough decisions
+    scores = model.score(emails)    # probabilities, one per email
+"""
+import re
+import zlib
+from dataclasses import dataclass
+from email.utils import parseaddr
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from pipeline.email_utils import Email, is_important_by_rule, needs_body_for_rule
+from pipeline.learning_manager import DECISIONS_FILE, MAX_DECISIONS, load_decisions
+
+ROOT = Path(__file__).resolve().parents[1]
+MODEL_PATH = ROOT / "config" / "importance_model.npz"
+
+# 2**18 float32 weights = 1 MB; collisions are rare at a few thousand emails
+N_FEATURES = 1 << 18
+BODY_CHARS = 2000
+
+# Not worth trusting before it has seen both answers a few times
+MIN_EXAMPLES = 20
+MIN_PER_CLASS = 5
+EPOCHS = 200
+LEARNING_RATE = 0.5
+L2 = 1e-4
+
+# Header-only scores this close to the threshold fetch the body to decide
+BORDERLINE_MARGIN = 0.15
+
+DEFAULT_MODE = "balanced"
+MODE_THRESHOLDS = {
+    "strict": 0.8,
+    "balanced": 0.5,
+    "relaxed": 0.3,
+}
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9'-]*[a-z0-9]")
+
+
+@lru_cache(maxsize=1 << 16)
+def _slot(feature: str) -> int:
+    # crc32 rather than hash(): slots must be stable across processes
+    return zlib.crc32(feature.encode("utf-8")) & (N_FEATURES - 1)
+
+
+def feature_slots(email_obj: Email) -> set[int]:
+    """The hashed features present in one email (binary, so a set)."""
+    _, address = parseaddr(email_obj.sender)
+    address = address.lower().strip()
+    features = set()
+    if address:
+        features.add(_slot("s:" + address))
+        features.add(_slot("d:" + address.rpartition("@")[2]))
+    features.update(_slot("t:" + tok) for tok in _TOKEN.findall((email_obj.subject or "").lower()))
+    features.update(_slot("b:" + tok) for tok in _TOKEN.findall((email_obj.body or "")[:BODY_CHARS].lower()))
+    return features
+
+
+@dataclass
+class FeatureBatch:
+    """
+    Emails as a sparse binary matrix in coordinate form: email `rows[k]`
+    has feature `cols[k]`. `counts` is the number of features per email.
+    """
+
+    rows: np.ndarray
+    cols: np.ndarray
+    counts: np.ndarray
+
+    @property
+    def size(self) -> int:
+        return len(self.counts)
+
+
+def featurize(emails: list[Email]) -> FeatureBatch:
+    slots = [feature_slots(e) for e in emails]
+    counts = np.fromiter((len(s) for s in slots), dtype=np.int64, count=len(slots))
+    cols = np.fromiter((c for s in slots for c in s), dtype=np.int64, count=int(counts.sum()))
+    rows = np.repeat(np.arange(len(slots), dtype=np.int64), counts)
+    return FeatureBatch(rows=rows, cols=cols, counts=counts)
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(x, -30, 30)))
+
+
+def threshold_for(mode: str | None) -> float:
+    """Score an email needs to be important under the rules "mode"."""
+    if mode not in MODE_THRESHOLDS:
+        if mode is not None:
+            print(f"⚠ Unknown mode {mode!r}; using {DEFAULT_MODE}")
+        mode = DEFAULT_MODE
+    return MODE_THRESHOLDS[mode]
+
+
+class ImportanceModel:
+    """Logistic regression over hashed features; one weight per slot."""
+
+    def __init__(self, weights: np.ndarray | None = None, bias: float = 0.0, examples: int = 0):
+        self.weights = weights if weights is not None else np.zeros(N_FEATURES, dtype=np.float32)
+        self.bias = float(bias)
+        self.examples = examples
+
+    def _logits(self, batch: FeatureBatch) -> np.ndarray:
+        # Sum of each email's feature weights, all emails at once
+        totals = np.bincount(batch.rows, weights=self.weights[batch.cols], minlength=batch.size)
+        return totals + self.bias
+
+    def score(self, emails: list[Email] | FeatureBatch) -> np.ndarray:
+        """Probability that each email is important."""
+        batch = emails if isinstance(emails, FeatureBatch) else featurize(emails)
+        if batch.size == 0:
+            return np.zeros(0)
+        return _sigmoid(self._logits(batch))
+
+    def fit(self, emails: list[Email], labels: list[bool], epochs: int = EPOCHS,
+            learning_rate: float = LEARNING_RATE, l2: float = L2) -> "ImportanceModel":
+        """
+        Full-batch gradient descent on the log loss. Each class carries half
+        the total weight (deleted spam far outnumbers recovered mail), and
+        each slot's step is scaled by how many emails have it, so rare
+        tokens learn as fast as common ones.
+        """
+        batch = featurize(emails)
+        y = np.asarray(labels, dtype=np.float64)
+        positives = y.sum()
+        negatives = len(y) - positives
+        sample_weight = np.where(y == 1, 0.5 / max(positives, 1), 0.5 / max(negatives, 1))
+        # Train over the slots that actually occur, not all N_FEATURES
+        active, cols = np.unique(batch.cols, return_inverse=True)
+        frequency = np.bincount(cols, minlength=len(active))
+        step = learning_rate * len(y) / frequency
+
+        weights = np.zeros(len(active))
+        bias = 0.0
+        for _ in range(epochs):
+            logits = np.bincount(batch.rows, weights=weights[cols], minlength=batch.size) + bias
+            error = (_sigmoid(logits) - y) * sample_weight
+            gradient = np.bincount(cols, weights=error[batch.rows], minlength=len(active))
+            weights -= step * (gradient + l2 * weights)
+            bias -= learning_rate * error.sum()
+
+        self.weights = np.zeros(N_FEATURES, dtype=np.float32)
+        self.weights[active] = weights
+        self.bias = bias
+        self.examples = len(y)
+        return self
+
+    def save(self, path: Path = MODEL_PATH) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("wb") as f:
+            np.savez_compressed(f, weights=self.weights, bias=self.bias, examples=self.examples)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path = MODEL_PATH) -> "ImportanceModel | None":
+        try:
+            with np.load(path) as data:
+                return cls(data["weights"], float(data["bias"]), int(data["examples"]))
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+def train_from_decisions(decisions: list[dict[str, Any]]) -> ImportanceModel | None:
+    """A model fit to recorded decisions; None while there are too few of either kind."""
+    labels = [bool(d.get("important")) for d in decisions]
+    positives = sum(labels)
+    if len(labels) < MIN_EXAMPLES or min(positives, len(labels) - positives) < MIN_PER_CLASS:
+        return None
+    emails = [Email(d.get("sender", ""), d.get("subject", ""), d.get("body", ""), "") for d in decisions]
+    return ImportanceModel().fit(emails, labels)
+
+
+def load_model(decisions_path: Path = DECISIONS_FILE, model_path: Path | None = None) -> ImportanceModel | None:
+    """
+    The saved model (next to the decisions unless `model_path` is given),
+    retrained first when decisions were recorded after it was saved. None
+    until there are enough decisions to learn from.
+    """
+    decisions_path = Path(decisions_path)
+    model_path = Path(model_path or decisions_path.with_name(MODEL_PATH.name))
+    if not decisions_path.exists():
+        return None
+    if model_path.exists() and model_path.stat().st_mtime_ns >= decisions_path.stat().st_mtime_ns:
+        model = ImportanceModel.load(model_path)
+        if model is not None:
+            return model
+
+    model = train_from_decisions(load_decisions(decisions_path, MAX_DECISIONS))
+    if model is not None:
+        model.save(model_path)
+        print(f"🧠 Importance model trained on {model.examples} decisions")
+    return model
+
+
+# =========================================================
+# RULES + MODEL
+# =========================================================
+
+def needs_body(email_obj: Email, config: dict, model: ImportanceModel | None) -> bool:
+    """
+    Header-first triage with a model. The body is fetched when a priority
+    keyword could still be in it, or when the header-only score is within
+    BORDERLINE_MARGIN of the threshold; clear scores are final without it.
+    """
+    if needs_body_for_rule(email_obj, config):
+        return True
+    if model is None or is_important_by_rule(email_obj, config)[0]:
+        return False
+    score = model.score([email_obj])[0]
+    return abs(score - threshold_for(config.get("mode"))) < BORDERLINE_MARGIN
+
+
+def classify(emails: list[Email], config: dict, model: ImportanceModel | None) -> list[tuple[bool, str]]:
+    """
+    (important, reason) per email. Trusted senders and priority keywords
+    still decide on their own; the model scores everything they leave
+    undecided, in one batch, against the threshold for config["mode"].
+    """
+    results = [is_important_by_rule(e, config) for e in emails]
+    if model is None:
+        return results
+
+    undecided = [i for i, (important, _) in enumerate(results) if not important]
+    if undecided:
+        threshold = threshold_for(config.get("mode"))
+        scores = model.score([emails[i] for i in undecided])
+        for i, score in zip(undecided, scores):
+            results[i] = (bool(score >= threshold), f"model:{score:.2f}")
+    return results
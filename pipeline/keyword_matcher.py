@@ -0,0 +1,141 @@
+"""
+Compiled multi-keyword matcher for large keyword lists.
+
+Lists of LOOP_THRESHOLD keywords or more (and any list matched on word
+boundaries) are merged into one trie-shaped regex, so the text is scanned
+once and shared prefixes are only compared once. Smaller lists keep the
+plain per-keyword substring checks: below the threshold the regex is no
+faster (see benchmarks/bench_keyword_matcher.py). Matching is
+case-insensitive either way.
+"""
+import re
+from functools import lru_cache
+from typing import Iterable
+
+# Below this many keywords, C-level substring search per keyword beats the
+# combined regex (see benchmarks/bench_keyword_matcher.py).
+LOOP_THRESHOLD = 150
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    Build a regex equivalent to "w1|w2|..." where common prefixes are
+    factored out, e.g. ["dead", "deadline", "demo"] → "de(?:ad(?:line)?|mo)".
+    Optional tails are greedy, so the longest keyword at a position wins.
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node: dict) -> str:
+        is_end = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch != ""]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not is_end:
+            return branches[0]
+        pattern = "(?:" + "|".join(branches) + ")"
+        return pattern + "?" if is_end else pattern
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    Finds every configured keyword present in a text in a single pass.
+    """
+
+    def __init__(self, keywords: Iterable[str], word_boundary: bool = False):
+        self.keywords: list[str] = []
+        seen = set()
+        for keyword in keywords:
+            keyword = keyword.lower()
+            if keyword and keyword not in seen:
+                seen.add(keyword)
+                self.keywords.append(keyword)
+
+        self.word_boundary = word_boundary
+        self._order = {k: i for i, k in enumerate(self.keywords)}
+
+        # Shorter keywords that are prefixes of a longer one, e.g. "dead" for "deadline":
+        # the regex reports only the longest match at a position, these fill in the rest.
+        self._prefixes = {
+            k: [p for p in self.keywords if p != k and k.startswith(p)]
+            for k in self.keywords
+        }
+
+        self._regex = None
+        self._use_loop = not word_boundary and len(self.keywords) < LOOP_THRESHOLD
+        if self.keywords and not self._use_loop:
+            trie = _trie_pattern(self.keywords)
+            if word_boundary:
+                pattern = rf"({trie})(?!\w)"
+            else:
+                pattern = rf"({trie})"
+            self._regex = re.compile(pattern)
+
+    def find_all(self, text: str) -> list[str]:
+        """Every keyword that occurs in text, in configured keyword order."""
+        if not self.keywords or not text:
+            return []
+
+        text = text.lower()
+        if self._use_loop:
+            return [k for k in self.keywords if k in text]
+
+        found = set()
+        pos = 0
+        while True:
+            # search() jumps straight to the next candidate in C; restarting one
+            # character after each hit also catches overlapping keywords.
+            match = self._regex.search(text, pos)
+            if match is None:
+                break
+            start = match.start(1)
+            pos = start + 1
+            if self.word_boundary and start > 0 and _is_word_char(text[start - 1]):
+                continue
+            keyword = match.group(1)
+            found.add(keyword)
+            for prefix in self._prefixes[keyword]:
+                if prefix in found:
+                    continue
+                end = start + len(prefix)
+                if self.word_boundary and end < len(text) and _is_word_char(text[end]):
+                    continue
+                found.add(prefix)
+            if len(found) == len(self.keywords):
+                break
+        return sorted(found, key=self._order.__getitem__)
+
+    def first(self, text: str) -> str | None:
+        """The first configured keyword present in text (config order), if any."""
+        found = self.find_all(text)
+        return found[0] if found else None
+
+    def matches(self, text: str) -> bool:
+        if not self.keywords or not text:
+            return False
+        if self._use_loop:
+            text = text.lower()
+            return any(k in text for k in self.keywords)
+        if not self.word_boundary:
+            return self._regex.search(text.lower()) is not None
+        return bool(self.find_all(text))
+
+
+@lru_cache(maxsize=64)
+def _compile(keywords: tuple[str, ...], word_boundary: bool) -> KeywordMatcher:
+    return KeywordMatcher(keywords, word_boundary)
+
+
+def compile_keywords(keywords: Iterable[str], word_boundary: bool = False) -> KeywordMatcher:
+    """Return a cached matcher; it is only rebuilt when the keyword list changes."""
+    return _compile(tuple(keywords), word_boundary)
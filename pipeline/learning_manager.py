@@ -1,83 +1,165 @@
 import json
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List
 from email.utils import parseaddr
 
+from pipeline.config_service import DEFAULT_CONFIG, RULES_PATH, get_config_service
+from pipeline.email_utils import Email, SenderIndex
+from pipeline.keyword_matcher import compile_keywords
+
 
 ROOT = Path(__file__).resolve().parents[1]
 CONFIG_DIR = ROOT / "config"
-EMAIL_RULES_FILE = CONFIG_DIR / "email_rules.json"
+EMAIL_RULES_FILE = RULES_PATH
+# Review answers (recover/delete) the importance model learns from, one JSON object per line
+DECISIONS_FILE = CONFIG_DIR / "decisions.jsonl"
+MAX_DECISIONS = 5000
+DECISION_BODY_CHARS = 1000
+
 
+DEFAULT_RULES = DEFAULT_CONFIG
 
-DEFAULT_RULES = {
-    "trusted_senders": [],
-    "ignored_keywords": [],
-    "priority_keywords": [],
-    "mode": "balanced"
-}
+
+def load_decisions(path: Path = DECISIONS_FILE, limit: int = MAX_DECISIONS) -> List[Dict[str, Any]]:
+    """The most recent `limit` recorded decisions, oldest first."""
+    try:
+        lines = Path(path).read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return []
+    decisions = []
+    for line in lines[-limit:]:
+        try:
+            decisions.append(json.loads(line))
+        except ValueError:
+            continue
+    return decisions
 
 
 class LearningManager:
     """
-    Manages email_rules.json directly.
+    Manages email_rules.json through the shared ConfigService.
+
+    Trusted senders are held in a set-backed index (addresses and @domains).
+    Additions only mark the rules dirty; call flush() (or use the manager as a
+    context manager) to write email_rules.json once at the end of a batch.
+    When the file is changed elsewhere (rules CLI, another run) the index is
+    rebuilt from the new rules, keeping any additions not yet flushed.
+
+    Recover/delete decisions are buffered the same way and appended to
+    decisions.jsonl on flush(), for the importance model to learn from.
     """
 
-    def __init__(self, rules_file: Path = EMAIL_RULES_FILE):
+    def __init__(self, rules_file: Path = EMAIL_RULES_FILE, decisions_file: Path | None = None):
         self.rules_file = rules_file
+        # Kept next to the rules they were learned alongside
+        self.decisions_file = Path(decisions_file or Path(rules_file).with_name(DECISIONS_FILE.name))
+        self._decisions: List[Dict[str, Any]] = []
+        self._service = get_config_service(rules_file)
         self.data = self._load_rules()
+        self._trusted = SenderIndex(self.data["trusted_senders"])
+        # Entries added since the last flush; only these survive an external edit
+        self._pending: Dict[str, List[str]] = {"trusted_senders": [], "ignored_keywords": []}
+        self._dirty = False
+        self._saving = False
+        self._service.subscribe(self._on_rules_changed)
+
+    def __enter__(self) -> "LearningManager":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.flush()
 
     def _load_rules(self) -> Dict[str, Any]:
-        if self.rules_file.exists():
-            try:
-                with self.rules_file.open("r", encoding="utf-8") as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"Error loading rules: {e}. Using defaults.")
-                return DEFAULT_RULES.copy()
-        return DEFAULT_RULES.copy()
+        return self._service.snapshot()
+
+    def _on_rules_changed(self, config: Dict[str, Any]) -> None:
+        if self._saving:
+            return
+        # Re-apply additions that haven't been flushed yet, and nothing else:
+        # an entry removed elsewhere (rules CLI, hand edit) stays removed
+        self.data = self._load_rules()
+        for key, values in self._pending.items():
+            self.data[key] += [v for v in values if v not in self.data[key]]
+        self._trusted = SenderIndex(self.data["trusted_senders"])
 
     def save_rules(self) -> None:
+        # Merge with whatever is on disk now so concurrent edits aren't lost
+        self._service.reload()
         try:
-            self.rules_file.parent.mkdir(parents=True, exist_ok=True)
-
-            temp_file = self.rules_file.with_suffix(".tmp")
-            with temp_file.open("w", encoding="utf-8") as f:
-                json.dump(self.data, f, indent=2, ensure_ascii=False)
-
-            temp_file.replace(self.rules_file)
+            self._saving = True
+            self._service.save(self.data)
             print("email_rules.json updated successfully.")
 
         except Exception as e:
             print(f"Error saving rules: {e}")
+        finally:
+            self._saving = False
+
+    def save_decisions(self) -> None:
+        lines = [json.dumps(d, ensure_ascii=False) + "\n" for d in self._decisions]
+        try:
+            self.decisions_file.parent.mkdir(parents=True, exist_ok=True)
+            with self.decisions_file.open("a", encoding="utf-8") as f:
+                f.writelines(lines)
+            self._decisions = []
+            # Compact once the log holds twice what the model reads
+            kept = load_decisions(self.decisions_file, MAX_DECISIONS * 2 + 1)
+            if len(kept) > MAX_DECISIONS * 2:
+                tmp = self.decisions_file.with_suffix(".tmp")
+                with tmp.open("w", encoding="utf-8") as f:
+                    f.writelines(json.dumps(d, ensure_ascii=False) + "\n" for d in kept[-MAX_DECISIONS:])
+                tmp.replace(self.decisions_file)
+
+        except Exception as e:
+            print(f"Error saving decisions: {e}")
+
+    def flush(self) -> None:
+        """Write pending additions and decisions to disk, once."""
+        if self._dirty:
+            self.save_rules()
+            self._dirty = False
+            for values in self._pending.values():
+                values.clear()
+        if self._decisions:
+            self.save_decisions()
 
     # =========================
     # ADD FUNCTIONS
     # =========================
 
     def add_trusted_sender(self, sender: str):
-        email = self._extract_email(sender)
+        entry = SenderIndex.normalize(sender)
 
-        if email and email not in self.data["trusted_senders"]:
-            self.data["trusted_senders"].append(email)
-            self.save_rules()
+        if self._trusted.add(entry):
+            self.data["trusted_senders"].append(entry)
+            self._pending["trusted_senders"].append(entry)
+            self._dirty = True
 
     def add_ignored_keyword(self, keyword: str):
         keyword = keyword.lower().strip()
         if keyword and keyword not in self.data["ignored_keywords"]:
             self.data["ignored_keywords"].append(keyword)
-            self.save_rules()
+            self._pending["ignored_keywords"].append(keyword)
+            self._dirty = True
+
+    def record_decision(self, email_obj: Email, important: bool):
+        """Remember that this email was recovered (important) or deleted."""
+        self._decisions.append({
+            "sender": email_obj.sender,
+            "subject": email_obj.subject,
+            "body": (email_obj.body or "")[:DECISION_BODY_CHARS],
+            "important": important,
+        })
 
     # =========================
     # CHECK FUNCTIONS
     # =========================
 
     def is_trusted_sender(self, sender: str) -> bool:
-        email = self._extract_email(sender)
-        return email in self.data["trusted_senders"]
+        return sender in self._trusted
 
     def has_ignored_keywords(self, text: str) -> bool:
-        text = text.lower()
-        return any(k in text for k in self.data["ignored_keywords"])
+        return compile_keywords(self.data.get("ignored_keywords", [])).matches(text)
 
     # =========================
     # UTIL
@@ -0,0 +1,76 @@
+"""
+Parsed-message cache.
+
+Stores the normalized Email record (sender, decoded subject, cleaned body,
+attachment metadata) keyed by Message-ID + RFC822 size, so messages seen in an
+earlier run, or earlier in this run (spam → inbox recovery), skip MIME parsing
+and body extraction.
+"""
+from pathlib import Path
+
+from pipeline.disk_cache import DiskCache
+from pipeline.email_utils import Email
+
+ROOT = Path(__file__).resolve().parents[1]
+MESSAGE_CACHE_DB = ROOT / "config" / "message_cache.sqlite3"
+DEFAULT_MAX_ENTRIES = 5000
+
+
+class MessageCache:
+    """
+    Email records on disk with LRU eviction.
+    """
+
+    def __init__(self, path: Path = MESSAGE_CACHE_DB, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.cache = DiskCache(path, max_entries=max_entries)
+
+    @staticmethod
+    def key(message_id: str, size: int) -> str | None:
+        message_id = (message_id or "").strip()
+        if not message_id:
+            return None  # nothing stable to key on
+        return f"{message_id}|{int(size)}"
+
+    def get(self, message_id: str, size: int, folder: str) -> tuple[Email, bool] | None:
+        """Return (Email, body_loaded) or None on a miss."""
+        key = self.key(message_id, size)
+        if key is None:
+            return None
+        record = self.cache.get(key)
+        if record is None:
+            return None
+        email_obj = Email(
+            sender=record["sender"],
+            subject=record["subject"],
+            body=record["body"],
+            folder=folder,
+            message_id=message_id.strip(),
+            attachments=record.get("attachments", []),
+        )
+        return email_obj, record.get("body_loaded", True)
+
+    def put(self, email_obj: Email, size: int, body_loaded: bool = True) -> None:
+        key = self.key(email_obj.message_id, size)
+        if key is None:
+            return
+        self.cache.put(key, {
+            "sender": email_obj.sender,
+            "subject": email_obj.subject,
+            "body": email_obj.body,
+            "attachments": email_obj.attachments,
+            "body_loaded": body_loaded,
+        })
+
+    @property
+    def hits(self) -> int:
+        return self.cache.hits
+
+    @property
+    def misses(self) -> int:
+        return self.cache.misses
+
+    def stats(self) -> dict[str, int]:
+        return self.cache.stats()
+
+    def close(self) -> None:
+        self.cache.close()
@@ -0,0 +1,101 @@
+"""
+Stage-graph executor for the daily pipeline.
+
+Each stage declares the stages it depends on. Stages whose dependencies are
+done start immediately: blocking functions are offloaded to worker threads
+with asyncio.to_thread, coroutine functions are awaited directly. A stage
+added with `on_loop=True` runs on the event loop's own thread instead (the
+main thread under run()), for work such as Tk dialogs that must not run on
+a worker thread. Wall-clock time per stage is recorded in `timings`, and
+finished results in `results`, even when another stage fails.
+"""
+import asyncio
+import inspect
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+
+@dataclass
+class Stage:
+    name: str
+    func: Callable[[dict[str, Any]], Any]
+    deps: tuple[str, ...] = ()
+    on_loop: bool = False
+
+
+@dataclass
+class StageGraph:
+    stages: dict[str, Stage] = field(default_factory=dict)
+    timings: dict[str, float] = field(default_factory=dict)
+    results: dict[str, Any] = field(default_factory=dict)
+
+    def add(self, name: str, func: Callable[[dict[str, Any]], Any], deps: tuple[str, ...] = (),
+            on_loop: bool = False) -> None:
+        """
+        Register a stage. `func` receives {dep_name: dep_result} for its
+        declared dependencies and returns the stage result. With `on_loop`
+        a blocking `func` runs on the loop thread; other stages already
+        running on worker threads keep going meanwhile.
+        """
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        self.stages[name] = Stage(name=name, func=func, deps=tuple(deps), on_loop=on_loop)
+
+    def _validate(self) -> None:
+        for stage in self.stages.values():
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+
+        visiting, done = set(), set()
+
+        def visit(name: str) -> None:
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle at stage '{name}'")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    async def _run_stage(self, stage: Stage, tasks: dict[str, asyncio.Task]) -> Any:
+        dep_results = {dep: await tasks[dep] for dep in stage.deps}
+
+        start = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(stage.func):
+                result = await stage.func(dep_results)
+            elif stage.on_loop:
+                result = stage.func(dep_results)
+            else:
+                result = await asyncio.to_thread(stage.func, dep_results)
+            self.results[stage.name] = result
+            return result
+        finally:
+            self.timings[stage.name] = round(time.perf_counter() - start, 3)
+
+    async def run_async(self) -> dict[str, Any]:
+        """Run every stage; returns {stage_name: result}."""
+        self._validate()
+        self.results = {}
+        tasks: dict[str, asyncio.Task] = {}
+        for name, stage in self.stages.items():
+            tasks[name] = asyncio.ensure_future(self._run_stage(stage, tasks))
+
+        outcomes = await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+        results = {}
+        for name, outcome in zip(tasks, outcomes):
+            if isinstance(outcome, BaseException):
+                raise outcome
+            results[name] = outcome
+        return results
+
+    def run(self) -> dict[str, Any]:
+        return asyncio.run(self.run_async())
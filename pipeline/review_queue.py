@@ -0,0 +1,145 @@
+"""
+Deferred review queue for rule-matched spam.
+
+Instead of stopping the sweep on a modal prompt per message, the spam pass
+records each message that needs a human decision and keeps going. The
+pending set is shown once (AlertManager.review_batch) and the answers are
+applied with the same bulk MOVE/STORE as the automatic decisions.
+
+With a path the queue is kept on disk, so undecided items survive to the
+next run and can also be reviewed on their own:
+
+    python -m pipeline.review_queue
+"""
+import json
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+REVIEW_QUEUE_PATH = ROOT / "config" / "review_queue.json"
+CRED_PATH = ROOT / "config" / "email_credentials.json"
+
+
+@dataclass
+class ReviewItem:
+    account: str
+    folder: str
+    uidvalidity: int
+    uid: str
+    sender: str
+    subject: str
+    preview: str = ""
+    reason: str = ""
+    queued_at: str = field(default_factory=lambda: datetime.now().isoformat(timespec="seconds"))
+
+    @property
+    def key(self) -> tuple[str, str, int, str]:
+        return (self.account, self.folder, self.uidvalidity, self.uid)
+
+
+class ReviewQueue:
+    """
+    Messages waiting for a move/delete decision. In memory unless `path` is set.
+    """
+
+    def __init__(self, path: Path | None = None):
+        self.path = Path(path) if path else None
+        self.items: dict[tuple, ReviewItem] = {}
+        if self.path and self.path.exists():
+            try:
+                with self.path.open("r", encoding="utf-8") as f:
+                    for record in json.load(f):
+                        item = ReviewItem(**record)
+                        self.items[item.key] = item
+            except (OSError, ValueError, TypeError) as e:
+                print(f"⚠ Review queue load failed: {e}")
+
+    def add(self, item: ReviewItem) -> bool:
+        if item.key in self.items:
+            return False
+        self.items[item.key] = item
+        return True
+
+    def pending(self, account: str, folder: str, uidvalidity: int | None = None) -> list[ReviewItem]:
+        """
+        Items for one folder, oldest first. Items recorded under a different
+        UIDVALIDITY point at UIDs that no longer exist and are dropped.
+        """
+        items = []
+        for key, item in list(self.items.items()):
+            if item.account != account or item.folder != folder:
+                continue
+            if uidvalidity is not None and item.uidvalidity != uidvalidity:
+                del self.items[key]
+                continue
+            items.append(item)
+        return sorted(items, key=lambda i: int(i.uid))
+
+    def discard(self, items) -> None:
+        for item in items:
+            self.items.pop(item.key, None)
+
+    def folders(self) -> list[tuple[str, str]]:
+        return sorted({(item.account, item.folder) for item in self.items.values()})
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump([asdict(item) for item in self.items.values()], f, indent=2)
+        tmp.replace(self.path)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+# =========================================================
+# STANDALONE REVIEW
+# =========================================================
+
+def main() -> None:
+    """Review everything in the on-disk queue without running the pipeline."""
+    from pipeline.alert_manager import AlertManager
+    from pipeline.imap_connection import IMAPConnection
+    from pipeline.learning_manager import LearningManager
+    from pipeline.spam_processor import apply_decisions, new_metrics, review_examples, split_decisions
+    from pipeline.sync_state import response_int
+    from pipeline.user_setup import load_credentials
+
+    queue = ReviewQueue(REVIEW_QUEUE_PATH)
+    if not len(queue):
+        print("Nothing waiting for review.")
+        return
+
+    # Same sources as run(): the file and/or ASSISTANT_* variables
+    creds = load_credentials(CRED_PATH)
+    alert_manager = AlertManager()
+
+    with IMAPConnection.from_creds(creds) as server, LearningManager() as learning_manager:
+        for account, folder in queue.folders():
+            if account != creds["email"]:
+                continue
+            typ, _ = server.select(folder)
+            if typ != "OK":
+                continue
+            pending = queue.pending(account, folder, response_int(server, "UIDVALIDITY"))
+            if not pending:
+                continue
+            decisions = alert_manager.review_batch(pending)
+            if decisions is None:
+                continue  # "Later": keep them queued
+            metrics = new_metrics()
+            done = apply_decisions(server, *split_decisions(pending, decisions), learning_manager, metrics,
+                                   review_examples(pending))
+            # A failed MOVE/STORE keeps its items queued for the next review
+            queue.discard([item for item in pending if item.uid.encode("ascii") in done])
+            print(f"✓ {folder}: {metrics['recovered']} recovered, {metrics['deleted']} deleted")
+
+    queue.save()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,193 +1,255 @@
-from logging import config
-import os
 from pathlib import Path
-import json
-import re
 from datetime import date
 from typing import Any
-import imaplib
-import email as py_email
-from email.header import decode_header
-from pipeline.downloads_cleanup import cleanup_downloads
-from pipeline.ai_summary import generate_daily_summary
-from pipeline.calendar_integration import GoogleCalendarIntegration
+from pipeline.downloads_cleanup import (
+    DEFAULT_FILE_TIMEOUT,
+    DEFAULT_MAX_WORKERS,
+    TierStats,
+    cleanup_downloads,
+)
+from pipeline.config_service import RULES_PATH, get_config_service
+from pipeline.attachments import AttachmentDescriptor, iter_message_attachments
 from pipeline.spam_processor import process_spam_folder
-from pipeline.email_utils import Email, extract_body, is_important_by_rule
-from pipeline.user_setup import collect_user_preferences
+from pipeline.extraction_cache import ExtractionCache
+from pipeline.email_utils import DEFAULT_BODY_MAX_BYTES, Email
+from pipeline.header_triage import DEFAULT_FETCH_MODE, iter_emails
+from pipeline.imap_connection import (
+    DEFAULT_IDLE_SECONDS,
+    DEFAULT_KEEPALIVE_SECONDS,
+    IMAPConnection,
+    serve_forever,
+)
+from pipeline.imap_fetch import DEFAULT_FETCH_CHUNK_SIZE
+from pipeline.orchestrator import StageGraph
+from pipeline.message_cache import DEFAULT_MAX_ENTRIES, MessageCache
+from pipeline.review_queue import REVIEW_QUEUE_PATH, ReviewQueue
+from pipeline.sync_state import FolderSync, SyncStateStore
+from pipeline.user_setup import add_rules_arguments, apply_env_overrides, load_credentials, rules_command
 
-import tkinter as tk
-from tkinter import simpledialog  # <-- added for user input
+# Heavy dependencies (tkinter, Google API client, requests, OCR/PDF/DOCX
+# parsers) are imported inside the stage that needs them, so an email-only
+# run never loads them. benchmarks/bench_startup.py tracks the import cost.
 
 ROOT = Path(__file__).resolve().parents[1]
-CONFIG_PATH = ROOT / "config" / "email_rules.json"
+CONFIG_PATH = RULES_PATH
 CRED_PATH = ROOT / "config" / "email_credentials.json"
 REPORT_PATH = ROOT / "reports/Daily_Productivity_Report.txt"
+# The AI summary streams here as it is generated (tail -f friendly); folded
+# into REPORT_PATH and removed once the report is written
+SUMMARY_PARTIAL_PATH = ROOT / "reports/Daily_Summary.partial.txt"
 
 # -----------------------------
 # Existing functions (unchanged)
 # -----------------------------
-def _extract_attachments(msg) -> list[dict[str, Any]]:
-    attachments = []
-    for part in msg.walk():
-        if part.get_content_maintype() == 'multipart':
-            continue
-        filename = part.get_filename()
-        if not filename:
-            continue
-        if isinstance(filename, str):
-            try:
-                filename = filename.encode('utf-8').decode('utf-8')
-            except:
-                pass
-        content = part.get_payload(decode=True)
-        content_type = part.get_content_type()
-        attachments.append({
-            'filename': filename,
-            'content': content,
-            'content_type': content_type,
-        })
-    return attachments
+def _extract_attachments(msg) -> list[AttachmentDescriptor]:
+    # Metadata only; payloads are decoded when a descriptor is open()ed
+    return list(iter_message_attachments(msg))
 
 def load_config(path: Path = CONFIG_PATH) -> dict[str, Any]:
-    with path.open("r", encoding="utf-8") as f:
-        config = json.load(f)
-    config.setdefault("trusted_senders", [])
-    config.setdefault("priority_keywords", [])
-    return config
+    # A private copy: env overrides are layered on top for this run only
+    return get_config_service(path).snapshot()
 
 # -----------------------------
-# Main run function
+# Pipeline stages
 # -----------------------------
-def run() -> dict[str, Any]:
-    # ✅ Collect user preferences (credentials only once, rules every run)
-    config = collect_user_preferences()
-
-    # --- Load credentials & config ---
-    with CRED_PATH.open("r", encoding="utf-8") as f:
-        creds = json.load(f)
-    config = load_config(CONFIG_PATH)
-
+def _connect(creds: dict[str, Any], config: dict[str, Any]) -> dict[str, Any]:
     print("Connecting...")
-    server = imaplib.IMAP4_SSL(creds["imap_server"], creds["imap_port"])
-    server.login(creds["email"], creds["password"])
+    # Owns login, keepalive and reconnects; passed around as the IMAP server
+    server = IMAPConnection.from_creds(
+        creds, keepalive=config.get("imap_keepalive", DEFAULT_KEEPALIVE_SECONDS)
+    ).connect()
     print("Connected.")
 
-    # Step 1: Handle SPAM folder
-    spam_metrics = process_spam_folder(server, use_alerts=True)
-    metrics = {
-        "spam_reviewed": spam_metrics.get("reviewed", 0),
-        "spam_deleted": spam_metrics.get("deleted", 0),
-        "spam_recovered": spam_metrics.get("recovered", 0),
+    return {
+        "server": server,
+        "account": creds["email"],
+        # Incremental sync: only mail newer than the last processed UID
+        "sync_store": SyncStateStore(),
+        "condstore": server.condstore,
+        # Parsed-message cache shared by the spam and inbox passes
+        "message_cache": MessageCache(max_entries=config.get("message_cache_entries", DEFAULT_MAX_ENTRIES)),
+        "fetch_chunk_size": config.get("fetch_chunk_size", DEFAULT_FETCH_CHUNK_SIZE),
+        "fetch_mode": config.get("fetch_mode", DEFAULT_FETCH_MODE),
+        "body_max_bytes": config.get("body_max_bytes", DEFAULT_BODY_MAX_BYTES),
+        # Rule-matched spam waits in a queue instead of a prompt per message;
+        # persisted queues survive "decide later" and deferred review
+        "review_queue": ReviewQueue(
+            REVIEW_QUEUE_PATH
+            if config.get("review_persist") or config.get("review_deferred")
+            else None
+        ),
+        "review_deferred": bool(config.get("review_deferred", False)),
     }
+
+
+def _scan_spam(session: dict[str, Any], config: dict[str, Any]) -> dict[str, Any]:
+    spam_metrics = process_spam_folder(
+        session["server"],
+        use_alerts=True,
+        chunk_size=session["fetch_chunk_size"],
+        fetch_mode=session["fetch_mode"],
+        sync_store=session["sync_store"],
+        account=session["account"],
+        condstore=session["condstore"],
+        cache=session["message_cache"],
+        body_max_bytes=session["body_max_bytes"],
+        review_queue=session["review_queue"],
+        review_deferred=session["review_deferred"],
+        config=config,
+    )
     print("Spam folder processing done.")
-        
-    # Fetch Inbox emails
-    server.select("INBOX")
-    status, messages = server.search(None, "ALL")
+    return spam_metrics
+
+
+def _close_session(session: dict[str, Any]) -> None:
+    # Idempotent: the inbox stage closes it early, run() again if a stage failed
+    if session.get("closed"):
+        return
+    session["closed"] = True
+    session["sync_store"].close()
+    session["message_cache"].close()
+    session["server"].logout()
+
+
+def _scan_inbox(session: dict[str, Any], config: dict[str, Any], close_session: bool = True) -> dict[str, Any]:
+    # numpy stays out of startup; see benchmarks/bench_startup.py
+    from pipeline.importance_model import classify, load_model, needs_body
+
+    server = session["server"]
+    message_cache = session["message_cache"]
     inbox_mails = []
     important_items = []
 
+    status, _ = server.select("INBOX")
     if status == "OK":
-        mail_ids = messages[0].split()[-10:]
-        for uid in mail_ids:
-            typ, msg_data = server.fetch(uid, "(RFC822)")
-            if typ != "OK":
-                continue
-            msg = py_email.message_from_bytes(msg_data[0][1])
-
-            subject = ""
-            if msg["Subject"]:
-                for part, enc in decode_header(msg["Subject"]):
-                    if isinstance(part, bytes):
-                        subject += part.decode(enc or "utf-8", errors="ignore")
-                    else:
-                        subject += part
-
-            sender = msg.get("From", "")
-            body = extract_body(msg)
-            email_obj = Email(sender=sender, subject=subject, body=body, folder="INBOX")
+        inbox_sync = FolderSync(
+            server, session["sync_store"], session["account"], "INBOX",
+            initial_window=config.get("initial_sync_window", 10),
+            condstore=session["condstore"],
+        )
+        mail_ids = inbox_sync.new_uids()
+        model = load_model()
+        processed = []
+        for uid, email_obj in iter_emails(
+            server,
+            mail_ids,
+            folder="INBOX",
+            needs_body=lambda e: needs_body(e, config, model),
+            chunk_size=session["fetch_chunk_size"],
+            use_uid=True,
+            mode=session["fetch_mode"],
+            cache=message_cache,
+            body_max_bytes=session["body_max_bytes"],
+        ):
             inbox_mails.append(email_obj)
+            processed.append(uid)
 
-
-            is_important, _ = is_important_by_rule(email_obj, config)
+        # Rules first, then one model pass over whatever they left undecided
+        for email_obj, (is_important, _) in zip(inbox_mails, classify(inbox_mails, config, model)):
             if is_important:
                 important_items.append(email_obj)
 
-    # GOOGLE CALENDAR INTEGRATION
+        inbox_sync.commit(processed)
+
+    cache_stats = {"hits": message_cache.hits, "misses": message_cache.misses}
+    if close_session:
+        _close_session(session)
+
+    return {
+        "inbox_mails": inbox_mails,
+        "important_items": important_items,
+        "message_cache": cache_stats,
+    }
+
+
+def _create_calendar_events(important_items: list[Email]) -> dict[str, int]:
+    from pipeline.calendar_integration import CalendarEventIndex, GoogleCalendarIntegration, event_key
+
+    # Signs in lazily: only if some email doesn't have its event yet
     calendar_client = GoogleCalendarIntegration()
-    success, msg = calendar_client.authenticate()
-    print(f"Google Calendar: {msg}")
 
-    calendar_metrics = {"events_created": 0, "errors": 0}
+    calendar_metrics = {"events_created": 0, "events_skipped": 0, "errors": 0}
+    if not important_items:
+        return calendar_metrics
+    events = []
     for email_obj in important_items:
-        try:
-            title = (email_obj.subject or email_obj.body or "Email Event")[:70]
-            description = title
-        
-            success, event_id, event_link_or_msg = calendar_client.create_event(title=title, description=description)
-
-            if success:
-                calendar_metrics['events_created'] += 1
-                print(f"✓ Calendar event created: {title}")
-                print(f"  View event: {event_link_or_msg}")
-            else:
-                calendar_metrics['errors'] += 1
-                print(f"✗ Failed to create event: {event_link_or_msg}")
-
-        except Exception as e:
-              calendar_metrics['errors'] += 1
-              print(f"Calendar error: {e}")
-
-    # DOWNLOADS CLEANUP
-    files_organized = cleanup_downloads()
-    print(f"Files organized from Downloads: {files_organized}")
+        title = (email_obj.subject or email_obj.body or "Email Event")[:70]
+        events.append((event_key(email_obj), title, title))
 
-    # Update metrics
-    metrics.update({
-        "inbox_scanned": len(inbox_mails),
-        "important_flagged": len(important_items),
-        "files_organized": files_organized,
-        "calendar_events_created": calendar_metrics['events_created'],
-        "calendar_errors": calendar_metrics['errors'],
-    })
-
-    # Prepare AI summary
-    structured_emails = []
-    for e in important_items:
-        subj = (e.subject or "").strip()
-        body = (e.body or "").strip().replace("\n", " ")
-        if subj and subj.lower() not in ["no subject", ""]:
-            structured_emails.append(subj[:200])
-        elif body:
-            structured_emails.append(body[:200])
+    # Batched inserts; mail that already has an event is skipped
+    index = CalendarEventIndex()
+    try:
+        outcomes = calendar_client.create_events(events, index=index)
+    finally:
+        index.close()
+
+    titles = {key: title for key, title, _ in events}
+    for key, outcome in outcomes.items():
+        if outcome.status == "created":
+            calendar_metrics['events_created'] += 1
+            print(f"✓ Calendar event created: {titles[key]}")
+            print(f"  View event: {outcome.detail}")
+        elif outcome.status == "existing":
+            calendar_metrics['events_skipped'] += 1
         else:
-            structured_emails.append(f"Email from {e.sender}")
-
-    if structured_emails:
-        summary_prompt_data = f"""
-You are an executive productivity assistant.
-Generate a DAILY EMAIL SUMMARY for {len(important_items)} emails.
-STRICT OUTPUT RULES (MUST FOLLOW):
-- Use ONLY numbered bullets starting with "1.", "2.", "3."
-- One numbered point per email
-- Maximum 2 short sentences per bullet
-- Insert EXACTLY one blank line after each numbered point
-- Do NOT add headings like CONTEXT, ACTION ITEMS, or ID
-- Do NOT add raw URLs
-- Do NOT repeat sender or subject labels
-- Do NOT invent information
-- Ignore marketing language and promotional fluff
-- Focus on meaningful updates, requests, or "deadlines"
-- All important emails summary must be included as per number of important emails.
-
-Emails:
-{chr(10).join(structured_emails)}
-"""
-        ai_summary = generate_daily_summary(summary_prompt_data)
+            calendar_metrics['errors'] += 1
+            print(f"✗ Failed to create event: {outcome.detail}")
+
+    return calendar_metrics
+
+
+def _cleanup_downloads(config: dict[str, Any]) -> dict[str, Any]:
+    extraction_cache = ExtractionCache()
+    tier_stats = TierStats()
+    try:
+        files_organized = cleanup_downloads(
+            max_workers=config.get("ocr_workers", DEFAULT_MAX_WORKERS),
+            timeout=config.get("ocr_timeout", DEFAULT_FILE_TIMEOUT),
+            cache=extraction_cache,
+            stats=tier_stats,
+        )
+    finally:
+        extraction_cache.close()
+    print(f"Files organized from Downloads: {files_organized}")
+    return {"files_organized": files_organized, "tiers": tier_stats.as_dict()}
+
+
+def _summarize(important_items: list[Email], config: dict[str, Any] | None = None) -> dict[str, Any]:
+    if not important_items:
+        return {"text": "No important emails detected today.", "llm": None, "backend": None, "fallback": None}
+
+    from pipeline.ai_summary import OllamaError
+    from pipeline.summarizers import get_backend
+
+    # "auto": Ollama (map-reduce, cached per email) within a latency budget,
+    # otherwise the local extractive summary
+    backend = get_backend(config)
+    SUMMARY_PARTIAL_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with SUMMARY_PARTIAL_PATH.open("w", encoding="utf-8") as partial:
+        def write_token(fragment: str) -> None:
+            partial.write(fragment)
+            if "\n" in fragment:
+                partial.flush()
+
+        try:
+            result = backend.summarize(important_items, on_token=write_token)
+        except OllamaError as e:
+            print(f"✗ AI summary failed: {e}")
+            return {"text": f"AI summary unavailable (Ollama error: {e})", "llm": None,
+                    "backend": backend.name, "fallback": None}
+
+    llm = result.stats if result.backend == "ollama" else None
+    if llm:
+        ttft = f"{llm['ttft_seconds']:.2f}s" if llm["ttft_seconds"] is not None else "n/a"
+        rate = f"{llm['tokens_per_second']:.1f} tok/s" if llm["tokens_per_second"] else "n/a"
+        print(f"🧠 Summary: {llm['cached']} cached, {llm['tokens']} tokens in {llm['calls']} call(s), "
+              f"first token after {ttft}, {rate}")
     else:
-        ai_summary = "No important emails detected today."
+        print(f"🧠 Summary: {result.backend}")
+    return {"text": result.text, "llm": llm, "backend": result.backend, "fallback": result.fallback_reason}
+
 
-    # WRITE REPORT
+def _write_report(metrics: dict[str, Any], ai_summary: str) -> Path:
     REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
     with REPORT_PATH.open("w", encoding="utf-8") as f:
         f.write(f"Date: {date.today().isoformat()}\n")
@@ -202,9 +264,157 @@ Emails:
         f.write(f"Important flagged: {metrics['important_flagged']}\n")
         f.write("====== AI SUMMARY ======\n")
         f.write(ai_summary)
+    SUMMARY_PARTIAL_PATH.unlink(missing_ok=True)
+    return REPORT_PATH
+
+
+def _collect_metrics(results: dict[str, Any]) -> dict[str, Any]:
+    spam_metrics = results["spam"]
+    inbox = results["inbox"]
+    calendar_metrics = results["calendar"]
+    return {
+        "spam_reviewed": spam_metrics.get("reviewed", 0),
+        "spam_deleted": spam_metrics.get("deleted", 0),
+        "spam_recovered": spam_metrics.get("recovered", 0),
+        "spam_review_pending": spam_metrics.get("review_pending", 0),
+        "message_cache_hits": inbox["message_cache"]["hits"],
+        "message_cache_misses": inbox["message_cache"]["misses"],
+        "inbox_scanned": len(inbox["inbox_mails"]),
+        "important_flagged": len(inbox["important_items"]),
+        "files_organized": results["downloads"]["files_organized"],
+        "downloads_tiers": results["downloads"]["tiers"],
+        "calendar_events_created": calendar_metrics['events_created'],
+        "calendar_events_skipped": calendar_metrics['events_skipped'],
+        "calendar_errors": calendar_metrics['errors'],
+        # Time to first token / tokens per second of the summary call
+        "llm": results["summary"]["llm"],
+        "summary_backend": results["summary"]["backend"],
+        "summary_fallback": results["summary"]["fallback"],
+    }
+
+
+# -----------------------------
+# Main run function
+# -----------------------------
+def build_pipeline(creds: dict[str, Any], config: dict[str, Any]) -> StageGraph:
+    """
+    Stage graph for one run. Downloads cleanup has no email dependency and
+    starts right away; calendar and the LLM summary both only need the inbox.
+    """
+    graph = StageGraph()
+    graph.add("connect", lambda r: _connect(creds, config))
+    # An interactive review opens Tk windows, which must stay on the main thread
+    graph.add("spam", lambda r: _scan_spam(r["connect"], config), deps=("connect",),
+              on_loop=not config.get("review_deferred"))
+    # Inbox waits for spam: recovered mail lands there and the IMAP connection is shared
+    graph.add("inbox", lambda r: _scan_inbox(r["connect"], config), deps=("connect", "spam"))
+    graph.add("calendar", lambda r: _create_calendar_events(r["inbox"]["important_items"]), deps=("inbox",))
+    graph.add("downloads", lambda r: _cleanup_downloads(config))
+    graph.add("summary", lambda r: _summarize(r["inbox"]["important_items"], config), deps=("inbox",))
+    graph.add(
+        "report",
+        lambda r: _write_report(_collect_metrics(r), r["summary"]["text"]),
+        deps=("spam", "inbox", "calendar", "downloads", "summary"),
+    )
+    return graph
+
+
+def run(interactive: bool = False, summary_backend: str | None = None) -> dict[str, Any]:
+    """
+    One full pass. Headless by default: rules come from email_rules.json and
+    ASSISTANT_* environment variables, and rule-matched spam is queued for
+    `python -m pipeline.review_queue` instead of prompting. `interactive`
+    brings back the setup dialogs and the end-of-sweep review.
+    `summary_backend` ("auto", "ollama", "extractive") overrides the config.
+    """
+    if interactive:
+        from pipeline.user_setup import collect_user_preferences
+
+        # ✅ Collect user preferences (credentials only once, rules every run)
+        collect_user_preferences()
+
+    # --- Load credentials & config ---
+    creds = load_credentials(CRED_PATH)
+    config = apply_env_overrides(load_config(CONFIG_PATH))
+    if not interactive:
+        config["review_deferred"] = True
+    if summary_backend:
+        config["summary_backend"] = summary_backend
+
+    graph = build_pipeline(creds, config)
+    try:
+        results = graph.run()
+    finally:
+        # Normally closed by the inbox stage; not if spam or inbox raised
+        if "connect" in graph.results:
+            _close_session(graph.results["connect"])
+        if "summary" in graph.results:
+            from pipeline.summarizers import LATE_RESULT_WAIT_SECONDS, wait_for_abandoned
+
+            # An Ollama summary past its budget may still fill the cache for next run
+            wait_for_abandoned(config.get("summary_late_wait_seconds", LATE_RESULT_WAIT_SECONDS))
+
+    metrics = _collect_metrics(results)
+    metrics["stage_timings"] = dict(graph.timings)
+
+    return {"report": str(results["report"].relative_to(ROOT)), "metrics": metrics}
+
+def run_daemon(max_cycles: int | None = None) -> int:
+    """
+    Stay connected and triage INBOX as mail arrives (IMAP IDLE) instead of
+    polling with full runs. Important mail still gets calendar events.
+    Uses the saved credentials and rules without prompting; rule edits made
+    while it runs apply from the next batch of mail.
+    """
+    creds = load_credentials(CRED_PATH)
+    config = apply_env_overrides(load_config(CONFIG_PATH))
+    config["review_deferred"] = True
+    session = _connect(creds, config)
+    rules = get_config_service(CONFIG_PATH)
+    seen_version = rules.version
+
+    def handle(conn: IMAPConnection) -> None:
+        nonlocal config, seen_version
+        rules.reload()
+        if rules.version != seen_version:
+            seen_version = rules.version
+            config = apply_env_overrides(load_config(CONFIG_PATH))
+            print("🔄 Rules changed, reloaded")
+        inbox = _scan_inbox(session, config, close_session=False)
+        if inbox["important_items"]:
+            _create_calendar_events(inbox["important_items"])
+        print(f"📬 New mail: {len(inbox['inbox_mails'])}, important: {len(inbox['important_items'])}")
+
+    try:
+        return serve_forever(
+            session["server"],
+            handle,
+            mailbox="INBOX",
+            idle_timeout=config.get("idle_timeout", DEFAULT_IDLE_SECONDS),
+            max_cycles=max_cycles,
+        )
+    finally:
+        _close_session(session)
 
-    return {"report": str(REPORT_PATH.relative_to(ROOT)), "metrics": metrics}
 
 if __name__ == "__main__":
+    import argparse
     import json
-    print(json.dumps(run(), indent=2))
+
+    parser = argparse.ArgumentParser(description="AI Productivity Assistant pipeline")
+    parser.add_argument("--daemon", action="store_true",
+                        help="stay connected and process INBOX mail as it arrives (IMAP IDLE)")
+    parser.add_argument("--interactive", action="store_true",
+                        help="ask for keywords/trusted senders and review flagged spam in dialogs")
+    parser.add_argument("--summary-backend", choices=("auto", "ollama", "extractive"),
+                        help="summarizer for the report (default: config, else auto)")
+    commands = parser.add_subparsers(dest="command")
+    add_rules_arguments(commands.add_parser("rules", help="list, add or remove keywords and trusted senders"))
+    args = parser.parse_args()
+
+    if args.command == "rules":
+        rules_command(args)
+    elif args.daemon:
+        run_daemon()
+    else:
+        print(json.dumps(run(interactive=args.interactive, summary_backend=args.summary_backend), indent=2))
@@ -1,34 +1,29 @@
 """
 Spam Processor - Stable Final Version
-(Trusted senders + rule-based importance + auto recovery)
+(Trusted senders + rule-based importance + learned importance + auto recovery)
 """
 
-import os
-import json
-import email as py_email
-from email.header import decode_header
 from email.utils import parseaddr
 
-from pipeline.email_utils import Email, extract_body, is_important_by_rule
+from pipeline.config_service import RULES_PATH, get_config_service
+from pipeline.email_utils import DEFAULT_BODY_MAX_BYTES, Email, is_important_by_rule
+from pipeline.header_triage import DEFAULT_FETCH_MODE, iter_emails
+from pipeline.imap_fetch import DEFAULT_FETCH_CHUNK_SIZE, chunked, message_set
 from pipeline.learning_manager import LearningManager
+from pipeline.message_cache import MessageCache
 from pipeline.alert_manager import AlertManager
+from pipeline.review_queue import ReviewItem, ReviewQueue
+from pipeline.sync_state import FolderSync, SyncStateStore
+from pipeline.user_setup import apply_env_overrides
 
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-CONFIG_PATH = os.path.join(BASE_DIR, "config", "email_rules.json")
+CONFIG_PATH = RULES_PATH
 
 
 def load_config():
-    try:
-        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"⚠ Config load failed: {e}")
-        return {
-            "trusted_senders": [],
-            "priority_keywords": [],
-            "mode": "balanced"
-        }
+    # The same effective rules as run(): the file plus ASSISTANT_* overrides
+    # (on a copy; the service's dict is shared and read-only)
+    return apply_env_overrides(get_config_service(CONFIG_PATH).snapshot())
 
 
 # =========================================================
@@ -57,78 +52,261 @@ def _determine_importance(email_obj: Email, config: dict, learning_manager: Lear
     return None
 
 
+def _needs_body(email_obj: Email, config: dict, learning_manager: LearningManager, model=None) -> bool:
+    """Header-first triage: only download the body when headers can't decide."""
+    # Loaded with the model by process_spam_folder; numpy stays out of startup
+    from pipeline.importance_model import needs_body
+
+    if learning_manager.is_trusted_sender(email_obj.sender):
+        return False
+    return needs_body(email_obj, config, model)
+
+
 # =========================================================
-# MAIN SPAM PROCESSING
+# BULK ACTIONS
 # =========================================================
 
-def process_spam_folder(server, use_alerts: bool = True):
+# UIDs per command; keeps command lines short even for scattered UID sets
+BULK_ACTION_CHUNK = 500
+
+
+def _bulk_recover(server, uids: list[bytes], target: str = "INBOX") -> bool:
+    """
+    Move every uid to `target` with UID MOVE, or COPY + STORE \\Deleted on
+    servers without MOVE. One command (per BULK_ACTION_CHUNK uids) each.
+    """
+    use_move = "MOVE" in getattr(server, "capabilities", ())
+    for chunk in chunked(uids, BULK_ACTION_CHUNK):
+        msg_set = message_set(chunk)
+        if use_move:
+            typ, _ = server.uid("MOVE", msg_set, target)
+            if typ == "OK":
+                continue
+        typ, _ = server.uid("COPY", msg_set, target)
+        if typ != "OK":
+            return False
+        server.uid("STORE", msg_set, "+FLAGS.SILENT", "(\\Deleted)")
+    return True
+
+
+def _bulk_delete(server, uids: list[bytes]) -> bool:
+    for chunk in chunked(uids, BULK_ACTION_CHUNK):
+        typ, _ = server.uid("STORE", message_set(chunk), "+FLAGS.SILENT", "(\\Deleted)")
+        if typ != "OK":
+            return False
+    return True
 
-    config = load_config()
-    learning_manager = LearningManager()
-    alert_manager = AlertManager(use_gui=use_alerts)
 
-    metrics = {
+def new_metrics() -> dict:
+    return {
         "reviewed": 0,
         "recovered": 0,
         "deleted": 0,
         "learned_important": 0,
-        "recovered_senders": []
+        "model_flagged": 0,
+        "recovered_senders": [],
+        "queued_for_review": 0,
+        "review_pending": 0,
     }
 
+
+def review_examples(items: list[ReviewItem]) -> dict[bytes, Email]:
+    """
+    Reviewed items as the emails apply_decisions records for the importance
+    model. Only answers the user gave are recorded: automatic recoveries and
+    deletions just repeat the rules, and learning from them would teach the
+    model the rules back.
+    """
+    return {item.uid.encode("ascii"): Email(item.sender, item.subject, item.preview, item.folder) for item in items}
+
+
+def split_decisions(items: list[ReviewItem], decisions: list[bool]):
+    """User answers → (to_recover, to_delete) in the shape apply_decisions takes."""
+    to_recover, to_delete = [], []
+    for item, move in zip(items, decisions):
+        if move:
+            to_recover.append((item.uid.encode("ascii"), item.sender, item.subject))
+        else:
+            to_delete.append(item.uid.encode("ascii"))
+    return to_recover, to_delete
+
+
+def settled_prefix(mail_ids: list[bytes], settled: set[bytes]) -> list[bytes]:
+    """
+    The UIDs the sync mark may move past. The mark is one high-water UID,
+    so it stops before the first UID that isn't settled; everything after
+    that is fetched (and decided) again next run.
+    """
+    prefix = []
+    for uid in sorted(mail_ids, key=int):
+        if uid not in settled:
+            break
+        prefix.append(uid)
+    return prefix
+
+
+def apply_decisions(
+    server,
+    to_recover: list[tuple[bytes, str, str]],
+    to_delete: list[bytes],
+    learning_manager: LearningManager,
+    metrics: dict,
+    examples: dict[bytes, Email] | None = None,
+) -> set[bytes]:
+    """
+    One bulk recover, one bulk delete, one EXPUNGE. Emails found in
+    `examples` (by uid) are recorded as decisions once their action succeeds.
+    Returns the UIDs whose action succeeded.
+    """
+    done: set[bytes] = set()
+    if not to_recover and not to_delete:
+        return done
+    examples = examples or {}
+
+    if to_recover:
+        try:
+            if _bulk_recover(server, [uid for uid, _, _ in to_recover]):
+                done.update(uid for uid, _, _ in to_recover)
+                for uid, sender, subject in to_recover:
+                    learning_manager.add_trusted_sender(sender)
+                    if uid in examples:
+                        learning_manager.record_decision(examples[uid], True)
+                    metrics["recovered"] += 1
+                    metrics["learned_important"] += 1
+                    metrics["recovered_senders"].append(sender)
+                    print(f"✓ Recovered → {subject} ({sender})")
+            else:
+                print("✗ Recovery failed: server refused MOVE/COPY")
+        except Exception as e:
+            print(f"✗ Recovery failed: {e}")
+
+    if to_delete:
+        try:
+            if _bulk_delete(server, to_delete):
+                done.update(to_delete)
+                metrics["deleted"] += len(to_delete)
+                for uid in to_delete:
+                    if uid in examples:
+                        learning_manager.record_decision(examples[uid], False)
+            else:
+                print("✗ Delete failed: server refused STORE")
+        except Exception as e:
+            print(f"✗ Delete failed: {e}")
+
+    server.expunge()
+    return done
+
+
+# =========================================================
+# MAIN SPAM PROCESSING
+# =========================================================
+
+def process_spam_folder(
+    server,
+    use_alerts: bool = True,
+    chunk_size: int = DEFAULT_FETCH_CHUNK_SIZE,
+    fetch_mode: str = DEFAULT_FETCH_MODE,
+    sync_store: SyncStateStore | None = None,
+    account: str = "",
+    condstore: bool = False,
+    cache: MessageCache | None = None,
+    body_max_bytes: int | None = DEFAULT_BODY_MAX_BYTES,
+    review_queue: ReviewQueue | None = None,
+    review_deferred: bool = False,
+    config: dict | None = None,
+):
+    """
+    With alerts on, rule-matched mail is queued for review instead of
+    prompting per message; the queue is shown once after the sweep (or left
+    for `python -m pipeline.review_queue` when `review_deferred`), and every
+    decision is applied in one bulk pass.
+
+    Once enough decisions have been recorded, mail the rules don't match is
+    scored in one batch by the importance model and treated like a rule
+    match when it clears the threshold for config["mode"].
+    """
+    # numpy is only loaded for the spam stage
+    from pipeline.importance_model import load_model, threshold_for
+
+    # run() passes its effective config; standalone callers load the same
+    config = config if config is not None else load_config()
+    learning_manager = LearningManager()
+    model = load_model(learning_manager.decisions_file)
+    review_queue = review_queue if review_queue is not None else ReviewQueue()
+
+    metrics = new_metrics()
+
     try:
         spam_folders = ["[Gmail]/Spam", "Spam"]
 
-        folder_selected = False
+        selected_folder = None
         for folder in spam_folders:
             status, _ = server.select(folder)
             if status == "OK":
-                folder_selected = True
+                selected_folder = folder
                 break
 
-        if not folder_selected:
+        if not selected_folder:
             print("❌ Could not select Spam folder.")
             return metrics
 
-        status, messages = server.search(None, "ALL")
-        if status != "OK":
+        folder_sync = FolderSync(
+            server,
+            sync_store or SyncStateStore(),
+            account,
+            selected_folder,
+            initial_window=20,
+            condstore=condstore,
+        )
+        mail_ids = folder_sync.new_uids()
+
+        if not mail_ids and not review_queue.pending(account, selected_folder, folder_sync.uidvalidity):
             return metrics
 
-        mail_ids = messages[0].split()
-
-        if not mail_ids:
-            return metrics
-
-        mail_ids = mail_ids[-20:]
-
-        for uid in mail_ids:
+        # Decide everything first, then act with one command per action
+        to_recover: list[tuple[bytes, str, str]] = []
+        to_delete: list[bytes] = []
+        fetched: dict[bytes, Email] = {}
+        examples: dict[bytes, Email] = {}
+        undecided: list[tuple[bytes, Email]] = []
+        answered: list[ReviewItem] = []
+
+        def flag(uid: bytes, email_obj: Email, reason: str) -> None:
+            """Likely important: queue for review with alerts on, else recover."""
+            if not use_alerts:
+                to_recover.append((uid, email_obj.sender, email_obj.subject))
+                return
+            # Stays in spam until reviewed; the sweep doesn't wait
+            review_queue.add(ReviewItem(
+                account=account,
+                folder=selected_folder,
+                uidvalidity=folder_sync.uidvalidity,
+                uid=uid.decode("ascii"),
+                sender=email_obj.sender,
+                subject=email_obj.subject,
+                preview=email_obj.body[:300],
+                reason=reason,
+            ))
+            metrics["queued_for_review"] += 1
+
+        for uid, email_obj in iter_emails(
+            server,
+            mail_ids,
+            folder="SPAM",
+            needs_body=lambda e: _needs_body(e, config, learning_manager, model),
+            chunk_size=chunk_size,
+            use_uid=True,
+            mode=fetch_mode,
+            cache=cache,
+            body_max_bytes=body_max_bytes,
+        ):
             metrics["reviewed"] += 1
 
-            typ, msg_data = server.fetch(uid, "(RFC822)")
-            if typ != "OK":
-                continue
-
-            msg = py_email.message_from_bytes(msg_data[0][1])
-
-            subject = ""
-            if msg.get("Subject"):
-                for part, enc in decode_header(msg["Subject"]):
-                    if isinstance(part, bytes):
-                        subject += part.decode(enc or "utf-8", errors="ignore")
-                    else:
-                        subject += part
-
-            raw_sender = msg.get("From", "")
-            _, email_address = parseaddr(raw_sender)
+            _, email_address = parseaddr(email_obj.sender)
             sender = email_address.strip().lower()
-
-            body = extract_body(msg)
-
-            email_obj = Email(
-                sender=sender,
-                subject=subject,
-                body=body,
-                folder="SPAM"
-            )
+            subject = email_obj.subject
+            email_obj.sender = sender
+            fetched[uid] = email_obj
 
             importance_type = _determine_importance(
                 email_obj,
@@ -136,56 +314,80 @@ def process_spam_folder(server, use_alerts: bool = True):
                 learning_manager
             )
 
-            move_to_inbox = False
-
             # ===============================
             # TRUSTED → auto recover (NO alert)
             # ===============================
             if importance_type == "trusted":
-                move_to_inbox = True
+                to_recover.append((uid, sender, subject))
 
             # ===============================
-            # RULE-BASED → ask user (if alerts enabled)
+            # RULE-BASED → queue for the user (if alerts enabled)
             # ===============================
             elif importance_type == "rule":
-                if use_alerts:
-                    move_to_inbox, _ = alert_manager.show_email_alert(
-                        sender=sender,
-                        subject=subject,
-                        preview=body[:300]
-                    )
-                else:
-                    move_to_inbox = True
+                flag(uid, email_obj, "rule")
 
             # ===============================
-            # MOVE IMPORTANT EMAILS
+            # UNDECIDED → the model scores them together below
             # ===============================
-            if move_to_inbox:
-                try:
-                    server.copy(uid, "INBOX")
-                    server.store(uid, "+FLAGS", "\\Deleted")
-
-                    learning_manager.add_trusted_sender(sender)
-
-                    metrics["recovered"] += 1
-                    metrics["learned_important"] += 1
-                    metrics["recovered_senders"].append(sender)
-
-                    print(f"✓ Recovered → {subject} ({sender})")
-
-                except Exception as e:
-                    print(f"✗ Recovery failed: {e}")
+            elif model is not None:
+                undecided.append((uid, email_obj))
 
             else:
-                try:
-                    server.store(uid, "+FLAGS", "\\Deleted")
-                    metrics["deleted"] += 1
-                except Exception as e:
-                    print(f"✗ Delete failed: {e}")
-
-        server.expunge()
+                to_delete.append(uid)
+
+        if undecided:
+            threshold = threshold_for(config.get("mode"))
+            scores = model.score([email_obj for _, email_obj in undecided])
+            for (uid, email_obj), score in zip(undecided, scores):
+                if score >= threshold:
+                    flag(uid, email_obj, f"model:{score:.2f}")
+                    metrics["model_flagged"] += 1
+                else:
+                    to_delete.append(uid)
+
+        # ===============================
+        # ONE BATCH REVIEW FOR THE QUEUE
+        # ===============================
+        pending = review_queue.pending(account, selected_folder, folder_sync.uidvalidity)
+        if pending and not review_deferred:
+            # Built only when someone is asked, so deferred runs never load tkinter
+            decisions = AlertManager(use_gui=use_alerts).review_batch(pending)
+            if decisions is not None:
+                reviewed_recover, reviewed_delete = split_decisions(pending, decisions)
+                # The user's answers are the model's labels; prefer this
+                # sweep's fetched email (full body) over the queued preview
+                for uid, email_obj in review_examples(pending).items():
+                    examples[uid] = fetched.get(uid, email_obj)
+                to_recover += reviewed_recover
+                to_delete += reviewed_delete
+                answered = pending
+
+        # ===============================
+        # APPLY DECISIONS IN BULK
+        # ===============================
+        done = apply_decisions(server, to_recover, to_delete, learning_manager, metrics, examples)
+
+        # Answers whose action failed stay queued: earlier runs' items are
+        # already behind the sync mark, so the queue is their only record
+        review_queue.discard([item for item in answered if item.uid.encode("ascii") in done])
+        metrics["review_pending"] = len(review_queue.pending(account, selected_folder))
+        if metrics["review_pending"]:
+            print(f"📝 {metrics['review_pending']} spam message(s) waiting for review")
+
+        # Settled = acted on successfully, or waiting in a queue on disk.
+        # A failed MOVE/STORE or an in-memory queue ("decide later" without
+        # review_persist) keeps the UID behind the sync mark, so the next
+        # run fetches and decides it again
+        review_queue.save()
+        queued = {item.uid.encode("ascii") for item in review_queue.pending(account, selected_folder)}
+        folder_sync.commit(settled_prefix(mail_ids, done | (queued if review_queue.path else set())))
 
     except Exception as e:
         print(f"❌ Spam processing error: {e}")
 
+    finally:
+        # Newly learned trusted senders and decisions are written once per sweep
+        learning_manager.flush()
+        review_queue.save()
+
     return metrics
@@ -0,0 +1,265 @@
+"""
+Summarizer backends for the daily report.
+
+Every backend turns the important emails into numbered bullets:
+
+- "ollama": map-reduce LLM summary (chunked_summary) with the per-email cache
+- "extractive": local and deterministic; picks each email's most
+  representative sentence by term frequency over the day's mail
+- "auto": Ollama within a latency budget, extractive if Ollama fails or
+  runs past it, so the report is always written on time
+
+    backend = get_backend(config)
+    result = backend.summarize(emails)
+"""
+import math
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from pipeline.email_utils import Email
+
+DEFAULT_BACKEND = "auto"
+DEFAULT_BUDGET_SECONDS = 90.0
+# How long run() lets an abandoned Ollama summary keep filling the cache
+LATE_RESULT_WAIT_SECONDS = 30.0
+
+MAX_SENTENCES = 20
+MAX_BULLET_CHARS = 220
+SUBJECT_WEIGHT = 1.5
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9'@.-]*[a-z0-9]|[a-z0-9]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+_NOISE = re.compile(r"https?://|unsubscribe|view in browser|all rights reserved", re.IGNORECASE)
+_STOPWORDS = frozenset("""
+a an and are as at be by for from has have i in is it its of on or our please that the this to
+was we were will with you your hi hello dear regards thanks thank best sent re fwd
+""".split())
+
+OnToken = Callable[[str], None]
+
+
+@dataclass
+class SummaryResult:
+    text: str
+    backend: str
+    stats: dict[str, Any] | None = None
+    fallback_reason: str | None = None
+
+
+def email_line(email_obj: Email) -> str:
+    """The one-line stand-in for an email that the LLM prompt lists."""
+    subj = (email_obj.subject or "").strip()
+    body = (email_obj.body or "").strip().replace("\n", " ")
+    if subj and subj.lower() not in ["no subject", ""]:
+        return subj[:200]
+    if body:
+        return body[:200]
+    return f"Email from {email_obj.sender}"
+
+
+class SummarizerBackend:
+    """Base class: `summarize` returns numbered bullets, one per email."""
+
+    name = "base"
+
+    def summarize(self, emails: list[Email], on_token: OnToken | None = None) -> SummaryResult:
+        raise NotImplementedError
+
+
+# =========================================================
+# OLLAMA
+# =========================================================
+
+class OllamaBackend(SummarizerBackend):
+    name = "ollama"
+
+    def __init__(self, config: dict[str, Any] | None = None):
+        self.config = config or {}
+
+    def summarize(self, emails: list[Email], on_token: OnToken | None = None) -> SummaryResult:
+        # Imported here so the extractive path never loads requests
+        from pipeline.chunked_summary import CHUNK_TOKEN_BUDGET, MAP_OPTIONS, MAX_PARALLEL, summarize_emails
+        from pipeline.summary_cache import DEFAULT_MAX_ENTRIES, SummaryCache, summary_key
+
+        # Keyed on what the map calls actually send, so new options mean new bullets
+        keys = [summary_key(e.subject, e.body or e.sender, options=MAP_OPTIONS) for e in emails]
+        # Owned by this call, so a run abandoned by "auto" can still fill it
+        with SummaryCache(max_entries=self.config.get("summary_cache_entries", DEFAULT_MAX_ENTRIES)) as cache:
+            summary = summarize_emails(
+                [email_line(e) for e in emails],
+                chunk_budget=self.config.get("summary_chunk_tokens", CHUNK_TOKEN_BUDGET),
+                max_parallel=self.config.get("summary_parallel", MAX_PARALLEL),
+                on_token=on_token,
+                cache=cache,
+                keys=keys,
+            )
+        return SummaryResult(summary.text, self.name, summary.stats())
+
+
+# =========================================================
+# EXTRACTIVE
+# =========================================================
+
+def _words(text: str) -> list[str]:
+    return [w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS and len(w) > 2]
+
+
+def _sentences(text: str) -> list[str]:
+    sentences = []
+    for raw in _SENTENCE_END.split(text or ""):
+        sentence = " ".join(raw.split())
+        if len(sentence) >= 12 and not _NOISE.search(sentence):
+            sentences.append(sentence)
+        if len(sentences) >= MAX_SENTENCES:
+            break
+    return sentences
+
+
+class ExtractiveBackend(SummarizerBackend):
+    """
+    Scores each email's sentences by the frequency of their content words
+    across all of today's important mail (subject words count extra) and
+    keeps the best one. No model, no network; same input, same output.
+    """
+
+    name = "extractive"
+
+    def summarize(self, emails: list[Email], on_token: OnToken | None = None) -> SummaryResult:
+        started = time.perf_counter()
+        per_email = [(e.subject or "", _sentences(e.body)) for e in emails]
+
+        frequency: Counter = Counter()
+        for subject, sentences in per_email:
+            frequency.update({w: SUBJECT_WEIGHT for w in set(_words(subject))})
+            for sentence in sentences:
+                frequency.update(set(_words(sentence)))
+
+        lines = []
+        for i, (email_obj, (subject, sentences)) in enumerate(zip(emails, per_email), start=1):
+            subject_words = set(_words(subject))
+
+            def score(item: tuple[int, str]) -> tuple[float, int]:
+                position, sentence = item
+                words = _words(sentence)
+                if not words:
+                    return (0.0, -position)
+                total = sum(frequency[w] * (SUBJECT_WEIGHT if w in subject_words else 1.0) for w in set(words))
+                # Long sentences shouldn't win just by containing more words
+                return (total / math.sqrt(len(words)), -position)
+
+            best = max(enumerate(sentences), key=score)[1] if sentences else ""
+            subject = " ".join(subject.split())
+            if subject and best and not best.lower().startswith(subject.lower()):
+                bullet = f"{subject}: {best}"
+            else:
+                bullet = best or subject or f"Email from {email_obj.sender}"
+            if len(bullet) > MAX_BULLET_CHARS:
+                bullet = bullet[:MAX_BULLET_CHARS - 1].rsplit(" ", 1)[0] + "…"
+            lines.append(f"{i}. {bullet}\n")
+
+        text = "\n".join(lines)
+        if on_token:
+            on_token(text)
+        stats = {"emails": len(emails), "seconds": time.perf_counter() - started}
+        return SummaryResult(text, self.name, stats)
+
+
+# =========================================================
+# AUTO: LLM WITH A DEADLINE
+# =========================================================
+
+_abandoned: list[threading.Thread] = []
+
+
+def wait_for_abandoned(timeout: float = LATE_RESULT_WAIT_SECONDS) -> int:
+    """
+    Give summaries that FallbackBackend gave up on up to `timeout` seconds
+    in total to finish (they are daemon threads, so exiting would cut them
+    off). Returns how many are still running.
+    """
+    deadline = time.monotonic() + timeout
+    for thread in list(_abandoned):
+        thread.join(max(0.0, deadline - time.monotonic()))
+        if not thread.is_alive():
+            _abandoned.remove(thread)
+    if _abandoned:
+        print(f"⚠ {len(_abandoned)} late summary run(s) still going; exiting without them")
+    return len(_abandoned)
+
+
+class FallbackBackend(SummarizerBackend):
+    """
+    Run `primary` on a worker thread; if it fails or hasn't finished after
+    `budget_seconds`, answer with `fallback` instead. An abandoned primary
+    keeps running in the background but can no longer write tokens; what it
+    finishes is committed to the summary cache as it is stored, and
+    wait_for_abandoned() bounds how long the process waits for it.
+    """
+
+    name = "auto"
+
+    def __init__(self, primary: SummarizerBackend, fallback: SummarizerBackend,
+                 budget_seconds: float = DEFAULT_BUDGET_SECONDS):
+        self.primary = primary
+        self.fallback = fallback
+        self.budget_seconds = budget_seconds
+
+    def summarize(self, emails: list[Email], on_token: OnToken | None = None) -> SummaryResult:
+        outcome: dict[str, Any] = {}
+        finished = threading.Event()
+        abandoned = threading.Event()
+
+        def guarded(fragment: str) -> None:
+            if on_token and not abandoned.is_set():
+                on_token(fragment)
+
+        def work() -> None:
+            try:
+                outcome["result"] = self.primary.summarize(emails, on_token=guarded)
+            except Exception as e:
+                outcome["error"] = e
+            finally:
+                finished.set()
+
+        worker = threading.Thread(target=work, name=f"summary-{self.primary.name}", daemon=True)
+        worker.start()
+        if finished.wait(self.budget_seconds) and "result" in outcome:
+            return outcome["result"]
+
+        abandoned.set()
+        if worker.is_alive():
+            _abandoned.append(worker)
+        if "error" in outcome:
+            reason = f"{self.primary.name} failed: {outcome['error']}"
+        else:
+            reason = f"{self.primary.name} exceeded {self.budget_seconds:g}s budget"
+        print(f"⚠ {reason}; using {self.fallback.name} summary")
+        if on_token:
+            on_token(f"\n--- {self.fallback.name} summary ({reason}) ---\n")
+        result = self.fallback.summarize(emails, on_token=on_token)
+        result.fallback_reason = reason
+        return result
+
+
+BACKENDS = {"ollama": OllamaBackend, "extractive": ExtractiveBackend}
+
+
+def get_backend(config: dict[str, Any] | None = None, name: str | None = None) -> SummarizerBackend:
+    """Backend for this run: `name`, else config "summary_backend", else auto."""
+    config = config or {}
+    name = name or config.get("summary_backend", DEFAULT_BACKEND)
+    if name == "ollama":
+        return OllamaBackend(config)
+    if name == "extractive":
+        return ExtractiveBackend()
+    if name == "auto":
+        return FallbackBackend(
+            OllamaBackend(config),
+            ExtractiveBackend(),
+            budget_seconds=config.get("summary_budget_seconds", DEFAULT_BUDGET_SECONDS),
+        )
+    raise ValueError(f"Unknown summary backend {name!r} (choose from auto, {', '.join(BACKENDS)})")
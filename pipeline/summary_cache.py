@@ -0,0 +1,79 @@
+"""
+Persistent cache of per-email LLM summaries.
+
+The daily report mostly re-lists mail that was already summarized on an
+earlier run. Each email's bullet is stored under a hash of its normalized
+subject and body prefix plus the model and sampling options that produced
+it, so only new (or edited) mail goes to Ollama. Size-bounded LRU via
+DiskCache.
+"""
+import hashlib
+import json
+import re
+from pathlib import Path
+
+from pipeline.ai_summary import DEFAULT_MODEL, DEFAULT_OPTIONS
+from pipeline.disk_cache import DiskCache
+
+ROOT = Path(__file__).resolve().parents[1]
+SUMMARY_CACHE_DB = ROOT / "config" / "summary_cache.sqlite3"
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+BODY_PREFIX_CHARS = 500
+
+# Re: / Fwd: chains and whitespace don't change what the email says
+_REPLY_PREFIX = re.compile(r"^\s*((re|fwd?|aw|wg)\s*:\s*)+", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+
+
+def _normalize(text: str) -> str:
+    return _SPACES.sub(" ", text or "").strip().lower()
+
+
+def summary_key(subject: str, body: str, model: str = DEFAULT_MODEL,
+                options: dict | None = None) -> str:
+    """
+    `options` are the generation options the summarizing call sends
+    (chunked_summary.MAP_OPTIONS; DEFAULT_OPTIONS if omitted). num_predict
+    is left out: it is a length cap sized to the whole chunk, not to the
+    one email whose bullet is cached.
+    """
+    subject = _REPLY_PREFIX.sub("", subject or "")
+    options = options if options is not None else DEFAULT_OPTIONS
+    material = json.dumps(
+        [_normalize(subject), _normalize(body)[:BODY_PREFIX_CHARS], model,
+         {k: v for k, v in options.items() if k != "num_predict"}],
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """
+    One bullet per email key, with LRU eviction by count and size.
+    """
+
+    def __init__(self, path: Path = SUMMARY_CACHE_DB, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int | None = DEFAULT_MAX_BYTES):
+        self.cache = DiskCache(path, max_entries=max_entries, max_bytes=max_bytes)
+
+    def get(self, key: str) -> str | None:
+        return self.cache.get(key)
+
+    def put(self, key: str, summary: str) -> None:
+        self.cache.put(key, summary)
+        # Committed right away: the writer may be a summary run that was
+        # abandoned and is cut off when the process exits
+        self.cache.flush()
+
+    def stats(self) -> dict[str, int]:
+        return self.cache.stats()
+
+    def close(self) -> None:
+        self.cache.close()
+
+    def __enter__(self) -> "SummaryCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
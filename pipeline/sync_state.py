@@ -0,0 +1,191 @@
+"""
+UID-based incremental mailbox sync.
+
+Each folder remembers its UIDVALIDITY and the last UID processed in a small
+SQLite store under config/, so a run only fetches mail that arrived since the
+previous one. When the server supports CONDSTORE, an unchanged
+HIGHESTMODSEQ skips the UID SEARCH entirely.
+"""
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SYNC_DB = ROOT / "config" / "sync_state.sqlite3"
+
+
+@dataclass
+class FolderState:
+    uidvalidity: int
+    last_uid: int
+    highest_modseq: int | None = None
+
+
+class SyncStateStore:
+    """
+    Persists per-folder sync state.
+    """
+
+    def __init__(self, path: Path = SYNC_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Pipeline stages run on worker threads; they never share it concurrently
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS folder_state (
+                account TEXT NOT NULL,
+                folder TEXT NOT NULL,
+                uidvalidity INTEGER NOT NULL,
+                last_uid INTEGER NOT NULL,
+                highest_modseq INTEGER,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (account, folder)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def get(self, account: str, folder: str) -> FolderState | None:
+        row = self.conn.execute(
+            "SELECT uidvalidity, last_uid, highest_modseq FROM folder_state WHERE account = ? AND folder = ?",
+            (account, folder),
+        ).fetchone()
+        if row is None:
+            return None
+        return FolderState(uidvalidity=row[0], last_uid=row[1], highest_modseq=row[2])
+
+    def put(self, account: str, folder: str, state: FolderState) -> None:
+        self.conn.execute(
+            """
+            INSERT INTO folder_state (account, folder, uidvalidity, last_uid, highest_modseq, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(account, folder) DO UPDATE SET
+                uidvalidity = excluded.uidvalidity,
+                last_uid = excluded.last_uid,
+                highest_modseq = excluded.highest_modseq,
+                updated_at = excluded.updated_at
+            """,
+            (account, folder, state.uidvalidity, state.last_uid, state.highest_modseq,
+             datetime.now().isoformat(timespec="seconds")),
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+# =========================================================
+# SERVER HELPERS
+# =========================================================
+
+def enable_condstore(server) -> bool:
+    """
+    Turn on CONDSTORE so SELECT reports HIGHESTMODSEQ.
+    Must run right after login, before any folder is selected.
+    """
+    capabilities = getattr(server, "capabilities", ())
+    if "CONDSTORE" not in capabilities or "ENABLE" not in capabilities:
+        return False
+    try:
+        typ, _ = server.enable("CONDSTORE")
+        return typ == "OK"
+    except Exception:
+        return False
+
+
+def response_int(server, code: str) -> int | None:
+    try:
+        _, data = server.response(code)
+    except Exception:
+        return None
+    values = [d for d in (data or []) if d]
+    if not values:
+        return None
+    try:
+        return int(values[-1])
+    except (TypeError, ValueError):
+        return None
+
+
+# =========================================================
+# FOLDER SYNC
+# =========================================================
+
+class FolderSync:
+    """
+    Works out which UIDs in the currently selected folder are new.
+
+    Create it right after server.select(folder) so the SELECT response codes
+    (UIDVALIDITY, UIDNEXT, HIGHESTMODSEQ) are still available, call
+    new_uids(), process them, then commit() to advance the stored state.
+    """
+
+    def __init__(self, server, store: SyncStateStore, account: str, folder: str,
+                 initial_window: int = 10, condstore: bool = False):
+        self.server = server
+        self.store = store
+        self.account = account
+        self.folder = folder
+        self.initial_window = initial_window
+        self.condstore = condstore
+
+        self.uidvalidity = response_int(server, "UIDVALIDITY") or 0
+        self.uidnext = response_int(server, "UIDNEXT")
+        self.highest_modseq = response_int(server, "HIGHESTMODSEQ") if condstore else None
+        self.previous = store.get(account, folder)
+        self._seen_uid = self.previous.last_uid if self._state_valid() else 0
+        # Highest UID new_uids() handed out; commit() keeps MODSEQ only past it
+        self._offered_uid = self._seen_uid
+
+    def _state_valid(self) -> bool:
+        return self.previous is not None and self.previous.uidvalidity == self.uidvalidity
+
+    def _search(self, *criteria) -> list[bytes]:
+        typ, data = self.server.uid("SEARCH", None, *criteria)
+        if typ != "OK" or not data or not data[0]:
+            return []
+        return data[0].split()
+
+    def new_uids(self) -> list[bytes]:
+        # First sync, or the server reset its UIDs → only the most recent window
+        if not self._state_valid():
+            return self._offer(self._search("ALL")[-self.initial_window:])
+
+        last_uid = self.previous.last_uid
+
+        # CONDSTORE fast path: nothing in the folder changed since last run
+        if (
+            self.highest_modseq is not None
+            and self.previous.highest_modseq == self.highest_modseq
+        ):
+            return []
+
+        if self.uidnext is not None and self.uidnext <= last_uid + 1:
+            return []
+
+        # "n:*" always matches the newest message, even if it is older than n
+        return self._offer([uid for uid in self._search("UID", f"{last_uid + 1}:*") if int(uid) > last_uid])
+
+    def _offer(self, uids: list[bytes]) -> list[bytes]:
+        self._offered_uid = max([self._offered_uid] + [int(u) for u in uids])
+        return uids
+
+    def commit(self, processed_uids=()) -> None:
+        """
+        Record the highest processed UID for next run, and the current MODSEQ
+        when that covers everything new_uids() returned. A mark held back
+        (mail left undecided, or an action the server refused) stores no
+        MODSEQ, so the next run searches again instead of taking the
+        unchanged-folder fast path past the held-back mail.
+        """
+        last_uid = max([self._seen_uid] + [int(u) for u in processed_uids])
+        self._seen_uid = last_uid
+        settled = last_uid >= self._offered_uid
+        self.store.put(
+            self.account,
+            self.folder,
+            FolderState(uidvalidity=self.uidvalidity, last_uid=last_uid,
+                        highest_modseq=self.highest_modseq if settled else None),
+        )
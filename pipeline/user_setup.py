@@ -1,30 +1,78 @@
 # pipeline/user_setup.py
+import argparse
 import json
-import tkinter as tk
-from tkinter import simpledialog, messagebox
+import os
 from pathlib import Path
+from typing import Mapping
 
-CONFIG_PATH = Path(__file__).resolve().parents[1] / "config" / "email_rules.json"
+from pipeline.config_service import RULES_PATH, get_config_service
+
+CONFIG_PATH = RULES_PATH
+CRED_PATH = CONFIG_PATH.parent / "email_credentials.json"
+
+# Headless runs (cron, containers) take these instead of dialogs.
+# List variables are comma-separated and added to the saved rules.
+ENV_PREFIX = "ASSISTANT_"
+ENV_CREDENTIALS = {
+    "EMAIL": "email",
+    "APP_PASSWORD": "password",
+    "IMAP_SERVER": "imap_server",
+    "IMAP_PORT": "imap_port",
+}
+ENV_RULE_LISTS = {
+    "PRIORITY_KEYWORDS": "priority_keywords",
+    "TRUSTED_SENDERS": "trusted_senders",
+}
+RULE_KINDS = {"keyword": "priority_keywords", "sender": "trusted_senders"}
 
 def load_config():
-    if CONFIG_PATH.exists():
-        with CONFIG_PATH.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-    else:
-        data = {
-            "email": "",
-            "app_password": "",
-            "trusted_senders": [],
-            "priority_keywords": []
-        }
-    return data
+    return get_config_service(CONFIG_PATH).snapshot()
 
 def save_config(data):
-    CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with CONFIG_PATH.open("w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+    get_config_service(CONFIG_PATH).save(data)
+
+def _env_list(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def apply_env_overrides(data: dict, env: Mapping[str, str] | None = None) -> dict:
+    """Rules from load_config() plus any ASSISTANT_* list variables."""
+    env = os.environ if env is None else env
+    for suffix, key in ENV_RULE_LISTS.items():
+        values = data.setdefault(key, [])
+        for item in _env_list(env.get(ENV_PREFIX + suffix, "")):
+            if item not in values:
+                values.append(item)
+    return data
+
+
+def load_credentials(path: Path = CRED_PATH, env: Mapping[str, str] | None = None) -> dict:
+    """
+    IMAP credentials from config/email_credentials.json, with
+    ASSISTANT_EMAIL / ASSISTANT_APP_PASSWORD / ASSISTANT_IMAP_SERVER /
+    ASSISTANT_IMAP_PORT taking precedence (the file is optional if all are set).
+    """
+    env = os.environ if env is None else env
+    creds = {"imap_server": "imap.gmail.com", "imap_port": 993}
+    if path.exists():
+        with path.open("r", encoding="utf-8") as f:
+            creds.update(json.load(f))
+    for suffix, key in ENV_CREDENTIALS.items():
+        if env.get(ENV_PREFIX + suffix):
+            creds[key] = env[ENV_PREFIX + suffix]
+    creds["imap_port"] = int(creds["imap_port"])
+    if not creds.get("email") or not creds.get("password"):
+        raise ValueError(
+            f"Missing IMAP credentials: fill in {path} or set "
+            f"{ENV_PREFIX}EMAIL and {ENV_PREFIX}APP_PASSWORD"
+        )
+    return creds
+
 
 def collect_user_preferences():
+    import tkinter as tk
+    from tkinter import simpledialog, messagebox
+
     root = tk.Tk()
     root.withdraw()
 
@@ -76,3 +124,57 @@ def collect_user_preferences():
 
     root.destroy()
     return data
+
+
+# =========================================================
+# RULES CLI
+# =========================================================
+
+def edit_rules(action: str, kind: str, values: list[str]) -> list[str]:
+    """Add or remove keywords/trusted senders in email_rules.json; returns the new list."""
+    data = load_config()
+    key = RULE_KINDS[kind]
+    current = data.setdefault(key, [])
+    changed = 0
+    for value in values:
+        if action == "add" and value not in current:
+            current.append(value)
+            changed += 1
+        elif action == "remove" and value in current:
+            current.remove(value)
+            changed += 1
+    if changed:
+        save_config(data)
+    print(f"✓ {'Added' if action == 'add' else 'Removed'} {changed} {kind}(s)")
+    return current
+
+
+def add_rules_arguments(parser: argparse.ArgumentParser) -> None:
+    actions = parser.add_subparsers(dest="action", required=True)
+    actions.add_parser("list", help="show keywords and trusted senders")
+    for action in ("add", "remove"):
+        sub = actions.add_parser(action, help=f"{action} keywords or trusted senders")
+        sub.add_argument("kind", choices=sorted(RULE_KINDS))
+        sub.add_argument("values", nargs="+")
+
+
+def rules_command(args: argparse.Namespace) -> None:
+    if args.action == "list":
+        data = load_config()
+        for key in RULE_KINDS.values():
+            items = data.get(key, [])
+            print(f"{key} ({len(items)}):")
+            for item in items:
+                print(f"  - {item}")
+        return
+    edit_rules(args.action, args.kind, args.values)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Edit email rules without the setup dialogs")
+    add_rules_arguments(parser)
+    rules_command(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,17 @@
 import sys
 from pathlib import Path
 
+import pytest
+
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+from tests.fake_imap import FakeIMAPServer  # noqa: E402
+
+
+@pytest.fixture
+def fake_imap():
+    server = FakeIMAPServer().start()
+    yield server
+    server.stop()
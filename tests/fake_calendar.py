@@ -0,0 +1,82 @@
+"""
+In-memory stand-in for the discovery-built Calendar v3 service.
+
+Implements the slice the pipeline uses: events().insert(...).execute() and
+new_batch_http_request(callback).add(...)/execute(). Failures are injected
+as real googleapiclient HttpErrors, so retry classification is exercised.
+"""
+import json
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+
+def http_error(status: int, reason: str = "") -> HttpError:
+    content = json.dumps({"error": {"code": status, "message": reason,
+                                    "errors": [{"reason": reason}]}}).encode()
+    return HttpError(httplib2.Response({"status": status}), content)
+
+
+class _InsertRequest:
+    def __init__(self, service: "FakeCalendarService", calendar_id: str, body: dict):
+        self.service = service
+        self.calendar_id = calendar_id
+        self.body = body
+
+    def execute(self) -> dict:
+        self.service.http_calls += 1
+        return self.service._insert(self.body)
+
+
+class _Events:
+    def __init__(self, service: "FakeCalendarService"):
+        self.service = service
+
+    def insert(self, calendarId: str, body: dict) -> _InsertRequest:
+        return _InsertRequest(self.service, calendarId, body)
+
+
+class _Batch:
+    def __init__(self, service: "FakeCalendarService", callback):
+        self.service = service
+        self.callback = callback
+        self.requests: list[tuple[str, _InsertRequest]] = []
+
+    def add(self, request: _InsertRequest, callback=None, request_id=None) -> None:
+        self.requests.append((request_id or str(len(self.requests)), request))
+
+    def execute(self) -> None:
+        self.service.http_calls += 1
+        self.service.batch_sizes.append(len(self.requests))
+        for request_id, request in self.requests:
+            try:
+                response, error = self.service._insert(request.body), None
+            except HttpError as e:
+                response, error = None, e
+            self.callback(request_id, response, error)
+
+
+class FakeCalendarService:
+    def __init__(self):
+        self.events_by_id: dict[str, dict] = {}
+        self.http_calls = 0
+        self.batch_sizes: list[int] = []
+        # Status codes to fail the next inserts with, consumed in order
+        self.fail_next: list[int] = []
+
+    def events(self) -> _Events:
+        return _Events(self)
+
+    def new_batch_http_request(self, callback=None) -> _Batch:
+        return _Batch(self, callback)
+
+    def _insert(self, body: dict) -> dict:
+        if self.fail_next:
+            status = self.fail_next.pop(0)
+            raise http_error(status, "rateLimitExceeded" if status in (403, 429) else "backendError")
+        event_id = body.get("id") or f"evt{len(self.events_by_id)}"
+        if event_id in self.events_by_id:
+            raise http_error(409, "duplicate")
+        event = dict(body, id=event_id, htmlLink=f"https://calendar.example/{event_id}")
+        self.events_by_id[event_id] = event
+        return event
@@ -0,0 +1,520 @@
+"""
+Minimal in-process IMAP server for tests and benchmarks.
+
+Speaks just enough IMAP4rev1 for imaplib: LOGIN, SELECT, SEARCH, FETCH,
+STORE, COPY, MOVE, EXPUNGE, NOOP, IDLE and the UID variants. Every command is
+recorded in `command_log`, payload volume in `bytes_sent`, and `latency`
+adds a fixed delay per command so round-trip savings can be measured.
+"""
+import email as py_email
+import imaplib
+import re
+import select
+import socket
+import socketserver
+import threading
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass
+class FakeMessage:
+    uid: int
+    raw: bytes
+    flags: set = field(default_factory=set)
+
+
+@dataclass
+class FakeMailbox:
+    uidvalidity: int = 1
+    uidnext: int = 1
+    modseq: int = 1
+    messages: list = field(default_factory=list)
+
+    def append(self, raw: bytes, flags=()) -> int:
+        uid = self.uidnext
+        self.uidnext += 1
+        self.modseq += 1
+        self.messages.append(FakeMessage(uid=uid, raw=raw, flags=set(flags)))
+        return uid
+
+
+_TOKEN_RE = re.compile(rb'"((?:[^"\\]|\\.)*)"|(\((?:[^()]|\([^()]*\))*\))|(\S+)')
+
+
+def _split_args(text: bytes) -> list[bytes]:
+    args = []
+    for quoted, paren, atom in _TOKEN_RE.findall(text):
+        if quoted or (not paren and not atom):
+            args.append(re.sub(rb"\\(.)", rb"\1", quoted))
+        else:
+            args.append(paren or atom)
+    return args
+
+
+def _resolve_set(spec: str, values: list[int]) -> set[int]:
+    """Resolve an IMAP sequence set against the available numbers."""
+    if not values:
+        return set()
+    top = max(values)
+    wanted = set()
+    for part in spec.split(","):
+        if ":" in part:
+            a, b = part.split(":", 1)
+            lo = top if a == "*" else int(a)
+            hi = top if b == "*" else int(b)
+            lo, hi = min(lo, hi), max(lo, hi)
+            wanted.update(v for v in values if lo <= v <= hi)
+        else:
+            n = top if part == "*" else int(part)
+            if n in values:
+                wanted.add(n)
+    return wanted
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "_TCPServer"
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.fake: "FakeIMAPServer" = self.server.fake
+        self.selected: str | None = None
+        self.condstore = False
+        self.seen_exists = 0
+        self.fake._register(self)
+
+    def finish(self):
+        self.fake._unregister(self)
+        try:
+            super().finish()
+        except OSError:
+            pass
+
+    # -----------------------------
+    # wire helpers
+    # -----------------------------
+    def send(self, data: bytes) -> None:
+        self.fake.bytes_sent += len(data)
+        self.wfile.write(data)
+        self.wfile.flush()
+
+    def line(self, text: str | bytes) -> None:
+        if isinstance(text, str):
+            text = text.encode("utf-8")
+        self.send(text + b"\r\n")
+
+    @property
+    def mailbox(self) -> FakeMailbox:
+        return self.fake.mailboxes[self.selected]
+
+    def handle(self):
+        self.line("* OK fake IMAP ready")
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            raw = raw.rstrip(b"\r\n")
+            if not raw:
+                continue
+            parts = raw.split(b" ", 2)
+            tag = parts[0].decode()
+            command = parts[1].decode().upper() if len(parts) > 1 else ""
+            rest = parts[2] if len(parts) > 2 else b""
+
+            use_uid = False
+            if command == "UID":
+                sub, _, rest = rest.partition(b" ")
+                command = sub.decode().upper()
+                use_uid = True
+
+            self.fake.command_log.append(("UID " if use_uid else "") + command)
+            if self.fake.latency:
+                time.sleep(self.fake.latency)
+
+            handler = getattr(self, f"cmd_{command.lower()}", None)
+            if handler is None:
+                self.line(f"{tag} BAD unknown command {command}")
+                continue
+            try:
+                if command == "IDLE":
+                    # Blocks until DONE; must not hold the lock add_message needs
+                    keep_open = handler(tag, _split_args(rest), use_uid)
+                else:
+                    with self.fake.lock:
+                        keep_open = handler(tag, _split_args(rest), use_uid)
+            except OSError:
+                return  # client went away
+            except Exception as e:  # pragma: no cover - debugging aid
+                self.line(f"{tag} BAD {e}")
+                continue
+            if keep_open is False:
+                return
+
+    # -----------------------------
+    # commands
+    # -----------------------------
+    def cmd_capability(self, tag, args, use_uid):
+        self.line("* CAPABILITY " + " ".join(self.fake.capabilities))
+        self.line(f"{tag} OK CAPABILITY completed")
+
+    def cmd_login(self, tag, args, use_uid):
+        self.line(f"{tag} OK LOGIN completed")
+
+    def cmd_logout(self, tag, args, use_uid):
+        self.line("* BYE logging out")
+        self.line(f"{tag} OK LOGOUT completed")
+        return False
+
+    def cmd_enable(self, tag, args, use_uid):
+        enabled = [a.decode() for a in args if a.decode().upper() in self.fake.capabilities]
+        if "CONDSTORE" in (a.upper() for a in enabled):
+            self.condstore = True
+        self.line("* ENABLED " + " ".join(enabled))
+        self.line(f"{tag} OK ENABLE completed")
+
+    def cmd_select(self, tag, args, use_uid):
+        name = args[0].decode() if args else ""
+        if name not in self.fake.mailboxes:
+            self.selected = None
+            self.line(f"{tag} NO no such mailbox")
+            return
+        if len(args) > 1 and b"CONDSTORE" in args[1].upper():
+            self.condstore = True
+        self.selected = name
+        box = self.mailbox
+        self.seen_exists = len(box.messages)
+        self.line(f"* {len(box.messages)} EXISTS")
+        self.line("* 0 RECENT")
+        self.line(f"* OK [UIDVALIDITY {box.uidvalidity}] UIDs valid")
+        self.line(f"* OK [UIDNEXT {box.uidnext}] predicted next UID")
+        if self.condstore:
+            self.line(f"* OK [HIGHESTMODSEQ {box.modseq}] highest")
+        self.line(f"{tag} OK [READ-WRITE] SELECT completed")
+
+    cmd_examine = cmd_select
+
+    def cmd_noop(self, tag, args, use_uid):
+        self._notify_exists()
+        self.line(f"{tag} OK NOOP completed")
+
+    def cmd_idle(self, tag, args, use_uid):
+        self.line("+ idling")
+        while True:
+            with self.fake.lock:
+                self._notify_exists()
+            readable, _, _ = select.select([self.connection], [], [], 0.02)
+            if not readable:
+                continue
+            raw = self.rfile.readline()
+            if not raw:
+                return False
+            if raw.strip().upper() == b"DONE":
+                self.line(f"{tag} OK IDLE terminated")
+                return
+
+    def cmd_search(self, tag, args, use_uid):
+        box = self.mailbox
+        criteria = [a.decode().upper() for a in args]
+        matches = list(range(len(box.messages)))
+        if "UID" in criteria:
+            spec = criteria[criteria.index("UID") + 1]
+            uids = _resolve_set(spec, [m.uid for m in box.messages])
+            matches = [i for i in matches if box.messages[i].uid in uids]
+        if "UNSEEN" in criteria:
+            matches = [i for i in matches if "\\Seen" not in box.messages[i].flags]
+        values = [box.messages[i].uid if use_uid else i + 1 for i in matches]
+        self.line("* SEARCH" + "".join(f" {v}" for v in values))
+        self.line(f"{tag} OK SEARCH completed")
+
+    def _select_indexes(self, spec: bytes, use_uid: bool) -> list[int]:
+        box = self.mailbox
+        if use_uid:
+            wanted = _resolve_set(spec.decode(), [m.uid for m in box.messages])
+            return [i for i, m in enumerate(box.messages) if m.uid in wanted]
+        wanted = _resolve_set(spec.decode(), list(range(1, len(box.messages) + 1)))
+        return sorted(n - 1 for n in wanted)
+
+    def cmd_fetch(self, tag, args, use_uid):
+        indexes = self._select_indexes(args[0], use_uid)
+        spec = b" ".join(args[1:]).decode()
+        items = self.fake.fetch_item_parser(spec)
+        if use_uid and "UID" not in [i.upper() for i in items]:
+            items = ["UID"] + items
+
+        for i in indexes:
+            message = self.mailbox.messages[i]
+            out = bytearray(f"* {i + 1} FETCH (".encode())
+            first = True
+            for item in items:
+                if not first:
+                    out += b" "
+                first = False
+                out += self.fake.render_fetch_item(message, item)
+            out += b")\r\n"
+            self.send(bytes(out))
+        self.line(f"{tag} OK FETCH completed")
+
+    def cmd_store(self, tag, args, use_uid):
+        indexes = self._select_indexes(args[0], use_uid)
+        action = args[1].decode().upper()
+        flags = set(args[2].decode().strip("()").split())
+        box = self.mailbox
+        for i in indexes:
+            message = box.messages[i]
+            if action.startswith("+"):
+                message.flags |= flags
+            elif action.startswith("-"):
+                message.flags -= flags
+            else:
+                message.flags = set(flags)
+            box.modseq += 1
+            if not action.endswith(".SILENT"):
+                flag_text = " ".join(sorted(message.flags))
+                uid_text = f"UID {message.uid} " if use_uid else ""
+                self.line(f"* {i + 1} FETCH ({uid_text}FLAGS ({flag_text}))")
+        self.line(f"{tag} OK STORE completed")
+
+    def cmd_copy(self, tag, args, use_uid):
+        target = args[1].decode()
+        if target not in self.fake.mailboxes:
+            self.line(f"{tag} NO [TRYCREATE] no such mailbox")
+            return
+        for i in self._select_indexes(args[0], use_uid):
+            self.fake.mailboxes[target].append(self.mailbox.messages[i].raw)
+        self.line(f"{tag} OK COPY completed")
+
+    def cmd_move(self, tag, args, use_uid):
+        if "MOVE" not in self.fake.capabilities:
+            self.line(f"{tag} BAD MOVE not supported")
+            return
+        target = args[1].decode()
+        if target not in self.fake.mailboxes:
+            self.line(f"{tag} NO [TRYCREATE] no such mailbox")
+            return
+        indexes = self._select_indexes(args[0], use_uid)
+        box = self.mailbox
+        for i in indexes:
+            self.fake.mailboxes[target].append(box.messages[i].raw)
+        for i in sorted(indexes, reverse=True):
+            del box.messages[i]
+            box.modseq += 1
+            self.line(f"* {i + 1} EXPUNGE")
+        self.seen_exists = len(box.messages)
+        self.line(f"{tag} OK MOVE completed")
+
+    def cmd_expunge(self, tag, args, use_uid):
+        box = self.mailbox
+        for i in range(len(box.messages) - 1, -1, -1):
+            if "\\Deleted" in box.messages[i].flags:
+                del box.messages[i]
+                box.modseq += 1
+                self.line(f"* {i + 1} EXPUNGE")
+        self.seen_exists = len(box.messages)
+        self.line(f"{tag} OK EXPUNGE completed")
+
+    def _notify_exists(self) -> bool:
+        if self.selected is None:
+            return False
+        count = len(self.mailbox.messages)
+        if count != self.seen_exists:
+            self.seen_exists = count
+            self.line(f"* {count} EXISTS")
+            return True
+        return False
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class FakeIMAPServer:
+    """Threaded fake IMAP server bound to localhost on a free port."""
+
+    def __init__(self, latency: float = 0.0, capabilities=None):
+        self.latency = latency
+        self.capabilities = list(capabilities or ["IMAP4rev1", "UIDPLUS", "MOVE", "ENABLE", "CONDSTORE", "IDLE"])
+        self.mailboxes: dict[str, FakeMailbox] = {"INBOX": FakeMailbox(), "[Gmail]/Spam": FakeMailbox()}
+        self.command_log: list[str] = []
+        self.bytes_sent = 0
+        self.lock = threading.RLock()
+        self._handlers: list[_Handler] = []
+        self._tcp = _TCPServer(("127.0.0.1", 0), _Handler)
+        self._tcp.fake = self
+        self._thread = threading.Thread(target=self._tcp.serve_forever, args=(0.05,), daemon=True)
+
+    # -----------------------------
+    # lifecycle
+    # -----------------------------
+    @property
+    def port(self) -> int:
+        return self._tcp.server_address[1]
+
+    def start(self) -> "FakeIMAPServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.drop_connections()
+        self._tcp.shutdown()
+        self._tcp.server_close()
+
+    def connect(self) -> imaplib.IMAP4:
+        client = imaplib.IMAP4("127.0.0.1", self.port)
+        client.login("user", "password")
+        return client
+
+    def drop_connections(self) -> None:
+        """Forcefully close every open client connection."""
+        for handler in list(self._handlers):
+            try:
+                handler.connection.shutdown(2)
+                handler.connection.close()
+            except OSError:
+                pass
+
+    def _register(self, handler: _Handler) -> None:
+        self._handlers.append(handler)
+
+    def _unregister(self, handler: _Handler) -> None:
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+
+    # -----------------------------
+    # mailbox helpers
+    # -----------------------------
+    def add_message(self, folder: str, raw: bytes, flags=()) -> int:
+        with self.lock:
+            box = self.mailboxes.setdefault(folder, FakeMailbox())
+            return box.append(raw, flags)
+
+    def uids(self, folder: str) -> list[int]:
+        return [m.uid for m in self.mailboxes[folder].messages]
+
+    def count(self, command: str) -> int:
+        return sum(1 for c in self.command_log if c == command)
+
+    # -----------------------------
+    # FETCH rendering
+    # -----------------------------
+    @staticmethod
+    def fetch_item_parser(spec: str) -> list[str]:
+        spec = spec.strip()
+        if spec.startswith("(") and spec.endswith(")"):
+            spec = spec[1:-1]
+        items, depth, current = [], 0, ""
+        for ch in spec:
+            if ch == "[":
+                depth += 1
+            elif ch == "]":
+                depth -= 1
+            if ch == " " and depth == 0:
+                if current:
+                    items.append(current)
+                current = ""
+                continue
+            current += ch
+        if current:
+            items.append(current)
+        return items
+
+    def render_fetch_item(self, message: FakeMessage, item: str) -> bytes:
+        upper = item.upper()
+        if upper == "BODYSTRUCTURE":
+            return b"BODYSTRUCTURE " + _bodystructure(py_email.message_from_bytes(message.raw))
+        if upper.startswith("BODY[") or upper.startswith("BODY.PEEK["):
+            match = re.match(r"BODY(?:\.PEEK)?\[([^\]]*)\](?:<(\d+)\.(\d+)>)?", item, re.I)
+            section, origin, length = match.group(1), match.group(2), match.group(3)
+            data = _section(message.raw, section)
+            name = f"BODY[{section.upper()}]"
+            if origin is not None:
+                data = data[int(origin):int(origin) + int(length)]
+                name += f"<{origin}>"
+            if not upper.startswith("BODY.PEEK"):
+                message.flags.add("\\Seen")
+            return f"{name} {{{len(data)}}}\r\n".encode() + data
+        if upper == "UID":
+            return f"UID {message.uid}".encode()
+        if upper == "FLAGS":
+            return f"FLAGS ({' '.join(sorted(message.flags))})".encode()
+        if upper == "RFC822.SIZE":
+            return f"RFC822.SIZE {len(message.raw)}".encode()
+        if upper == "RFC822":
+            message.flags.add("\\Seen")
+            return f"RFC822 {{{len(message.raw)}}}\r\n".encode() + message.raw
+        raise ValueError(f"unsupported fetch item {item}")
+
+
+# -----------------------------
+# MIME helpers
+# -----------------------------
+def _quote(value) -> str:
+    if value is None:
+        return "NIL"
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _bodystructure(part) -> bytes:
+    if part.is_multipart():
+        children = b"".join(_bodystructure(child) for child in part.get_payload())
+        return b"(" + children + f" {_quote(part.get_content_subtype())})".encode()
+
+    payload = part.get_payload(decode=False)
+    if isinstance(payload, list):
+        payload = ""
+    raw = payload.encode("utf-8", errors="replace") if isinstance(payload, str) else payload
+    params = [(k, v) for k, v in part.get_params() or [] if k.lower() != part.get_content_type()]
+    param_text = "(" + " ".join(f"{_quote(k)} {_quote(v)}" for k, v in params) + ")" if params else "NIL"
+    encoding = part.get("Content-Transfer-Encoding", "7bit")
+    fields = [
+        _quote(part.get_content_maintype()),
+        _quote(part.get_content_subtype()),
+        param_text,
+        "NIL",
+        "NIL",
+        _quote(encoding),
+        str(len(raw)),
+    ]
+    if part.get_content_maintype() == "text":
+        fields.append(str(raw.count(b"\n")))
+    fields.append("NIL")  # md5
+    disposition = part.get_content_disposition()
+    if disposition:
+        filename = part.get_filename()
+        disp_params = f"({_quote('filename')} {_quote(filename)})" if filename else "NIL"
+        fields.append(f"({_quote(disposition)} {disp_params})")
+    else:
+        fields.append("NIL")
+    return ("(" + " ".join(fields) + ")").encode()
+
+
+def _split_raw(raw: bytes) -> tuple[bytes, bytes]:
+    for sep in (b"\r\n\r\n", b"\n\n"):
+        if sep in raw:
+            head, body = raw.split(sep, 1)
+            return head + sep, body
+    return raw, b""
+
+
+def _section(raw: bytes, section: str) -> bytes:
+    """Return the bytes of a BODY[section] fetch: HEADER, TEXT or a part path."""
+    section = section.upper()
+    if section == "":
+        return raw
+    head, body = _split_raw(raw)
+    if section == "HEADER":
+        return head
+    if section == "TEXT":
+        return body
+
+    msg = py_email.message_from_bytes(raw)
+    for index in section.split("."):
+        if msg.is_multipart():
+            msg = msg.get_payload()[int(index) - 1]
+        elif index != "1":
+            return b""
+    payload = msg.get_payload(decode=False)
+    if isinstance(payload, list):
+        return _split_raw(msg.as_bytes())[1]
+    return payload.encode("utf-8", errors="replace") if isinstance(payload, str) else payload
@@ -0,0 +1,81 @@
+"""
+Stand-in for the Ollama HTTP API (POST /api/generate) on a local port.
+
+Streams NDJSON over HTTP/1.1 chunked encoding like the real server, keeps
+connections alive, and records every request and TCP connection so tests
+can check pooling.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeOllamaServer"
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        fake = self.server
+        fake.requests.append(body)
+
+        if fake.status != 200:
+            payload = json.dumps({"error": "model not found"}).encode()
+            self.send_response(fake.status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        tokens = fake.reply(body["prompt"]) if callable(fake.reply) else fake.reply
+        for token in tokens:
+            time.sleep(fake.token_delay)
+            self._chunk(json.dumps({"model": body["model"], "response": token, "done": False}).encode() + b"\n")
+        final = {"model": body["model"], "response": "", "done": True,
+                 "prompt_eval_count": len(body["prompt"].split()), "eval_count": len(tokens)}
+        if not fake.truncate:
+            self._chunk(json.dumps(final).encode() + b"\n")
+        self._chunk(b"")
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, reply=("Hello", " world", ".\n"), token_delay: float = 0.0):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        # A token list, or a callable prompt -> token list
+        self.reply = reply
+        self.token_delay = token_delay
+        self.status = 200
+        self.truncate = False
+        self.requests: list[dict] = []
+        self.connections = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "FakeOllamaServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+import pytest
+
+from pipeline.ai_summary import OllamaError, agenerate, astream_generate, generate
+from tests.fake_ollama import FakeOllamaServer
+
+
+@pytest.fixture
+def ollama():
+    server = FakeOllamaServer(reply=["1.", " Submit", " the", " form", ".\n"], token_delay=0.01).start()
+    yield server
+    server.stop()
+
+
+def test_streams_tokens_and_reuses_connection(ollama) -> None:
+    seen = []
+
+    text, stats = generate("Emails: a", base_url=ollama.url, on_token=seen.append)
+    generate("Emails: b", base_url=ollama.url)
+
+    assert text == "1. Submit the form."
+    assert seen == ["1.", " Submit", " the", " form", ".\n"]
+    assert ollama.requests[0]["stream"] is True
+    assert ollama.requests[0]["options"]["num_predict"] == 350
+    assert ollama.connections == 1  # keep-alive through the shared session
+    assert stats.tokens == 5
+    assert 0 < stats.ttft_seconds < stats.total_seconds
+    assert stats.tokens_per_second > 0
+
+
+def test_async_variant_matches_sync(ollama) -> None:
+    seen = []
+
+    text, stats = asyncio.run(agenerate("Emails: a", base_url=ollama.url, on_token=seen.append))
+
+    assert text == "1. Submit the form."
+    assert len(seen) == 5 and stats.ttft_seconds is not None
+
+
+@pytest.mark.parametrize("failure", ["status", "truncate", "unreachable"])
+def test_failures_raise_ollama_error(ollama, failure) -> None:
+    url = ollama.url
+    if failure == "status":
+        ollama.status = 404
+    elif failure == "truncate":
+        ollama.truncate = True
+    else:
+        ollama.stop()
+
+    with pytest.raises(OllamaError):
+        generate("x", base_url=url, timeout=(1, 1))
+
+
+def test_async_stream_stops_when_the_consumer_does() -> None:
+    server = FakeOllamaServer(reply=["tok "] * 100, token_delay=0.02).start()
+
+    async def first_fragment() -> str:
+        async for fragment in astream_generate("Emails: a", base_url=server.url):
+            return fragment
+
+    try:
+        started = time.perf_counter()
+        assert asyncio.run(first_fragment()) == "tok "
+        assert time.perf_counter() - started < 1.0  # the full reply takes 2s
+    finally:
+        server.stop()
@@ -0,0 +1,14 @@
+import pytest
+
+from pipeline.alert_manager import AlertManager
+
+
+def test_batch_selection_parsing() -> None:
+    parse = AlertManager._parse_selection
+
+    assert parse("", 3) is None
+    assert parse("all", 3) == [True, True, True]
+    assert parse("none", 2) == [False, False]
+    assert parse("1, 3-4", 5) == [True, False, True, True, False]
+    with pytest.raises(ValueError):
+        parse("6", 5)
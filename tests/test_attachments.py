@@ -0,0 +1,65 @@
+import email as py_email
+import os
+from email.message import EmailMessage
+
+from pipeline.downloads_cleanup import classify_attachment
+from pipeline.header_triage import HEADER_ITEMS, attachment_descriptors
+from pipeline.imap_fetch import fetch_batched
+from pipeline.run import _extract_attachments
+
+
+def _raw(payload: bytes, filename: str, text_attachment: str = "") -> bytes:
+    msg = EmailMessage()
+    msg["From"] = "registrar@college.edu"
+    msg["Subject"] = "Your documents"
+    msg.set_content("see attached")
+    msg.add_attachment(payload, maintype="application", subtype="octet-stream", filename=filename)
+    if text_attachment:
+        msg.add_attachment(text_attachment, filename="letter.txt")
+    return msg.as_bytes()
+
+
+def test_descriptors_expose_metadata_and_stream_payload(tmp_path) -> None:
+    payload = os.urandom(300_000)
+    msg = py_email.message_from_bytes(_raw(payload, "scan.bin"))
+
+    (attachment,) = _extract_attachments(msg)
+
+    assert attachment.to_dict()["filename"] == "scan.bin"
+    assert attachment.content_type == "application/octet-stream"
+    assert abs(attachment.size - len(payload)) < len(payload) // 50
+    with attachment.open() as stream:
+        assert stream.read(10) == payload[:10]
+
+    saved = attachment.save_to(tmp_path)
+    again = attachment.save_to(tmp_path)
+    assert saved.read_bytes() == payload
+    assert again.name == "scan_1.bin"
+
+
+def test_imap_descriptor_streams_with_partial_fetches(fake_imap) -> None:
+    payload = os.urandom(100_000)
+    fake_imap.add_message("INBOX", _raw(payload, "scan.bin"))
+    client = fake_imap.connect()
+    client.select("INBOX")
+    (_, values), = fetch_batched(client, [b"1"], HEADER_ITEMS)
+
+    (attachment,) = attachment_descriptors(
+        values["BODYSTRUCTURE"], client, b"1", chunk_bytes=32 * 1024
+    )
+    fetches_before = fake_imap.count("FETCH")
+
+    with attachment.open() as stream:
+        assert stream.read() == payload
+    assert fake_imap.count("FETCH") - fetches_before > 1
+
+
+def test_attachment_goes_through_downloads_classifier() -> None:
+    msg = py_email.message_from_bytes(
+        _raw(b"\x00", "photo.bin", text_attachment="Semester fee receipt")
+    )
+
+    photo, letter = _extract_attachments(msg)
+
+    assert classify_attachment(letter) == "Important_College_Docs"
+    assert classify_attachment(photo) == ""
@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import google.oauth2.credentials
+import googleapiclient.discovery
+import pytest
+
+from pipeline import calendar_integration
+from pipeline.calendar_integration import CalendarEventIndex, GoogleCalendarIntegration, is_retryable
+from tests.fake_calendar import FakeCalendarService, http_error
+
+
+def _events(count: int, prefix: str = "msg") -> list[tuple[str, str, str]]:
+    return [(f"<{prefix}{i}@x>", f"Deadline {i}", f"Deadline {i}") for i in range(count)]
+
+
+def test_events_are_batched_and_reruns_are_idempotent(tmp_path: Path) -> None:
+    service = FakeCalendarService()
+    index = CalendarEventIndex(tmp_path / "calendar_events.sqlite3")
+    client = GoogleCalendarIntegration(service=service)
+
+    outcomes = client.create_events(_events(120), index=index, batch_size=50)
+
+    assert [o.status for o in outcomes.values()].count("created") == 120
+    assert service.batch_sizes == [50, 50, 20]
+    assert service.http_calls == 3
+
+    again = client.create_events(_events(121), index=index)
+    assert [o.status for o in again.values()].count("existing") == 120
+    assert again["<msg120@x>"].status == "created"
+    assert len(service.events_by_id) == 121
+    index.close()
+
+
+def test_lost_index_falls_back_to_server_conflict(tmp_path: Path) -> None:
+    service = FakeCalendarService()
+    client = GoogleCalendarIntegration(service=service)
+    first = client.create_events(_events(2))
+
+    # Same mail, fresh index: Calendar refuses the duplicate id with a 409
+    index = CalendarEventIndex(tmp_path / "calendar_events.sqlite3")
+    second = client.create_events(_events(2), index=index)
+
+    assert {k: o.status for k, o in second.items()} == {k: "existing" for k in first}
+    assert len(service.events_by_id) == 2
+    assert index.get("<msg0@x>") == first["<msg0@x>"].event_id
+    index.close()
+
+
+def test_quota_errors_are_retried_with_backoff() -> None:
+    service = FakeCalendarService()
+    service.fail_next = [429, 403]  # first two inserts throttled
+    delays = []
+    client = GoogleCalendarIntegration(service=service, sleep=delays.append)
+
+    outcomes = client.create_events(_events(3))
+
+    assert all(o.status == "created" for o in outcomes.values())
+    assert delays == [1.0]
+    assert service.batch_sizes == [3, 2]
+
+
+def test_permanent_errors_are_not_retried() -> None:
+    service = FakeCalendarService()
+    service.fail_next = [400]
+    delays = []
+    client = GoogleCalendarIntegration(service=service, sleep=delays.append)
+
+    outcomes = client.create_events(_events(1), max_retries=3)
+
+    assert outcomes["<msg0@x>"].status == "error"
+    assert delays == []
+    assert not is_retryable(http_error(403, "forbidden"))
+    assert is_retryable(http_error(403, "userRateLimitExceeded"))
+    assert is_retryable(http_error(503))
+
+
+class _FakeCreds:
+    def __init__(self, expires_in: timedelta):
+        self.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + expires_in
+        self.refresh_token = "refresh"
+        self.refreshes = 0
+
+    @property
+    def valid(self) -> bool:
+        return self.expiry > datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def refresh(self, request) -> None:
+        self.refreshes += 1
+        self.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+
+    def to_json(self) -> str:
+        return '{"token": "t"}'
+
+
+@pytest.fixture
+def shared_auth(tmp_path: Path, monkeypatch):
+    token = tmp_path / "token.json"
+    token.write_text("{}", encoding="utf-8")
+    monkeypatch.setattr(calendar_integration, "TOKEN_FILE", token)
+    creds = _FakeCreds(expires_in=timedelta(minutes=2))
+    loads, builds = [], []
+
+    def from_file(path, scopes):
+        loads.append(path)
+        return creds
+
+    def build(*args, **kwargs):
+        builds.append(kwargs)
+        return FakeCalendarService()
+
+    monkeypatch.setattr(google.oauth2.credentials.Credentials, "from_authorized_user_file", from_file)
+    monkeypatch.setattr(googleapiclient.discovery, "build", build)
+    calendar_integration.reset_service_cache()
+    yield creds, loads, builds
+    calendar_integration.reset_service_cache()
+
+
+def test_service_is_built_once_and_token_refreshed_before_expiry(shared_auth) -> None:
+    creds, loads, builds = shared_auth
+
+    first = calendar_integration.get_calendar_service()
+    second = calendar_integration.get_calendar_service()
+
+    assert first is second
+    assert len(loads) == 1
+    assert len(builds) == 1 and builds[0]["static_discovery"] is True
+    # Still valid for 2 minutes, but inside the refresh margin
+    assert creds.refreshes == 1
+    assert not calendar_integration.needs_refresh(creds)
+
+
+def test_no_sign_in_when_every_event_exists(shared_auth, tmp_path: Path) -> None:
+    _, loads, builds = shared_auth
+    index = CalendarEventIndex(tmp_path / "calendar_events.sqlite3")
+    index.put_many([("<msg0@x>", "e0")])
+    client = GoogleCalendarIntegration()
+
+    outcomes = client.create_events(_events(1), index=index)
+
+    assert outcomes["<msg0@x>"].status == "existing"
+    assert client.service is None and loads == [] and builds == []
+    index.close()
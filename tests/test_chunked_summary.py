@@ -0,0 +1,127 @@
+import re
+import threading
+import time
+
+from pipeline.ai_summary import GenerationStats
+from pipeline.chunked_summary import MAP_OPTIONS, parse_bullets, split_by_token_budget, summarize_emails
+from pipeline.summary_cache import SummaryCache, summary_key
+
+
+class FakeLLM:
+    """Answers map prompts with one bullet per listed email; reduce with `reduce_reply`."""
+
+    def __init__(self, reduce_reply=None):
+        self.reduce_reply = reduce_reply
+        self.prompts = []
+        self.options = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, prompt, options=None, on_token=None):
+        with self.lock:
+            self.prompts.append(prompt)
+            self.options.append(options)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.01)
+        if "Partial summaries:" in prompt:
+            text = self.reduce_reply(prompt) if self.reduce_reply else prompt.split("Partial summaries:\n", 1)[1]
+        else:
+            text = "\n\n".join(f"{n}. Summary of {s}" for n, s in re.findall(r"^\[(\d+)\] (.*)$", prompt, re.M))
+        if on_token:
+            on_token(text)
+        with self.lock:
+            self.in_flight -= 1
+        return text, GenerationStats(tokens=len(text.split()), ttft_seconds=0.01, total_seconds=0.02)
+
+
+def test_split_respects_budget_and_keeps_numbering() -> None:
+    emails = ["x" * 40] * 10  # 11 tokens each + 2 overhead
+
+    chunks = split_by_token_budget(emails, budget=30)
+
+    assert [len(c) for c in chunks] == [2, 2, 2, 2, 2]
+    assert [n for c in chunks for n, _ in c] == list(range(1, 11))
+    assert split_by_token_budget(["y" * 400], budget=30) == [[(1, "y" * 400)]]
+
+
+def test_map_reduce_bounds_parallelism_and_tracks_chunks() -> None:
+    emails = [f"Email {i} " + "detail " * 10 for i in range(1, 9)]
+    merged = "1. First\n\n2,5. Two related deadlines\n\n3. Third\n\n99. Invented"
+    llm = FakeLLM(reduce_reply=lambda prompt: merged)
+    streamed = []
+
+    summary = summarize_emails(emails, generate_fn=llm, chunk_budget=50, max_parallel=2,
+                               on_token=streamed.append)
+
+    assert summary.chunk_count == 4
+    assert llm.max_in_flight <= 2
+    assert len(llm.prompts) == 5 and "Partial summaries:" in llm.prompts[-1]
+    assert streamed == [merged]  # only the reduce pass streams
+    assert summary.reduced
+    assert [(b.emails, b.chunks) for b in summary.bullets] == [([1], [1]), ([2, 5], [1, 3]), ([3], [2])]
+    assert summary.text.splitlines()[2] == "2. Two related deadlines [chunks 1, 3]"
+    assert summary.stats()["calls"] == 5
+
+
+def test_single_chunk_skips_reduce_and_unparseable_reduce_keeps_map_output() -> None:
+    llm = FakeLLM()
+    single = summarize_emails(["Fee due Friday"], generate_fn=llm)
+    assert len(llm.prompts) == 1
+    assert single.text == "1. Summary of Fee due Friday [chunk 1]\n"
+
+    rambling = FakeLLM(reduce_reply=lambda prompt: "Here is your summary: all good!")
+    summary = summarize_emails([f"Email {i} " + "x" * 60 for i in range(4)], generate_fn=rambling, chunk_budget=20)
+    assert not summary.reduced
+    assert [b.emails for b in summary.bullets] == [[1], [2], [3], [4]]
+
+
+def test_parse_bullets_accepts_common_numbering() -> None:
+    assert parse_bullets("1. a\n[2]. b\n3) c\n4,6. d\n- stray\n") == [
+        ([1], "a"), ([2], "b"), ([3], "c"), ([4, 6], "d"),
+    ]
+
+
+def test_cached_emails_skip_the_llm(tmp_path) -> None:
+    emails = ["Fee due Friday", "Exam hall ticket", "Scholarship form"]
+    keys = [summary_key(e, "body") for e in emails]
+
+    with SummaryCache(tmp_path / "summary_cache.sqlite3") as cache:
+        first = FakeLLM()
+        summarize_emails(emails[:2], generate_fn=first, cache=cache, keys=keys[:2])
+
+        second = FakeLLM()
+        summary = summarize_emails(emails, generate_fn=second, cache=cache, keys=keys)
+
+    assert len(second.prompts) == 1
+    assert "[3] Scholarship form" in second.prompts[0]
+    assert "Fee due Friday" not in second.prompts[0]
+    assert summary.cached == 2
+    assert summary.text.splitlines()[::2] == [
+        "1. Summary of Fee due Friday [cached]",
+        "2. Summary of Exam hall ticket [cached]",
+        "3. Summary of Scholarship form [chunk 1]",
+    ]
+
+
+def test_summary_key_normalizes_and_includes_model() -> None:
+    base = summary_key("Fee deadline", "Pay   the fee\nby Friday")
+
+    assert summary_key("RE: Fwd: fee DEADLINE ", "pay the fee by friday") == base
+    assert summary_key("Fee deadline", "Pay the fee by Friday" + " x" * 400) == summary_key(
+        "Fee deadline", "Pay the fee by Friday" + " x" * 400 + " tail")
+    assert summary_key("Fee deadline", "Pay the fee by Friday", model="llama3") != base
+    assert summary_key("Fee deadline", "Pay the fee by Friday", options={"temperature": 0.7}) != base
+
+
+def test_summary_key_follows_the_options_map_calls_send() -> None:
+    llm = FakeLLM()
+    summarize_emails(["Fee due Friday", "Exam hall ticket"], generate_fn=llm)
+    sent = llm.options[0]
+
+    assert {k: v for k, v in sent.items() if k != "num_predict"} == MAP_OPTIONS
+    # The per-chunk length cap doesn't change one email's bullet
+    assert summary_key("Fee", "body", options=sent) == summary_key("Fee", "body", options=MAP_OPTIONS)
+    assert summary_key("Fee", "body", options={**MAP_OPTIONS, "top_p": 0.5}) != summary_key(
+        "Fee", "body", options=MAP_OPTIONS)
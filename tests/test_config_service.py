@@ -0,0 +1,68 @@
+import json
+import os
+from pathlib import Path
+
+from pipeline.config_service import ConfigService, get_config_service
+
+
+def _write(path: Path, data: dict, mtime_ns: int) -> None:
+    path.write_text(json.dumps(data), encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_parses_once_and_reloads_on_mtime_change(tmp_path: Path) -> None:
+    rules = tmp_path / "email_rules.json"
+    _write(rules, {"priority_keywords": ["exam"]}, 1_000_000_000)
+    service = ConfigService(rules)
+    seen = []
+    service.subscribe(lambda config: seen.append(list(config["priority_keywords"])))
+
+    for _ in range(5):
+        config = service.get()
+    assert service.loads == 1
+    assert config["mode"] == "balanced"
+    assert config["trusted_senders"] == []
+
+    _write(rules, {"priority_keywords": ["exam", "fee"]}, 2_000_000_000)
+    assert service.get()["priority_keywords"] == ["exam", "fee"]
+    assert (service.loads, service.version) == (2, 2)
+    assert seen == [["exam", "fee"]]
+
+    # Touched but identical: re-parsed, no new version, nobody notified
+    os.utime(rules, ns=(3_000_000_000, 3_000_000_000))
+    service.get()
+    assert (service.loads, service.version) == (3, 2)
+    assert seen == [["exam", "fee"]]
+
+
+def test_save_updates_cache_without_reparse(tmp_path: Path) -> None:
+    rules = tmp_path / "email_rules.json"
+    service = get_config_service(rules)
+    assert get_config_service(tmp_path / "." / "email_rules.json") is service
+
+    data = service.snapshot()
+    data["trusted_senders"].append("boss@company.com")
+    service.save(data)
+
+    assert service.get()["trusted_senders"] == ["boss@company.com"]
+    assert service.loads == 1
+    assert json.loads(rules.read_text(encoding="utf-8"))["trusted_senders"] == ["boss@company.com"]
+
+
+def test_bound_method_subscribers_are_weak(tmp_path: Path) -> None:
+    service = ConfigService(tmp_path / "email_rules.json")
+
+    class Listener:
+        calls = 0
+
+        def on_change(self, config) -> None:
+            Listener.calls += 1
+
+    listener = Listener()
+    service.subscribe(listener.on_change)
+    service.save({"mode": "strict"})
+    del listener
+    service.save({"mode": "balanced"})
+
+    assert Listener.calls == 1
+    assert len(service._subscribers) == 0
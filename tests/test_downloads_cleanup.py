@@ -0,0 +1,195 @@
+import multiprocessing
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from pipeline import downloads_cleanup
+from pipeline.downloads_cleanup import TierStats, cleanup_downloads, iter_extracted_text
+from pipeline.extraction_cache import ExtractionCache
+
+
+def _populate(folder: Path) -> None:
+    folder.mkdir()
+    (folder / "b.txt").write_text("semester marksheet", encoding="utf-8")
+    (folder / "a.txt").write_text("semester marksheet", encoding="utf-8")
+    (folder / "c.txt").write_text("course completion certificate", encoding="utf-8")
+    (folder / "notes.txt").write_text("shopping list", encoding="utf-8")
+
+
+def _layout(folder: Path) -> list[str]:
+    return sorted(str(p.relative_to(folder)) for p in folder.rglob("*") if p.is_file())
+
+
+def test_parallel_and_serial_cleanup_are_identical(tmp_path) -> None:
+    serial, parallel = tmp_path / "serial", tmp_path / "parallel"
+    _populate(serial)
+    _populate(parallel)
+
+    assert cleanup_downloads(serial, max_workers=1) == 3
+    assert cleanup_downloads(parallel, max_workers=3) == 3
+
+    assert _layout(serial) == _layout(parallel) == [
+        "Certificates/course_completion_certificate.txt",
+        "Important_College_Docs/semester_marksheet.txt",
+        "Important_College_Docs/semester_marksheet_1.txt",
+        "notes.txt",
+    ]
+
+
+def test_extraction_results_stream_in_input_order(tmp_path) -> None:
+    files = []
+    for i in range(6):
+        path = tmp_path / f"{i}.txt"
+        path.write_text(f"file {i}", encoding="utf-8")
+        files.append(path)
+
+    results = list(iter_extracted_text(files, max_workers=3))
+
+    assert [p for p, _ in results] == files
+    assert [t for _, t in results] == [f"file {i}" for i in range(6)]
+
+
+def test_failed_extraction_yields_none(tmp_path) -> None:
+    # Pool workers are spawned and import the real extractor, so fail for real
+    path = tmp_path / "scan.pdf"
+    path.write_bytes(b"not really a pdf")
+
+    assert list(iter_extracted_text([path, path], max_workers=2, ocr=False)) == [(path, None), (path, None)]
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="needs a FIFO to block a worker")
+def test_hung_workers_are_terminated_after_a_timeout(tmp_path) -> None:
+    # Reading a FIFO nobody writes to blocks forever, like a stuck OCR call
+    stuck = tmp_path / "stuck.txt"
+    os.mkfifo(stuck)
+    fine = tmp_path / "fine.txt"
+    fine.write_text("fee receipt", encoding="utf-8")
+
+    results = list(iter_extracted_text([stuck, fine], max_workers=2, timeout=0.5))
+
+    assert results == [(stuck, None), (fine, "fee receipt")]
+    deadline = time.monotonic() + 5
+    while multiprocessing.active_children() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert multiprocessing.active_children() == []
+
+
+def test_failed_extraction_is_not_cached(tmp_path, monkeypatch) -> None:
+    downloads = tmp_path / "Downloads"
+    downloads.mkdir()
+    (downloads / "scan.txt").write_text("fee receipt", encoding="utf-8")
+    cache = ExtractionCache(tmp_path / "cache.sqlite3")
+    real_extract = downloads_cleanup.extract_text_from_file
+    monkeypatch.setattr(downloads_cleanup, "extract_text_from_file", lambda *a, **k: None)
+
+    assert cleanup_downloads(downloads, max_workers=1, cache=cache) == 0
+
+    monkeypatch.setattr(downloads_cleanup, "extract_text_from_file", real_extract)
+    assert cleanup_downloads(downloads, max_workers=1, cache=cache) == 1
+    assert (downloads / "Important_College_Docs" / "fee_receipt.txt").exists()
+
+
+def test_unchanged_files_are_never_extracted_twice(tmp_path, monkeypatch) -> None:
+    downloads = tmp_path / "Downloads"
+    downloads.mkdir()
+    (downloads / "notes.txt").write_text("shopping list", encoding="utf-8")
+    (downloads / "scan.txt").write_text("fee receipt", encoding="utf-8")
+    cache = ExtractionCache(tmp_path / "cache.sqlite3")
+
+    calls = []
+    real_extract = downloads_cleanup.extract_text_from_file
+
+    def counting_extract(file_path, timeout=None, ocr=True):
+        calls.append(file_path.name)
+        return real_extract(file_path, timeout, ocr=ocr)
+
+    monkeypatch.setattr(downloads_cleanup, "extract_text_from_file", counting_extract)
+
+    assert cleanup_downloads(downloads, max_workers=1, cache=cache) == 1
+    assert sorted(calls) == ["notes.txt", "scan.txt"]
+
+    calls.clear()
+    assert cleanup_downloads(downloads, max_workers=1, cache=cache) == 0
+    assert calls == []
+    assert cache.stat_hits == 1
+
+    # Same content under a new name → content-hash hit, still no extraction
+    (downloads / "notes.txt").rename(downloads / "list.txt")
+    cleanup_downloads(downloads, max_workers=1, cache=cache)
+    assert calls == []
+    assert cache.hash_hits == 1
+
+
+
+def test_new_files_are_hashed_once(tmp_path, monkeypatch) -> None:
+    from pipeline import extraction_cache
+
+    downloads = tmp_path / "Downloads"
+    downloads.mkdir()
+    (downloads / "notes.txt").write_text("shopping list", encoding="utf-8")
+    (downloads / "scan.txt").write_text("fee receipt", encoding="utf-8")
+    cache = ExtractionCache(tmp_path / "cache.sqlite3")
+    hashed = []
+    real_hash = extraction_cache.file_sha256
+    monkeypatch.setattr(extraction_cache, "file_sha256", lambda p: hashed.append(p.name) or real_hash(p))
+
+    assert cleanup_downloads(downloads, max_workers=1, cache=cache) == 1
+    assert sorted(hashed) == ["notes.txt", "scan.txt"]
+    assert cache.lookup(downloads / "notes.txt")[0]["sha256"] == real_hash(downloads / "notes.txt")
+
+
+def test_cheaper_tiers_run_before_ocr(tmp_path, monkeypatch) -> None:
+    downloads = tmp_path / "Downloads"
+    downloads.mkdir()
+    (downloads / "marksheet.png").write_bytes(b"not really an image")
+    (downloads / "letter.txt").write_text("admission offer", encoding="utf-8")
+    (downloads / "photo.png").write_bytes(b"not really an image")
+    (downloads / "holiday.png").write_bytes(b"not really an image")
+
+    extracted = []
+
+    def fake_extract(file_path, timeout=None, ocr=True):
+        extracted.append((file_path.name, ocr))
+        if file_path.suffix == ".txt":
+            return file_path.read_text(encoding="utf-8")
+        if file_path.name == "photo.png" and ocr:
+            return "provisional degree"
+        return ""
+
+    monkeypatch.setattr(downloads_cleanup, "extract_text_from_file", fake_extract)
+    stats = TierStats()
+
+    assert cleanup_downloads(downloads, max_workers=1, stats=stats) == 3
+
+    # marksheet.png is placed by name alone and never opened; only the two
+    # undecided images reach OCR
+    assert sorted(extracted) == [
+        ("holiday.png", False), ("holiday.png", True),
+        ("letter.txt", False),
+        ("photo.png", False), ("photo.png", True),
+    ]
+    assert stats.counts == {"cache": 0, "filename": 1, "text": 1, "ocr": 1, "unmatched": 1}
+    assert stats.ocr_avoided == 2
+    assert (downloads / "Important_College_Docs" / "marksheet.png").exists()
+    assert (downloads / "Certificates" / "provisional_degree.png").exists()
+
+
+def test_files_move_before_slower_tiers_finish(tmp_path, monkeypatch) -> None:
+    downloads = tmp_path / "Downloads"
+    downloads.mkdir()
+    (downloads / "letter.txt").write_text("admission offer", encoding="utf-8")
+    (downloads / "scan.png").write_bytes(b"not really an image")
+    moved_before_ocr = []
+
+    def fake_extract(file_path, timeout=None, ocr=True):
+        if ocr:
+            moved_before_ocr.append(not (downloads / "letter.txt").exists())
+            return ""
+        return file_path.read_text(encoding="utf-8") if file_path.suffix == ".txt" else ""
+
+    monkeypatch.setattr(downloads_cleanup, "extract_text_from_file", fake_extract)
+
+    assert cleanup_downloads(downloads, max_workers=1) == 1
+    assert moved_before_ocr == [True]
@@ -0,0 +1,54 @@
+import base64
+import email as py_email
+from email.message import EmailMessage
+
+from pipeline.email_utils import extract_body, stream_text
+
+
+def test_html_is_reduced_to_visible_text() -> None:
+    html = (
+        "<html><head><style>p { color: red; }</style></head><body>"
+        "<script>var deadline = 1 < 2;</script>"
+        "<p>Exam&nbsp;on <b>Monday</b></p><p>Bring ID</p></body></html>"
+    )
+
+    text = stream_text(html.encode(), subtype="html")
+
+    assert "deadline" not in text
+    assert "color" not in text
+    assert text.split() == ["Exam", "on", "Monday", "Bring", "ID"]
+
+
+def test_unclosed_head_does_not_hide_the_body() -> None:
+    html = "<html><head><meta charset='utf-8'><title>Sale<body><p>Exam on Monday</p></body></html>"
+
+    assert stream_text(html.encode(), subtype="html").strip() == "Exam on Monday"
+
+
+def test_body_budget_caps_decoded_bytes() -> None:
+    payload = base64.encodebytes(("é" * 10_000).encode("utf-8"))
+
+    text = stream_text(payload, "base64", "utf-8", max_bytes=101)
+
+    # 101 bytes = 50 whole characters; the split one is dropped
+    assert text == "é" * 50
+
+
+def test_extract_body_honours_declared_charset() -> None:
+    msg = EmailMessage()
+    msg["Subject"] = "Résumé"
+    msg.set_content("Café réservé", charset="iso-8859-1", cte="quoted-printable")
+    parsed = py_email.message_from_bytes(msg.as_bytes())
+
+    assert extract_body(parsed) == "Café réservé"
+
+
+def test_extract_body_stops_reading_large_html() -> None:
+    msg = EmailMessage()
+    msg.set_content("<p>" + "newsletter " * 200_000 + "</p>", subtype="html")
+    parsed = py_email.message_from_bytes(msg.as_bytes())
+
+    body = extract_body(parsed, max_bytes=1024)
+
+    assert body.startswith("newsletter newsletter")
+    assert len(body) <= 1024
@@ -0,0 +1,79 @@
+from email.message import EmailMessage
+
+from pipeline.email_utils import needs_body_for_rule
+from pipeline.header_triage import find_text_part, iter_emails
+from pipeline.imap_fetch import parse_value
+
+CONFIG = {"trusted_senders": ["boss@company.com"], "priority_keywords": ["deadline"]}
+
+
+def _raw(subject: str, body: str, sender: str = "someone@example.com", attachment_size: int = 0) -> bytes:
+    msg = EmailMessage()
+    msg["From"] = sender
+    msg["Subject"] = subject
+    msg.set_content(body)
+    msg.add_alternative(f"<p>{body}</p>", subtype="html")
+    if attachment_size:
+        msg.add_attachment(b"x" * attachment_size, maintype="application", subtype="pdf", filename="scan.pdf")
+    return msg.as_bytes()
+
+
+def test_find_text_part_skips_attachments() -> None:
+    structure, _ = parse_value(
+        b'(("text" "plain" ("name" "notes.txt") NIL NIL "base64" 10 1 NIL ("attachment" NIL))'
+        b'("text" "html" ("charset" "iso-8859-1") NIL NIL "quoted-printable" 20 1 NIL NIL) "mixed")'
+    )
+
+    part = find_text_part(structure)
+
+    assert part.section == "2"
+    assert part.subtype == "html"
+    assert part.charset == "iso-8859-1"
+
+
+def test_header_first_only_fetches_bodies_for_undecided(fake_imap) -> None:
+    fake_imap.add_message("INBOX", _raw("Project deadline", "see attached", attachment_size=500_000))
+    fake_imap.add_message("INBOX", _raw("Hello", "ping", sender="boss@company.com", attachment_size=500_000))
+    fake_imap.add_message("INBOX", _raw("Weekly notes", "the deadline moved", attachment_size=500_000))
+    client = fake_imap.connect()
+    client.select("INBOX")
+    ids = client.search(None, "ALL")[1][0].split()
+    before = fake_imap.bytes_sent
+
+    emails = [
+        e for _, e in iter_emails(client, ids, "INBOX", lambda e: needs_body_for_rule(e, CONFIG))
+    ]
+
+    assert [e.subject for e in emails] == ["Project deadline", "Hello", "Weekly notes"]
+    assert emails[0].body == ""
+    assert emails[1].body == ""
+    assert emails[2].body == "the deadline moved"
+    assert fake_imap.count("FETCH") == 2
+    assert fake_imap.bytes_sent - before < 10_000
+
+
+def test_full_mode_downloads_whole_message(fake_imap) -> None:
+    fake_imap.add_message("INBOX", _raw("Project deadline", "see attached"))
+    client = fake_imap.connect()
+    client.select("INBOX")
+
+    emails = [e for _, e in iter_emails(client, [b"1"], "INBOX", lambda e: True, mode="full")]
+
+    assert emails[0].body == "see attached"
+
+
+def test_header_first_fetches_only_the_body_budget(fake_imap) -> None:
+    fake_imap.add_message("INBOX", _raw("Weekly notes", "the deadline moved " + "x" * 200_000))
+    client = fake_imap.connect()
+    client.select("INBOX")
+    before = fake_imap.bytes_sent
+
+    emails = [
+        e for _, e in iter_emails(
+            client, [b"1"], "INBOX", lambda e: True, body_max_bytes=4096
+        )
+    ]
+
+    assert emails[0].body.startswith("the deadline moved")
+    assert len(emails[0].body) <= 4096
+    assert fake_imap.bytes_sent - before < 20_000
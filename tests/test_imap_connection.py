@@ -0,0 +1,90 @@
+import threading
+import time
+from email.message import EmailMessage
+
+from pipeline.imap_connection import IMAPConnection, serve_forever
+from pipeline.sync_state import FolderSync, SyncStateStore
+
+
+def _raw(i: int) -> bytes:
+    msg = EmailMessage()
+    msg["From"] = "someone@example.com"
+    msg["Subject"] = f"Message {i}"
+    msg.set_content("hello")
+    return msg.as_bytes()
+
+
+def _connection(fake_imap, **kwargs) -> IMAPConnection:
+    kwargs.setdefault("retry_backoff", 0)
+    return IMAPConnection("127.0.0.1", fake_imap.port, "user", "password", use_ssl=False, **kwargs).connect()
+
+
+def test_reselecting_the_same_folder_is_free(fake_imap, tmp_path) -> None:
+    for i in range(3):
+        fake_imap.add_message("INBOX", _raw(i))
+    conn = _connection(fake_imap)
+    store = SyncStateStore(tmp_path / "sync.sqlite3")
+
+    conn.select("INBOX")
+    first = FolderSync(conn, store, "me", "INBOX", initial_window=10)
+    first.commit(first.new_uids())
+    fake_imap.add_message("INBOX", _raw(3))
+
+    conn.select("INBOX")
+    second = FolderSync(conn, store, "me", "INBOX", initial_window=10)
+
+    assert fake_imap.count("SELECT") == 1
+    assert second.uidvalidity == first.uidvalidity
+    assert second.new_uids() == [b"4"]
+
+
+def test_reconnects_and_reselects_after_drop(fake_imap) -> None:
+    fake_imap.add_message("INBOX", _raw(0))
+    conn = _connection(fake_imap)
+    conn.select("INBOX")
+
+    fake_imap.drop_connections()
+    typ, data = conn.uid("SEARCH", None, "ALL")
+
+    assert typ == "OK" and data[0] == b"1"
+    assert conn.stats["reconnects"] == 1
+    assert conn.stats["connects"] == 2
+    assert fake_imap.count("SELECT") == 2
+
+
+def test_noop_keepalive_after_quiet_period(fake_imap) -> None:
+    conn = _connection(fake_imap, keepalive=0.05)
+    conn.select("INBOX")
+    time.sleep(0.1)
+
+    conn.uid("SEARCH", None, "ALL")
+
+    assert fake_imap.count("NOOP") == 1
+    assert conn.stats["keepalives"] == 1
+
+
+def test_idle_wakes_up_on_new_mail(fake_imap) -> None:
+    conn = _connection(fake_imap)
+    threading.Timer(0.2, fake_imap.add_message, args=("INBOX", _raw(0))).start()
+
+    start = time.monotonic()
+    assert conn.wait_for_mail("INBOX", timeout=5) is True
+    assert time.monotonic() - start < 2
+
+    # Quiet mailbox: IDLE times out and the connection stays usable
+    assert conn.wait_for_mail("INBOX", timeout=0.2) is False
+    assert conn.uid("SEARCH", None, "ALL")[1][0] == b"1"
+
+
+def test_daemon_loop_runs_handler_per_arrival(fake_imap) -> None:
+    conn = _connection(fake_imap)
+    seen = []
+
+    def handler(c):
+        c.select("INBOX")
+        seen.append(len(c.uid("SEARCH", None, "ALL")[1][0].split()))
+        fake_imap.add_message("INBOX", _raw(len(seen)))
+
+    assert serve_forever(conn, handler, idle_timeout=5, max_cycles=3) == 3
+    assert seen == [0, 1, 2]
+    assert fake_imap.count("IDLE") == 2
@@ -0,0 +1,73 @@
+from email.message import EmailMessage
+
+from pipeline import spam_processor
+from pipeline.imap_fetch import iter_messages, message_set, parse_fetch_response
+from pipeline.learning_manager import LearningManager
+from pipeline.sync_state import SyncStateStore
+
+
+def _raw(subject: str, sender: str = "someone@example.com", body: str = "hello") -> bytes:
+    msg = EmailMessage()
+    msg["From"] = sender
+    msg["Subject"] = subject
+    msg.set_content(body)
+    return msg.as_bytes()
+
+
+def test_message_set_collapses_ranges() -> None:
+    assert message_set([b"3", b"1", b"2", b"7", b"9", b"10"]) == "1:3,7,9:10"
+    assert message_set([5]) == "5"
+    assert message_set([]) == ""
+
+
+def test_parse_fetch_response_handles_literals_and_atoms() -> None:
+    data = [
+        (b"1 (UID 10 RFC822 {5}", b"hello"),
+        b")",
+        (b"2 (UID 11 FLAGS (\\Seen) BODY[HEADER] {3}", b"abc"),
+        b" RFC822.SIZE 42)",
+    ]
+
+    parsed = list(parse_fetch_response(data))
+
+    assert parsed[0] == (b"1", {"UID": "10", "RFC822": b"hello"})
+    assert parsed[1][1]["FLAGS"] == ["\\Seen"]
+    assert parsed[1][1]["BODY[HEADER]"] == b"abc"
+    assert parsed[1][1]["RFC822.SIZE"] == "42"
+
+
+def test_iter_messages_uses_one_fetch_per_chunk(fake_imap) -> None:
+    for i in range(25):
+        fake_imap.add_message("INBOX", _raw(f"Message {i}"))
+    client = fake_imap.connect()
+    client.select("INBOX")
+    _, data = client.search(None, "ALL")
+    ids = data[0].split()
+
+    subjects = [msg["Subject"] for _, msg in iter_messages(client, ids, chunk_size=10)]
+
+    assert subjects == [f"Message {i}" for i in range(25)]
+    assert fake_imap.count("FETCH") == 3
+
+
+def test_process_spam_folder_streams_batched_fetch(fake_imap, tmp_path, monkeypatch) -> None:
+    rules = tmp_path / "email_rules.json"
+    rules.write_text('{"trusted_senders": ["boss@company.com"], "priority_keywords": []}', encoding="utf-8")
+    monkeypatch.setattr(spam_processor, "LearningManager", lambda: LearningManager(rules))
+    monkeypatch.setattr(spam_processor, "load_config", lambda: {"trusted_senders": [], "priority_keywords": []})
+
+    fake_imap.add_message("[Gmail]/Spam", _raw("Quarterly plan", sender="boss@company.com"))
+    for i in range(4):
+        fake_imap.add_message("[Gmail]/Spam", _raw(f"Buy now {i}", sender="promo@ads.com"))
+    client = fake_imap.connect()
+
+    metrics = spam_processor.process_spam_folder(
+        client, use_alerts=False, sync_store=SyncStateStore(tmp_path / "sync.sqlite3")
+    )
+
+    assert metrics["reviewed"] == 5
+    assert metrics["recovered"] == 1
+    assert metrics["deleted"] == 4
+    assert fake_imap.count("UID FETCH") == 1
+    assert fake_imap.uids("[Gmail]/Spam") == []
+    assert len(fake_imap.uids("INBOX")) == 1
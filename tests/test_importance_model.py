@@ -0,0 +1,148 @@
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from pipeline import importance_model  # noqa: E402
+from pipeline.email_utils import Email  # noqa: E402
+from pipeline.importance_model import (  # noqa: E402
+    FeatureBatch,
+    ImportanceModel,
+    classify,
+    feature_slots,
+    featurize,
+    load_model,
+    threshold_for,
+)
+from pipeline.learning_manager import LearningManager, load_decisions  # noqa: E402
+
+
+def _examples(n: int = 12) -> tuple[list[Email], list[bool]]:
+    emails, labels = [], []
+    for i in range(n):
+        emails.append(Email(f"pm{i}@company.com", f"Contract review {i}", "Please sign the contract by Friday", ""))
+        labels.append(True)
+        emails.append(Email(f"deals{i}@shop.com", f"Flash sale {i}", "Huge discount, limited offer, buy now", ""))
+        labels.append(False)
+    return emails, labels
+
+
+def test_features_are_stable_and_shared_by_domain() -> None:
+    a = Email("Alice <alice@company.com>", "Budget", "", "INBOX")
+    b = Email("bob@company.com", "Lunch", "", "INBOX")
+
+    assert feature_slots(a) == feature_slots(Email("alice@company.com", "budget", "", "SPAM"))
+    assert len(feature_slots(a) & feature_slots(b)) == 1  # the domain
+
+    batch = featurize([a, b, Email("", "", "", "INBOX")])
+    assert batch.size == 3
+    assert batch.counts.tolist() == [3, 3, 0]
+    assert batch.rows.tolist() == [0, 0, 0, 1, 1, 1]
+
+
+def test_fit_separates_recovered_from_deleted_mail() -> None:
+    model = ImportanceModel().fit(*_examples())
+
+    scores = model.score([
+        Email("legal@company.com", "Contract for review", "Sign by Monday", ""),
+        Email("promo@shop.com", "Weekend sale", "Discount on everything", ""),
+    ])
+
+    assert scores[0] > 0.8
+    assert scores[1] < 0.2
+    assert model.score([]).shape == (0,)
+
+
+def test_modes_map_to_thresholds(capsys) -> None:
+    assert threshold_for("strict") > threshold_for("balanced") > threshold_for("relaxed")
+    assert threshold_for(None) == threshold_for("balanced")
+    assert threshold_for("yolo") == threshold_for("balanced")
+    assert "Unknown mode" in capsys.readouterr().out
+
+
+def test_classify_lets_rules_decide_before_the_model() -> None:
+    model = ImportanceModel().fit(*_examples())
+    emails = [
+        Email("promo@shop.com", "Invoice sale", "", "INBOX"),
+        Email("legal@company.com", "Contract review", "", "INBOX"),
+        Email("promo@shop.com", "Flash sale", "", "INBOX"),
+    ]
+    config = {"priority_keywords": ["invoice"]}
+
+    assert classify(emails, config, None) == [(True, "keyword:invoice"), (False, "none"), (False, "none")]
+    results = classify(emails, config, model)
+    assert results[0] == (True, "keyword:invoice")
+    assert results[1][0] and results[1][1].startswith("model:")
+    assert not results[2][0]
+
+
+def test_mode_changes_how_much_the_model_flags() -> None:
+    model = ImportanceModel(bias=0.0)  # every undecided email scores 0.5
+    emails = [Email("x@y.com", "hello", "", "INBOX")]
+
+    assert classify(emails, {"mode": "relaxed"}, model)[0][0]
+    assert classify(emails, {"mode": "balanced"}, model)[0][0]
+    assert not classify(emails, {"mode": "strict"}, model)[0][0]
+
+
+def test_decisions_train_and_persist_a_model(tmp_path, monkeypatch) -> None:
+    rules = tmp_path / "email_rules.json"
+    decisions = tmp_path / "decisions.jsonl"
+    emails, labels = _examples()
+
+    with LearningManager(rules) as manager:
+        for email_obj, label in list(zip(emails, labels))[:4]:
+            manager.record_decision(email_obj, label)
+    assert manager.decisions_file == decisions
+    assert len(load_decisions(decisions)) == 4
+    assert load_model(decisions) is None  # too few to learn from
+
+    with LearningManager(rules) as manager:
+        for email_obj, label in zip(emails, labels):
+            manager.record_decision(email_obj, label)
+    model = load_model(decisions)
+    assert model is not None and model.examples == 28
+    assert (tmp_path / "importance_model.npz").exists()
+
+    monkeypatch.setattr(importance_model, "train_from_decisions", lambda d: pytest.fail("retrained"))
+    again = load_model(decisions)
+    assert np.array_equal(again.weights, model.weights)
+    assert again.bias == pytest.approx(model.bias)
+
+
+def test_decision_log_is_compacted(tmp_path, monkeypatch) -> None:
+    from pipeline import learning_manager
+
+    monkeypatch.setattr(learning_manager, "MAX_DECISIONS", 5)
+    decisions = tmp_path / "decisions.jsonl"
+    manager = LearningManager(tmp_path / "email_rules.json")
+    for i in range(11):
+        manager.record_decision(Email(f"s{i}@x.com", str(i), "", ""), False)
+    manager.flush()
+
+    lines = decisions.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["subject"] for line in lines] == ["6", "7", "8", "9", "10"]
+
+
+def test_scores_a_large_batch() -> None:
+    model = ImportanceModel().fit(*_examples())
+    emails = [Email(f"u{i}@d{i % 50}.com", f"Subject {i} about things", "word " * 50 + str(i), "")
+              for i in range(2000)]
+
+    batch = featurize(emails)
+    assert isinstance(batch, FeatureBatch)
+    assert model.score(batch).shape == (2000,)
+
+
+def test_body_is_fetched_only_for_borderline_header_scores() -> None:
+    from pipeline.importance_model import needs_body
+
+    model = ImportanceModel().fit(*_examples())
+    clear = Email("deals@shop.com", "Flash sale", "", "SPAM")
+    unknown = Email("someone@elsewhere.org", "Hello", "", "SPAM")
+
+    assert not needs_body(clear, {}, model)
+    assert needs_body(unknown, {}, model)  # no header evidence either way
+    assert needs_body(clear, {"priority_keywords": ["invoice"]}, model)  # keyword could be in the body
+    assert not needs_body(unknown, {}, None)
@@ -0,0 +1,77 @@
+from pipeline.email_utils import Email, is_important_by_rule
+from pipeline import keyword_matcher
+from pipeline.keyword_matcher import KeywordMatcher, compile_keywords
+
+
+def _naive(keywords, text):
+    text = text.lower()
+    return [k.lower() for k in keywords if k.lower() in text]
+
+
+def test_find_all_reports_every_keyword_in_config_order(monkeypatch) -> None:
+    monkeypatch.setattr(keyword_matcher, "LOOP_THRESHOLD", 0)  # force the compiled regex
+    keywords = ["line", "Deadline", "dead", "exam", "hall ticket", "hall"]
+    matcher = KeywordMatcher(keywords)
+    text = "The DEADLINE for the hall ticket is before the exam"
+
+    assert matcher.find_all(text) == _naive(keywords, text) == ["line", "deadline", "dead", "exam", "hall ticket", "hall"]
+    assert matcher.first(text) == "line"
+
+
+def test_word_boundary_mode() -> None:
+    matcher = KeywordMatcher(["form", "fee", "hall", "hall ticket"], word_boundary=True)
+
+    assert matcher.find_all("Please fill the information") == []
+    assert matcher.find_all("fee receipt and form, plus hall ticket") == ["form", "fee", "hall", "hall ticket"]
+    assert matcher.find_all("hallway") == []
+
+
+def test_special_characters_are_escaped(monkeypatch) -> None:
+    monkeypatch.setattr(keyword_matcher, "LOOP_THRESHOLD", 0)
+    matcher = KeywordMatcher(["c++", "q3 (draft)"])
+
+    assert matcher.find_all("notes on c++ and the q3 (draft) plan") == ["c++", "q3 (draft)"]
+    assert not matcher.matches("c+ only")
+
+
+def test_compile_keywords_is_cached_per_keyword_list() -> None:
+    assert compile_keywords(["a", "b"]) is compile_keywords(["a", "b"])
+    assert compile_keywords(["a", "b"]) is not compile_keywords(["a", "c"])
+
+
+def test_is_important_by_rule_keeps_first_configured_keyword() -> None:
+    config = {"trusted_senders": [], "priority_keywords": ["exam", "deadline"]}
+    email_obj = Email("x@y.com", "Deadline moved", "exam on monday", "INBOX")
+
+    assert is_important_by_rule(email_obj, config) == (True, "keyword:exam")
+
+
+def test_service_configs_compile_rules_once_per_generation(tmp_path, monkeypatch) -> None:
+    from pipeline import email_utils
+    from pipeline.config_service import ConfigService
+
+    service = ConfigService(tmp_path / "email_rules.json")
+    service.save({"trusted_senders": ["@company.com"], "priority_keywords": ["exam"]})
+    builds = []
+    build = email_utils._trusted_index.__wrapped__
+    monkeypatch.setattr(email_utils, "_trusted_index", lambda senders: builds.append(senders) or build(senders))
+
+    config = service.snapshot()
+    for _ in range(100):
+        assert is_important_by_rule(Email("ceo@company.com", "hi", "", "INBOX"), config)[0]
+    assert len(builds) == 1
+
+    service.save({"trusted_senders": [], "priority_keywords": ["exam"]})
+    config = service.snapshot()
+    assert not is_important_by_rule(Email("ceo@company.com", "hi", "", "INBOX"), config)[0]
+    assert len(builds) == 2
+
+
+def test_regex_and_loop_paths_agree(monkeypatch) -> None:
+    keywords = [f"kw{i}" for i in range(50)] + ["kw1x", "exam"]
+    text = "kw1x then kw12 and kw49, exam kw7"
+    monkeypatch.setattr(keyword_matcher, "LOOP_THRESHOLD", 10_000)
+    loop = KeywordMatcher(keywords).find_all(text)
+    monkeypatch.setattr(keyword_matcher, "LOOP_THRESHOLD", 0)
+
+    assert KeywordMatcher(keywords).find_all(text) == loop == _naive(keywords, text)
@@ -0,0 +1,79 @@
+import json
+
+from pipeline.email_utils import Email, SenderIndex, is_important_by_rule
+from pipeline.learning_manager import LearningManager
+
+
+def test_sender_index_matches_addresses_and_domains() -> None:
+    index = SenderIndex(["Boss <BOSS@company.com>", "@school.edu"])
+
+    assert "boss@company.com" in index
+    assert "Registrar <registrar@school.edu>" in index
+    assert "intern@company.com" not in index
+    assert "x@notschool.edu" not in index
+    assert not index.add("boss@company.com")
+
+
+def test_additions_are_flushed_once(tmp_path, monkeypatch) -> None:
+    rules = tmp_path / "email_rules.json"
+    rules.write_text('{"trusted_senders": ["a@x.com"]}', encoding="utf-8")
+    manager = LearningManager(rules)
+    saves = []
+    monkeypatch.setattr(manager, "save_rules", lambda: saves.append(1))
+
+    for i in range(100):
+        manager.add_trusted_sender(f"user{i}@x.com")
+    manager.add_trusted_sender("a@x.com")
+
+    assert saves == []
+    assert manager.is_trusted_sender("User7 <user7@x.com>")
+    manager.flush()
+    manager.flush()
+    assert saves == [1]
+
+
+def test_context_manager_persists_trusted_senders(tmp_path) -> None:
+    rules = tmp_path / "email_rules.json"
+
+    with LearningManager(rules) as manager:
+        manager.add_trusted_sender("@company.com")
+
+    assert json.loads(rules.read_text(encoding="utf-8"))["trusted_senders"] == ["@company.com"]
+    assert LearningManager(rules).is_trusted_sender("ceo@company.com")
+
+
+def test_rules_accept_domain_entries() -> None:
+    config = {"trusted_senders": ["@company.com"], "priority_keywords": []}
+
+    assert is_important_by_rule(Email("ceo@company.com", "hi", "", "INBOX"), config) == (True, "trusted_sender")
+
+
+def test_external_rule_edits_rebuild_index_and_keep_pending(tmp_path) -> None:
+    rules = tmp_path / "email_rules.json"
+    rules.write_text('{"trusted_senders": ["a@x.com"]}', encoding="utf-8")
+    manager = LearningManager(rules)
+    manager.add_trusted_sender("pending@x.com")
+
+    # Edited by another process (e.g. the rules CLI); size changes with the content
+    rules.write_text('{"trusted_senders": ["a@x.com", "@school.edu"]}', encoding="utf-8")
+    manager.flush()
+
+    assert manager.is_trusted_sender("dean@school.edu")
+    saved = json.loads(rules.read_text(encoding="utf-8"))["trusted_senders"]
+    assert saved == ["a@x.com", "@school.edu", "pending@x.com"]
+
+
+def test_external_removal_is_not_undone_by_pending_additions(tmp_path) -> None:
+    rules = tmp_path / "email_rules.json"
+    rules.write_text('{"trusted_senders": ["a@x.com", "old@x.com"], "ignored_keywords": ["promo"]}', encoding="utf-8")
+    manager = LearningManager(rules)
+    manager.add_trusted_sender("pending@x.com")
+
+    # `rules remove old@x.com` (or a hand edit) while the sweep is running
+    rules.write_text('{"trusted_senders": ["a@x.com"], "ignored_keywords": []}', encoding="utf-8")
+    manager.flush()
+
+    saved = json.loads(rules.read_text(encoding="utf-8"))
+    assert saved["trusted_senders"] == ["a@x.com", "pending@x.com"]
+    assert saved["ignored_keywords"] == []
+    assert not manager.is_trusted_sender("old@x.com")
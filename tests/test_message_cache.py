@@ -0,0 +1,67 @@
+from email.message import EmailMessage
+
+from pipeline.disk_cache import DiskCache
+from pipeline.email_utils import Email
+from pipeline.header_triage import iter_emails
+from pipeline.message_cache import MessageCache
+
+
+def _raw(subject: str, message_id: str) -> bytes:
+    msg = EmailMessage()
+    msg["From"] = "someone@example.com"
+    msg["Subject"] = subject
+    msg["Message-ID"] = message_id
+    msg.set_content("the deadline is friday")
+    msg.add_attachment(b"%PDF" * 100, maintype="application", subtype="pdf", filename="plan.pdf")
+    return msg.as_bytes()
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path) -> None:
+    cache = DiskCache(tmp_path / "cache.sqlite3", max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the oldest
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_disk_cache_enforces_byte_budget(tmp_path) -> None:
+    cache = DiskCache(tmp_path / "cache.sqlite3", max_entries=100, max_bytes=50)
+    for i in range(5):
+        cache.put(str(i), "x" * 20)
+
+    assert cache.stats()["bytes"] <= 50
+    assert cache.get("4") == "x" * 20
+
+
+def test_message_cache_round_trip(tmp_path) -> None:
+    cache = MessageCache(tmp_path / "messages.sqlite3")
+    email_obj = Email("a@b.com", "Hi", "body", "INBOX", message_id="<1@x>", attachments=[{"filename": "f.pdf"}])
+    cache.put(email_obj, size=123)
+
+    assert cache.get("<1@x>", 999, "SPAM") is None
+    cached, body_loaded = cache.get("<1@x>", 123, "SPAM")
+    assert body_loaded
+    assert cached.folder == "SPAM"
+    assert cached.attachments == [{"filename": "f.pdf"}]
+
+
+def test_second_pass_skips_body_fetch_on_cache_hit(fake_imap, tmp_path) -> None:
+    fake_imap.add_message("INBOX", _raw("Weekly notes", "<notes@example.com>"))
+    client = fake_imap.connect()
+    client.select("INBOX")
+    cache = MessageCache(tmp_path / "messages.sqlite3")
+
+    first = [e for _, e in iter_emails(client, [b"1"], "INBOX", lambda e: True, cache=cache)]
+    fetches = fake_imap.count("FETCH")
+    second = [e for _, e in iter_emails(client, [b"1"], "INBOX", lambda e: True, cache=cache)]
+
+    assert first[0].body == second[0].body == "the deadline is friday"
+    assert second[0].attachments[0]["filename"] == "plan.pdf"
+    assert fake_imap.count("FETCH") == fetches + 1  # headers only, no body fetch
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+from pipeline.orchestrator import StageGraph
+
+
+def test_independent_stages_overlap_and_dependencies_are_respected() -> None:
+    order = []
+
+    def slow(name, value):
+        def stage(results):
+            time.sleep(0.2)
+            order.append(name)
+            return value
+        return stage
+
+    graph = StageGraph()
+    graph.add("email", slow("email", 1))
+    graph.add("downloads", slow("downloads", 2))
+    graph.add("summary", lambda r: r["email"] + 10, deps=("email",))
+    graph.add("report", lambda r: (r["summary"], r["downloads"]), deps=("summary", "downloads"))
+
+    start = time.perf_counter()
+    results = graph.run()
+    elapsed = time.perf_counter() - start
+
+    assert results["report"] == (11, 2)
+    assert elapsed < 0.35  # the two 0.2s stages ran concurrently
+    assert set(order) == {"email", "downloads"}
+    assert set(graph.timings) == {"email", "downloads", "summary", "report"}
+    assert graph.timings["email"] >= 0.2
+
+
+def test_coroutine_stages_are_awaited() -> None:
+    async def produce(results):
+        return "async"
+
+    graph = StageGraph()
+    graph.add("a", produce)
+    graph.add("b", lambda r: r["a"].upper(), deps=("a",))
+
+    assert graph.run()["b"] == "ASYNC"
+
+
+def test_invalid_graphs_are_rejected() -> None:
+    graph = StageGraph()
+    graph.add("a", lambda r: 1, deps=("b",))
+    graph.add("b", lambda r: 1, deps=("a",))
+    with pytest.raises(ValueError, match="cycle"):
+        graph.run()
+
+    graph = StageGraph()
+    graph.add("a", lambda r: 1, deps=("missing",))
+    with pytest.raises(ValueError, match="unknown"):
+        graph.run()
+
+
+def test_stage_errors_propagate() -> None:
+    def boom(results):
+        raise RuntimeError("stage failed")
+
+    graph = StageGraph()
+    graph.add("a", boom)
+    graph.add("b", lambda r: r["a"], deps=("a",))
+
+    with pytest.raises(RuntimeError, match="stage failed"):
+        graph.run()
+
+
+def test_on_loop_stages_run_on_the_calling_thread() -> None:
+    threads = {}
+
+    def record(name):
+        def stage(results):
+            threads[name] = threading.current_thread()
+        return stage
+
+    graph = StageGraph()
+    graph.add("worker", record("worker"))
+    graph.add("gui", record("gui"), deps=("worker",), on_loop=True)
+    graph.run()
+
+    assert threads["gui"] is threading.main_thread()
+    assert threads["worker"] is not threading.main_thread()
+
+
+def test_finished_results_are_kept_when_a_stage_fails() -> None:
+    def boom(results):
+        raise RuntimeError("spam stage failed")
+
+    graph = StageGraph()
+    graph.add("connect", lambda r: "session")
+    graph.add("spam", boom, deps=("connect",))
+    with pytest.raises(RuntimeError):
+        graph.run()
+
+    assert graph.results == {"connect": "session"}
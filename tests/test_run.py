@@ -1,5 +1,7 @@
 from pathlib import Path
 
+import pytest
+
 from pipeline import run
 from pipeline.run import Email
 
@@ -102,3 +104,45 @@ def test_write_report_creates_file(tmp_path: Path, monkeypatch) -> None:
     assert "Important Email Summaries" in content
     assert "Detected Deadlines (stub)" in content
     assert "Assignment deadline" in content
+
+
+def test_summary_streams_to_partial_file_with_llm_metrics(tmp_path: Path, monkeypatch) -> None:
+    from pipeline import ai_summary, summary_cache
+    from tests.fake_ollama import FakeOllamaServer
+
+    server = FakeOllamaServer(reply=["1. Pay", " the fee", ".\n"]).start()
+    partial = tmp_path / "Daily_Summary.partial.txt"
+    monkeypatch.setattr(ai_summary, "OLLAMA_URL", server.url)
+    cache_cls = summary_cache.SummaryCache
+    monkeypatch.setattr(summary_cache, "SummaryCache",
+                        lambda **kw: cache_cls(tmp_path / "summary_cache.sqlite3", **kw))
+    monkeypatch.setattr(run, "SUMMARY_PARTIAL_PATH", partial)
+    try:
+        result = run._summarize([Email("dean@uni.edu", "Fee deadline", "Pay by Friday", "INBOX")])
+    finally:
+        server.stop()
+
+    assert result["text"] == "1. Pay the fee. [chunk 1]\n"
+    assert partial.read_text(encoding="utf-8") == "1. Pay the fee.\n"
+    assert result["llm"]["tokens"] == 3
+    assert result["llm"]["calls"] == 1
+    assert result["llm"]["ttft_seconds"] is not None
+    assert "Fee deadline" in server.requests[0]["prompt"]
+
+
+def test_session_is_closed_when_a_stage_fails(monkeypatch) -> None:
+    closed = []
+    monkeypatch.setattr(run, "load_credentials", lambda path: {"email": "me@x.com"})
+    monkeypatch.setattr(run, "load_config", lambda path: {})
+    monkeypatch.setattr(run, "_connect", lambda creds, config: {"name": "session"})
+    monkeypatch.setattr(run, "_close_session", lambda session: closed.append(session["name"]))
+    monkeypatch.setattr(run, "_cleanup_downloads", lambda config: {})
+
+    def broken_spam(session, config):
+        raise RuntimeError("spam failed")
+
+    monkeypatch.setattr(run, "_scan_spam", broken_spam)
+
+    with pytest.raises(RuntimeError, match="spam failed"):
+        run.run()
+    assert closed == ["session"]
@@ -0,0 +1,281 @@
+from email.message import EmailMessage
+
+import pytest
+
+from pipeline import spam_processor
+from pipeline.learning_manager import LearningManager
+from pipeline.sync_state import SyncStateStore, enable_condstore
+from tests.fake_imap import FakeIMAPServer
+
+SPAM = "[Gmail]/Spam"
+
+
+def _raw(sender: str, subject: str) -> bytes:
+    msg = EmailMessage()
+    msg["From"] = sender
+    msg["Subject"] = subject
+    msg["Message-ID"] = f"<{subject.replace(' ', '.')}@x>"
+    msg.set_content("hello")
+    return msg.as_bytes()
+
+
+def _sweep(fake, tmp_path, monkeypatch) -> dict:
+    rules = tmp_path / "email_rules.json"
+    rules.write_text('{"trusted_senders": ["boss@company.com"]}', encoding="utf-8")
+    monkeypatch.setattr(spam_processor, "LearningManager", lambda: LearningManager(rules))
+    monkeypatch.setattr(spam_processor, "load_config", lambda: {
+        "trusted_senders": [], "priority_keywords": ["invoice"],
+    })
+
+    fake.add_message(SPAM, _raw("boss@company.com", "Quarterly plan"))
+    for i in range(6):
+        fake.add_message(SPAM, _raw(f"promo{i}@shop.com", f"Sale {i}"))
+    fake.add_message(SPAM, _raw("billing@vendor.com", "Your invoice"))
+
+    client = fake.connect()
+    fake.command_log.clear()
+    return spam_processor.process_spam_folder(
+        client, use_alerts=False, sync_store=SyncStateStore(tmp_path / "sync.sqlite3")
+    )
+
+
+@pytest.mark.parametrize("capabilities", [None, ["IMAP4rev1", "UIDPLUS"]])
+def test_spam_sweep_acts_in_bulk(tmp_path, monkeypatch, capabilities) -> None:
+    fake = FakeIMAPServer(capabilities=capabilities).start()
+    try:
+        metrics = _sweep(fake, tmp_path, monkeypatch)
+    finally:
+        fake.stop()
+
+    assert metrics["reviewed"] == 8
+    assert metrics["recovered"] == 2
+    assert metrics["deleted"] == 6
+    assert fake.uids(SPAM) == []
+    assert len(fake.mailboxes["INBOX"].messages) == 2
+
+    if capabilities is None:
+        assert fake.count("UID MOVE") == 1
+        assert fake.count("UID STORE") == 1
+    else:
+        assert fake.count("UID COPY") == 1
+        assert fake.count("UID STORE") == 2
+    assert fake.count("EXPUNGE") == 1
+
+
+def test_rule_matches_are_reviewed_in_one_batch(tmp_path, monkeypatch, fake_imap) -> None:
+    batches = []
+    answers = [None, [True, False]]  # first sweep: "decide later"
+
+    def review_batch(self, items):
+        batches.append([item.subject for item in items])
+        return answers[len(batches) - 1]
+
+    monkeypatch.setattr(spam_processor.AlertManager, "review_batch", review_batch)
+    monkeypatch.setattr(spam_processor.AlertManager, "show_email_alert", None)  # never per message
+    rules = tmp_path / "email_rules.json"
+    rules.write_text("{}", encoding="utf-8")
+    monkeypatch.setattr(spam_processor, "LearningManager", lambda: LearningManager(rules))
+    monkeypatch.setattr(spam_processor, "load_config", lambda: {"priority_keywords": ["invoice"]})
+
+    fake_imap.add_message(SPAM, _raw("billing@vendor.com", "Your invoice"))
+    fake_imap.add_message(SPAM, _raw("promo@shop.com", "Sale"))
+    fake_imap.add_message(SPAM, _raw("phish@evil.com", "Unpaid invoice"))
+    client = fake_imap.connect()
+    store = SyncStateStore(tmp_path / "sync.sqlite3")
+    queue_path = tmp_path / "review_queue.json"
+
+    def sweep():
+        return spam_processor.process_spam_folder(
+            client, use_alerts=True, sync_store=store,
+            review_queue=spam_processor.ReviewQueue(queue_path),
+        )
+
+    first = sweep()
+    assert first["queued_for_review"] == 2
+    assert first["review_pending"] == 2
+    assert first["deleted"] == 1
+    assert fake_imap.uids(SPAM) == [1, 3]  # queued mail stays put
+    assert queue_path.exists()
+
+    # No new mail, but the persisted queue is offered again and applied in bulk
+    second = sweep()
+    assert batches == [["Your invoice", "Unpaid invoice"]] * 2
+    assert second["recovered"] == 1 and second["deleted"] == 1
+    assert second["review_pending"] == 0
+    assert fake_imap.uids(SPAM) == []
+    assert len(fake_imap.mailboxes["INBOX"].messages) == 1
+
+
+def test_model_flags_mail_the_rules_miss_and_only_answers_are_recorded(tmp_path, monkeypatch, fake_imap) -> None:
+    pytest.importorskip("numpy")
+    from pipeline.email_utils import Email
+    from pipeline.importance_model import ImportanceModel
+    from pipeline.learning_manager import load_decisions
+
+    rules = tmp_path / "email_rules.json"
+    rules.write_text("{}", encoding="utf-8")
+    decisions = tmp_path / "decisions.jsonl"
+    decisions.write_text("", encoding="utf-8")
+    examples = [Email(f"pm{i}@company.com", f"Contract {i}", "", "") for i in range(5)]
+    examples += [Email(f"deals{i}@shop.com", f"Sale {i}", "", "") for i in range(5)]
+    ImportanceModel().fit(examples, [True] * 5 + [False] * 5).save(tmp_path / "importance_model.npz")
+    monkeypatch.setattr(spam_processor, "LearningManager", lambda: LearningManager(rules))
+    monkeypatch.setattr(spam_processor, "load_config", lambda: {"priority_keywords": [], "mode": "balanced"})
+    reviewed = []
+
+    def review_batch(self, items):
+        reviewed.extend((item.subject, item.reason[:6]) for item in items)
+        return [True] * len(items)
+
+    monkeypatch.setattr(spam_processor.AlertManager, "review_batch", review_batch)
+
+    fake_imap.add_message(SPAM, _raw("legal@company.com", "Contract renewal"))
+    fake_imap.add_message(SPAM, _raw("promo@shop.com", "Big sale"))
+    metrics = spam_processor.process_spam_folder(
+        fake_imap.connect(), use_alerts=True, sync_store=SyncStateStore(tmp_path / "sync.sqlite3"),
+        review_queue=spam_processor.ReviewQueue(),
+    )
+
+    assert reviewed == [("Contract renewal", "model:")]
+    assert metrics["model_flagged"] == 1
+    assert metrics["recovered_senders"] == ["legal@company.com"]
+    assert metrics["deleted"] == 1
+    # The automatic delete just repeats the rules; only the answer is a label
+    assert [(d["sender"], d["subject"], d["important"]) for d in load_decisions(decisions)] == [
+        ("legal@company.com", "Contract renewal", True),
+    ]
+
+
+
+def test_queued_answer_whose_action_fails_stays_queued(tmp_path, monkeypatch, fake_imap) -> None:
+    batches = []
+    answers = [None, [False], [False]]  # decide later, then "delete" twice
+
+    def review_batch(self, items):
+        batches.append([item.subject for item in items])
+        return answers[len(batches) - 1]
+
+    monkeypatch.setattr(spam_processor.AlertManager, "review_batch", review_batch)
+    rules = tmp_path / "email_rules.json"
+    rules.write_text("{}", encoding="utf-8")
+    monkeypatch.setattr(spam_processor, "LearningManager", lambda: LearningManager(rules))
+    monkeypatch.setattr(spam_processor, "load_config", lambda: {"priority_keywords": ["invoice"]})
+    refuse = [True]
+    real_delete = spam_processor._bulk_delete
+    monkeypatch.setattr(spam_processor, "_bulk_delete",
+                        lambda server, uids: False if refuse[0] else real_delete(server, uids))
+
+    fake_imap.add_message(SPAM, _raw("phish@evil.com", "Unpaid invoice"))
+    client = fake_imap.connect()
+    store = SyncStateStore(tmp_path / "sync.sqlite3")
+    queue_path = tmp_path / "review_queue.json"
+
+    def sweep():
+        return spam_processor.process_spam_folder(
+            client, use_alerts=True, sync_store=store,
+            review_queue=spam_processor.ReviewQueue(queue_path),
+        )
+
+    assert sweep()["review_pending"] == 1  # queued, now behind the sync mark
+    failed = sweep()
+    assert failed["deleted"] == 0 and failed["review_pending"] == 1
+    assert fake_imap.uids(SPAM) == [1]
+
+    refuse[0] = False
+    retried = sweep()
+    assert batches == [["Unpaid invoice"]] * 3
+    assert retried["deleted"] == 1 and retried["review_pending"] == 0
+    assert fake_imap.uids(SPAM) == []
+
+
+@pytest.mark.parametrize("condstore", [False, True])
+def test_decide_later_without_a_saved_queue_is_offered_again(tmp_path, monkeypatch, fake_imap, condstore) -> None:
+    batches = []
+
+    def review_batch(self, items):
+        batches.append([item.subject for item in items])
+        return None  # "decide later"
+
+    monkeypatch.setattr(spam_processor.AlertManager, "review_batch", review_batch)
+    rules = tmp_path / "email_rules.json"
+    rules.write_text("{}", encoding="utf-8")
+    monkeypatch.setattr(spam_processor, "LearningManager", lambda: LearningManager(rules))
+    monkeypatch.setattr(spam_processor, "load_config", lambda: {"priority_keywords": ["invoice"]})
+
+    fake_imap.add_message(SPAM, _raw("billing@vendor.com", "Your invoice"))
+    fake_imap.add_message(SPAM, _raw("promo@shop.com", "Sale"))
+    client = fake_imap.connect()
+    if condstore:
+        assert enable_condstore(client)
+    store = SyncStateStore(tmp_path / "sync.sqlite3")
+
+    # The third run sees an unchanged HIGHESTMODSEQ; the held-back UID must still be searched for
+    for _ in range(3):
+        # A fresh in-memory queue per run, as run() builds without review_persist
+        metrics = spam_processor.process_spam_folder(
+            client, use_alerts=True, sync_store=store, review_queue=spam_processor.ReviewQueue(),
+            condstore=condstore,
+        )
+        assert metrics["review_pending"] == 1
+
+    assert batches == [["Your invoice"]] * 3
+    assert fake_imap.uids(SPAM) == [1]
+
+
+def test_settled_prefix_stops_at_the_first_gap() -> None:
+    uids = [b"12", b"3", b"7", b"9"]
+
+    assert spam_processor.settled_prefix(uids, {b"3", b"7", b"12"}) == [b"3", b"7"]
+    assert spam_processor.settled_prefix(uids, set(uids)) == [b"3", b"7", b"9", b"12"]
+    assert spam_processor.settled_prefix(uids, set()) == []
+
+
+@pytest.mark.parametrize("condstore", [False, True])
+def test_failed_actions_are_retried_next_run(tmp_path, monkeypatch, fake_imap, condstore) -> None:
+    rules = tmp_path / "email_rules.json"
+    rules.write_text('{"trusted_senders": ["boss@company.com"]}', encoding="utf-8")
+    monkeypatch.setattr(spam_processor, "LearningManager", lambda: LearningManager(rules))
+    monkeypatch.setattr(spam_processor, "load_config", lambda: {"priority_keywords": []})
+    refuse = [True]
+    real_delete = spam_processor._bulk_delete
+    monkeypatch.setattr(spam_processor, "_bulk_delete",
+                        lambda server, uids: False if refuse[0] else real_delete(server, uids))
+
+    fake_imap.add_message(SPAM, _raw("boss@company.com", "Quarterly plan"))
+    fake_imap.add_message(SPAM, _raw("promo@shop.com", "Sale"))
+    client = fake_imap.connect()
+    if condstore:
+        assert enable_condstore(client)
+    store = SyncStateStore(tmp_path / "sync.sqlite3")
+
+    def sweep():
+        return spam_processor.process_spam_folder(client, use_alerts=False, sync_store=store, condstore=condstore)
+
+    first = sweep()
+    assert first["recovered"] == 1 and first["deleted"] == 0
+    assert fake_imap.uids(SPAM) == [2]
+
+    # Refused again: nothing changes on the server, so HIGHESTMODSEQ is the same next run
+    again = sweep()
+    assert again["reviewed"] == 1 and again["deleted"] == 0
+
+    refuse[0] = False
+    second = sweep()
+    assert second["reviewed"] == 1 and second["deleted"] == 1
+    assert fake_imap.uids(SPAM) == []
+
+
+def test_load_config_applies_env_rule_overrides(tmp_path, monkeypatch) -> None:
+    from pipeline.config_service import get_config_service
+
+    rules = tmp_path / "email_rules.json"
+    rules.write_text('{"priority_keywords": ["invoice"]}', encoding="utf-8")
+    monkeypatch.setattr(spam_processor, "CONFIG_PATH", rules)
+    monkeypatch.setenv("ASSISTANT_PRIORITY_KEYWORDS", "exam")
+    monkeypatch.setenv("ASSISTANT_TRUSTED_SENDERS", "dean@uni.edu")
+
+    config = spam_processor.load_config()
+
+    assert config["priority_keywords"] == ["invoice", "exam"]
+    assert config["trusted_senders"] == ["dean@uni.edu"]
+    assert get_config_service(rules).get()["priority_keywords"] == ["invoice"]
@@ -0,0 +1,31 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.bench_startup import HEAVY_MODULES, heavy_loaded, parse_importtime
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_import_run_does_not_load_stage_dependencies():
+    code = (
+        "import sys, pipeline.run\n"
+        f"heavy = {HEAVY_MODULES!r}\n"
+        "print(','.join(m for m in heavy if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
+
+
+def test_parse_importtime_reads_cumulative_column():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   _json\n"
+        "import time:      1500 |       2000 | pipeline.run\n"
+        "import time:       300 |       4000 |     PIL.Image\n"
+    )
+    timings = parse_importtime(stderr)
+
+    assert timings["pipeline.run"] == (1500, 2000)
+    assert heavy_loaded(timings) == ["PIL.Image"]
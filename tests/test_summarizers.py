@@ -0,0 +1,104 @@
+import threading
+
+import pytest
+
+from pipeline.ai_summary import OllamaError
+from pipeline.email_utils import Email
+from pipeline.summarizers import (
+    ExtractiveBackend,
+    FallbackBackend,
+    OllamaBackend,
+    SummarizerBackend,
+    SummaryResult,
+    get_backend,
+    wait_for_abandoned,
+)
+
+EMAILS = [
+    Email("registrar@uni.edu", "Exam registration closes Friday",
+          "Hello student. Exam registration for the spring term closes on Friday at noon. "
+          "Late exam registration is not possible. Visit https://uni.edu for details.", "INBOX"),
+    Email("fees@uni.edu", "Fee receipt",
+          "Thank you. Your tuition fee payment was received. Keep this fee receipt for the scholarship office.",
+          "INBOX"),
+    Email("mentor@uni.edu", "", "", "INBOX"),
+]
+
+
+class _Stub(SummarizerBackend):
+    name = "stub"
+
+    def __init__(self, release: threading.Event | None = None, error: Exception | None = None):
+        self.release = release
+        self.error = error
+
+    def summarize(self, emails, on_token=None):
+        if self.release:
+            self.release.wait(5)
+        if on_token:
+            on_token("late tokens")
+        if self.error:
+            raise self.error
+        return SummaryResult("1. from the LLM\n", self.name)
+
+
+def test_extractive_is_deterministic_and_picks_topical_sentences() -> None:
+    first = ExtractiveBackend().summarize(EMAILS)
+    second = ExtractiveBackend().summarize(EMAILS)
+
+    assert first.text == second.text
+    lines = first.text.split("\n\n")
+    assert lines[0] == "1. Exam registration closes Friday: Exam registration for the spring term closes on Friday at noon."
+    assert lines[1].startswith("2. Fee receipt: ") and "fee" in lines[1].lower()
+    assert lines[2] == "3. Email from mentor@uni.edu\n"
+
+
+def test_fallback_on_timeout_drops_late_tokens() -> None:
+    release = threading.Event()
+    tokens = []
+    backend = FallbackBackend(_Stub(release=release), ExtractiveBackend(), budget_seconds=0.05)
+
+    result = backend.summarize(EMAILS, on_token=tokens.append)
+    release.set()
+
+    assert result.backend == "extractive"
+    assert "exceeded 0.05s budget" in result.fallback_reason
+    assert "late tokens" not in "".join(tokens)
+    assert tokens[-1] == result.text
+
+
+def test_fallback_on_error_and_primary_when_fast() -> None:
+    failing = FallbackBackend(_Stub(error=OllamaError("connection refused")), ExtractiveBackend(), budget_seconds=5)
+    assert failing.summarize(EMAILS).fallback_reason == "stub failed: connection refused"
+
+    fast = FallbackBackend(_Stub(), ExtractiveBackend(), budget_seconds=5)
+    assert fast.summarize(EMAILS).text == "1. from the LLM\n"
+
+
+def test_get_backend_by_name_or_config() -> None:
+    assert isinstance(get_backend({"summary_backend": "ollama"}), OllamaBackend)
+    assert isinstance(get_backend({}, name="extractive"), ExtractiveBackend)
+    auto = get_backend({"summary_budget_seconds": 12})
+    assert isinstance(auto, FallbackBackend) and auto.budget_seconds == 12
+    with pytest.raises(ValueError):
+        get_backend({"summary_backend": "gpt"})
+
+
+def test_abandoned_primary_gets_a_bounded_wait_to_finish() -> None:
+    wait_for_abandoned(5)  # earlier tests' leftovers
+    release = threading.Event()
+    finished = []
+
+    class Slow(_Stub):
+        def summarize(self, emails, on_token=None):
+            result = super().summarize(emails, on_token)
+            finished.append(result.text)  # stands in for the cache write
+            return result
+
+    backend = FallbackBackend(Slow(release=release), ExtractiveBackend(), budget_seconds=0.05)
+    assert backend.summarize(EMAILS).backend == "extractive"
+
+    assert wait_for_abandoned(0.05) == 1  # still blocked: give up after the bound
+    threading.Timer(0.1, release.set).start()
+    assert wait_for_abandoned(5) == 0
+    assert finished == ["1. from the LLM\n"]
@@ -0,0 +1,68 @@
+from email.message import EmailMessage
+
+from pipeline.sync_state import FolderState, FolderSync, SyncStateStore, enable_condstore
+
+
+def _raw(i: int) -> bytes:
+    msg = EmailMessage()
+    msg["From"] = "someone@example.com"
+    msg["Subject"] = f"Message {i}"
+    msg.set_content("hello")
+    return msg.as_bytes()
+
+
+def _sync(client, store, condstore=False) -> FolderSync:
+    client.select("INBOX")
+    return FolderSync(client, store, "me@example.com", "INBOX", initial_window=3, condstore=condstore)
+
+
+def test_store_round_trips_state(tmp_path) -> None:
+    store = SyncStateStore(tmp_path / "sync.sqlite3")
+    store.put("me", "INBOX", FolderState(uidvalidity=7, last_uid=42, highest_modseq=9))
+    store.close()
+
+    assert SyncStateStore(tmp_path / "sync.sqlite3").get("me", "INBOX") == FolderState(7, 42, 9)
+
+
+def test_incremental_sync_only_returns_new_uids(fake_imap, tmp_path) -> None:
+    store = SyncStateStore(tmp_path / "sync.sqlite3")
+    for i in range(5):
+        fake_imap.add_message("INBOX", _raw(i))
+    client = fake_imap.connect()
+
+    first = _sync(client, store)
+    assert first.new_uids() == [b"3", b"4", b"5"]
+    first.commit([b"3", b"4", b"5"])
+
+    assert _sync(client, store).new_uids() == []
+
+    fake_imap.add_message("INBOX", _raw(5))
+    fake_imap.add_message("INBOX", _raw(6))
+    second = _sync(client, store)
+    assert second.new_uids() == [b"6", b"7"]
+
+
+def test_uidvalidity_change_resets_to_initial_window(fake_imap, tmp_path) -> None:
+    store = SyncStateStore(tmp_path / "sync.sqlite3")
+    for i in range(5):
+        fake_imap.add_message("INBOX", _raw(i))
+    client = fake_imap.connect()
+    _sync(client, store).commit([b"5"])
+
+    fake_imap.mailboxes["INBOX"].uidvalidity = 2
+
+    assert _sync(client, store).new_uids() == [b"3", b"4", b"5"]
+
+
+def test_condstore_skips_search_when_mailbox_unchanged(fake_imap, tmp_path) -> None:
+    store = SyncStateStore(tmp_path / "sync.sqlite3")
+    fake_imap.add_message("INBOX", _raw(0))
+    client = fake_imap.connect()
+    assert enable_condstore(client)
+
+    sync = _sync(client, store, condstore=True)
+    sync.commit(sync.new_uids())
+    searches = fake_imap.count("UID SEARCH")
+
+    assert _sync(client, store, condstore=True).new_uids() == []
+    assert fake_imap.count("UID SEARCH") == searches
@@ -0,0 +1,53 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from pipeline import user_setup
+
+
+@pytest.fixture
+def rules_file(tmp_path: Path, monkeypatch) -> Path:
+    path = tmp_path / "email_rules.json"
+    path.write_text(json.dumps({"trusted_senders": ["boss@company.com"], "priority_keywords": ["exam"]}))
+    monkeypatch.setattr(user_setup, "CONFIG_PATH", path)
+    return path
+
+
+def test_env_overrides_extend_rules_without_duplicates(rules_file: Path) -> None:
+    env = {"ASSISTANT_PRIORITY_KEYWORDS": "exam, deadline ,", "ASSISTANT_TRUSTED_SENDERS": "dean@uni.edu"}
+
+    data = user_setup.apply_env_overrides(user_setup.load_config(), env)
+
+    assert data["priority_keywords"] == ["exam", "deadline"]
+    assert data["trusted_senders"] == ["boss@company.com", "dean@uni.edu"]
+    # Overrides are per run, never written back
+    assert "deadline" not in rules_file.read_text()
+
+
+def test_load_credentials_prefers_environment(tmp_path: Path) -> None:
+    cred_file = tmp_path / "email_credentials.json"
+    cred_file.write_text(json.dumps({"email": "file@example.com", "password": "file", "imap_port": 993}))
+
+    creds = user_setup.load_credentials(cred_file, {"ASSISTANT_APP_PASSWORD": "env", "ASSISTANT_IMAP_PORT": "1993"})
+
+    assert creds["email"] == "file@example.com"
+    assert creds["password"] == "env"
+    assert creds["imap_port"] == 1993
+    assert creds["imap_server"] == "imap.gmail.com"
+
+
+def test_load_credentials_without_file_or_env_raises(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="ASSISTANT_EMAIL"):
+        user_setup.load_credentials(tmp_path / "missing.json", {})
+
+
+def test_rules_cli_adds_and_removes(rules_file: Path, capsys) -> None:
+    user_setup.main(["add", "keyword", "deadline", "exam"])
+    user_setup.main(["remove", "sender", "boss@company.com"])
+    user_setup.main(["list"])
+
+    saved = json.loads(rules_file.read_text())
+    assert saved["priority_keywords"] == ["exam", "deadline"]
+    assert saved["trusted_senders"] == []
+    assert "  - deadline" in capsys.readouterr().out